@@ -10,12 +10,14 @@ import base64
 from io import StringIO
 from src.dataset_download import download_datasets
 from src.data_cleaning_and_merge import data_cleaning, data_cleaning2, load_datasets
-from src.scrape_urls import scrape_urls, scrape_xlsx
+from src.scrape_urls import resource_urls, scrape_urls
 from src.data_cleaning_and_merge_e3 import data_cleaning3
 from streamlit_option_menu import option_menu as om
 import requests
 from src.inegi_uniqueloc import generate_uniqueloc
 from src.data_cleaning_inegi import clean_inegi
+from src.storage import read_table, table_exists
+from src.xlsx_conversion import convert_xlsx_directory
 import time
 
 # Incluir estas líneas en cada script para registrar los logs
@@ -42,31 +44,21 @@ def session_state_with_love_mottum(unique_id):
 
 
 def convert_xlsx_to_csv_in_directory(directory_path):
-    # List all .xlsx files in the directory
-    xlsx_files = [f for f in os.listdir(directory_path) if f.endswith('.xlsx')]
-    total_files = len(xlsx_files)
-
-    if total_files == 0:
+    # Los .xlsx se convierten fila a fila y varios a la vez, cada uno en un proceso
+    if not any(f.endswith('.xlsx') for f in os.listdir(directory_path)):
         st.write("No .xlsx files found to convert.")
         return
 
     # Initialize the progress bar
     progress_bar = st.progress(0)
 
-    for index, filename in enumerate(xlsx_files, start=1):
-        # Construct full file path
-        file_path = os.path.join(directory_path, filename)
-        # Read the .xlsx file
-        df = pd.read_excel(file_path)
-        # Construct the .csv filename
-        csv_filename = filename.replace('.xlsx', '.csv')
-        csv_file_path = os.path.join(directory_path, csv_filename)
-        # Save as .csv
-        df.to_csv(csv_file_path, index=False)
-        print(f"Converted {filename} to {csv_filename}")
-
-        # Update the progress bar
-        progress_bar.progress(index / total_files)
+    def progress_callback(progress, text):
+        progress_bar.progress(progress, text=text)
+
+    converted = convert_xlsx_directory(directory_path, progress_callback=progress_callback)
+    for filename, rows in converted.items():
+        print(f"Converted {filename} to {filename.replace('.xlsx', '.csv')} ({rows} rows)")
+    progress_bar.progress(1.0)
 
     st.write("All files have been converted.")
 
@@ -298,9 +290,8 @@ def data_download(download_destination_folder, url=None, progress_callback=None,
         elif st.session_state.main_page == 'Beneficiarios fertilizantes 2023':
             download_urls = scrape_urls(url)
         elif st.session_state.main_page == 'Beneficiarios fertilizantes 2019-2022':
-            download_urls = []
-            for url in [urls[0], urls[1], urls[2], urls[3]]:
-                download_urls += scrape_xlsx(url)
+            # Las cuatro páginas se consultan a la vez (y solo si no están en la caché de recursos)
+            download_urls = resource_urls(urls, 'xlsx')
         # Correctly initialize the progress bar with 0%
         # Calculate each step's progress increment based on the number of URLs
         progress_bar = st.progress(0)
@@ -324,6 +315,8 @@ def data_download(download_destination_folder, url=None, progress_callback=None,
 
         if good_count > 0:
             st.write(f"{good_count} datasets se han descargado de forma exitosa.")
+            # Los ficheros que no han cambiado en datos.gob.mx desde la última descarga no se descargan de nuevo
+            st.write(f"{result['unchanged_count']} sin cambios, {result['updated_count']} actualizados.")
             st.selectbox("URLs de los datasets descargados con éxito:", good_urls)
         else:
             st.write(
@@ -659,7 +652,8 @@ def show_finished(tab):
         elif tab == '2022':
             dataset_path = "data/listados_completos/listado_beneficiarios_2022_localidades.csv"
 
-        if os.path.exists(dataset_path):
+        # El listado final se guarda en Parquet; la descarga se sigue ofreciendo en CSV
+        if table_exists(dataset_path):
             st.markdown("""
             <style>
             .centered {
@@ -672,7 +666,7 @@ def show_finished(tab):
             <div class="centered">¡El dataset está listo!</div>
             """, unsafe_allow_html=True)
             # Load dataset to calculate statistics
-            df = pd.read_csv(dataset_path)
+            df = read_table(dataset_path)
             # Calculate statistics
             stats = {
                 'Número de filas': [df.shape[0]],
@@ -696,40 +690,36 @@ def show_finished(tab):
 
             cols = st.columns([1, 2, 1])
             if tab == '2019':
-                with open(dataset_path, "rb") as file:
-                    cols[1].download_button(
-                        label="Pulsa aquí para acceder al dataset completo.",
-                        data=file,
-                        file_name=f"listado_beneficiarios_{tab}_localidades.csv",
-                        mime="text/csv",
-                    )
+                cols[1].download_button(
+                    label="Pulsa aquí para acceder al dataset completo.",
+                    data=df.to_csv(index=False).encode('utf-8'),
+                    file_name=f"listado_beneficiarios_{tab}_localidades.csv",
+                    mime="text/csv",
+                )
                 session_state_with_love_mottum('footer8')
             elif tab == '2020':
-                with open(dataset_path, "rb") as file:
-                    cols[1].download_button(
-                        label="Pulsa aquí para acceder al dataset completo.",
-                        data=file,
-                        file_name=f"listado_beneficiarios_{tab}_localidades.csv",
-                        mime="text/csv",
-                    )
+                cols[1].download_button(
+                    label="Pulsa aquí para acceder al dataset completo.",
+                    data=df.to_csv(index=False).encode('utf-8'),
+                    file_name=f"listado_beneficiarios_{tab}_localidades.csv",
+                    mime="text/csv",
+                )
                 session_state_with_love_mottum('footer9')
             elif tab == '2021':
-                with open(dataset_path, "rb") as file:
-                    cols[1].download_button(
-                        label="Pulsa aquí para acceder al dataset completo.",
-                        data=file,
-                        file_name=f"listado_beneficiarios_{tab}_localidades.csv",
-                        mime="text/csv",
-                    )
+                cols[1].download_button(
+                    label="Pulsa aquí para acceder al dataset completo.",
+                    data=df.to_csv(index=False).encode('utf-8'),
+                    file_name=f"listado_beneficiarios_{tab}_localidades.csv",
+                    mime="text/csv",
+                )
                 session_state_with_love_mottum('footer10')
             elif tab == '2022':
-                with open(dataset_path, "rb") as file:
-                    cols[1].download_button(
-                        label="Pulsa aquí para acceder al dataset completo.",
-                        data=file,
-                        file_name=f"listado_beneficiarios_{tab}_localidades.csv",
-                        mime="text/csv",
-                    )
+                cols[1].download_button(
+                    label="Pulsa aquí para acceder al dataset completo.",
+                    data=df.to_csv(index=False).encode('utf-8'),
+                    file_name=f"listado_beneficiarios_{tab}_localidades.csv",
+                    mime="text/csv",
+                )
                 session_state_with_love_mottum('footer11')
 
         else:
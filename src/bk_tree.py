@@ -0,0 +1,61 @@
+from rapidfuzz.distance import Indel
+
+
+class BKTree:
+    """
+    Árbol BK (Burkhard-Keller) sobre la distancia de edición Indel (inserciones y borrados), que es una
+    métrica y cumple la desigualdad triangular. Permite recuperar todas las claves a una distancia máxima de
+    la consulta visitando solo las ramas que pueden contenerlas.
+
+    Cada nodo es una lista [clave, índice en el catálogo, {distancia: nodo hijo}].
+    """
+
+    def __init__(self, distance=Indel.distance):
+        self.distance = distance
+        self.root = None
+        self.size = 0
+
+    def add(self, word, index):
+        node = [word, index, {}]
+        if self.root is None:
+            self.root = node
+            self.size += 1
+            return
+
+        current = self.root
+        while True:
+            d = self.distance(word, current[0])
+            if d == 0:
+                # Clave repetida, se conserva la primera aparición del catálogo
+                return
+            child = current[2].get(d)
+            if child is None:
+                current[2][d] = node
+                self.size += 1
+                return
+            current = child
+
+    def search(self, word, max_distance):
+        """
+        Devuelve una lista de tuplas (índice, clave, distancia) con las claves a distancia <= max_distance
+        y el número de nodos visitados.
+        """
+        results = []
+        visited = 0
+        if self.root is None:
+            return results, visited
+
+        stack = [self.root]
+        while stack:
+            node_word, node_index, children = stack.pop()
+            d = self.distance(word, node_word)
+            visited += 1
+            if d <= max_distance:
+                results.append((node_index, node_word, d))
+            # Por la desigualdad triangular solo los hijos a distancia [d - max_distance, d + max_distance]
+            # pueden contener claves válidas
+            for child_distance, child in children.items():
+                if d - max_distance <= child_distance <= d + max_distance:
+                    stack.append(child)
+
+        return results, visited
@@ -0,0 +1,110 @@
+import numpy as np
+from rapidfuzz import fuzz
+
+# Alfabeto de los histogramas de caracteres. Las claves ya vienen normalizadas (minúsculas, sin acentos ni
+# signos), el resto de caracteres se acumulan en una última columna común.
+ALFABETO = 'abcdefghijklmnopqrstuvwxyz0123456789 '
+
+# Margen para no descartar por errores de redondeo candidatos que quedan justo en el umbral
+EPSILON = 1e-9
+
+_CHAR_COLUMN = np.full(128, len(ALFABETO), dtype=np.int64)
+_CHAR_COLUMN[[ord(char) for char in ALFABETO]] = np.arange(len(ALFABETO))
+
+
+def char_histograms(strings):
+    """
+    Devuelve una matriz (len(strings) x len(ALFABETO) + 1) con el número de apariciones de cada carácter en
+    cada cadena. Los valores que no son texto cuentan como cadenas vacías.
+    """
+    strings = [string if isinstance(string, str) else '' for string in strings]
+    lengths = np.fromiter((len(string) for string in strings), dtype=np.int64, count=len(strings))
+    codes = np.frombuffer(''.join(strings).encode('utf-32-le'), dtype=np.uint32).astype(np.int64)
+    columns = np.where(codes < 128, _CHAR_COLUMN[np.minimum(codes, 127)], len(ALFABETO))
+    rows = np.repeat(np.arange(len(strings)), lengths)
+    n_columns = len(ALFABETO) + 1
+    counts = np.bincount(rows * n_columns + columns, minlength=len(strings) * n_columns)
+    return counts.reshape(len(strings), n_columns)
+
+
+def length_upper_bound(query_length, choice_lengths, scorer):
+    """
+    Cota superior de la puntuación que puede alcanzar una consulta de longitud query_length contra candidatos
+    de longitudes choice_lengths, conociendo solo las longitudes.
+
+    - ratio: 100 * 2 * min / (lq + lc), ya que la subsecuencia común no puede ser más larga que la cadena corta.
+    - WRatio: si la proporción de longitudes es < 1.5 puntúa como max(ratio, 0.95 * token_ratio), si está entre
+      1.5 y 8 como mucho llega a 90 (partial_ratio escalado por 0.9) y por encima de 8 a 60 (escala 0.6).
+    """
+    choice_lengths = np.asarray(choice_lengths, dtype=np.float64)
+    shortest = np.minimum(query_length, choice_lengths)
+    longest = np.maximum(query_length, choice_lengths)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio_bound = np.where(longest > 0, 200 * shortest / (shortest + longest), 100.0)
+        if scorer is fuzz.ratio:
+            return ratio_bound
+        len_ratio = np.where(shortest > 0, longest / shortest, np.inf)
+    bound = np.where(len_ratio < 1.5, np.maximum(ratio_bound, 95), np.where(len_ratio <= 8, 90.0, 60.0))
+    return np.where(shortest > 0, bound, 0.0)
+
+
+def histogram_upper_bound(query_histogram, choice_histograms, query_length, choice_lengths, scorer):
+    """
+    Cota superior más ajustada que length_upper_bound para los candidatos de longitud parecida: la subsecuencia
+    común no puede tener más apariciones de cada carácter que la cadena que menos tenga.
+    """
+    common = np.minimum(choice_histograms, query_histogram).sum(axis=1)
+    total = query_length + np.asarray(choice_lengths, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio_bound = np.where(total > 0, 200 * common / total, 100.0)
+    if scorer is fuzz.ratio:
+        return ratio_bound
+    # En WRatio solo la rama de longitudes parecidas depende de ratio, y las puntuaciones por tokens
+    # están escaladas por 0.95
+    return np.minimum(length_upper_bound(query_length, choice_lengths, scorer), np.maximum(ratio_bound, 95))
+
+
+def candidate_groups(processed_queries, processed_choices, score_cutoff, scorer):
+    """
+    Agrupa las consultas por longitud y, para cada grupo, descarta los candidatos que ninguna consulta del grupo
+    puede llegar a puntuar por encima de score_cutoff, primero por longitud y después, con WRatio y umbrales
+    altos, por histograma de caracteres. Las cotas son exactas, de modo que la mejor coincidencia no cambia.
+
+    Solo se poda con los scorers fuzz.WRatio y fuzz.ratio; con cualquier otro se devuelve un único grupo con
+    todos los candidatos.
+
+    Devuelve una lista de tuplas (índices de las consultas, índices de los candidatos en orden del catálogo).
+    """
+    all_queries = np.arange(len(processed_queries))
+    all_choices = np.arange(len(processed_choices))
+    if scorer not in (fuzz.WRatio, fuzz.ratio) or score_cutoff <= 0:
+        return [(all_queries, all_choices)]
+
+    query_lengths = np.array([len(query) for query in processed_queries], dtype=np.int64)
+    choice_lengths = np.array([len(choice) if isinstance(choice, str) else 0 for choice in processed_choices],
+                              dtype=np.int64)
+    # Con WRatio, el histograma solo puede descartar algo cuando el umbral supera las puntuaciones por tokens.
+    # Con ratio calcular el histograma cuesta tanto como la propia puntuación, así que solo se poda por longitud.
+    use_histograms = scorer is fuzz.WRatio and score_cutoff > 95
+    if use_histograms:
+        query_histograms = char_histograms(processed_queries)
+        choice_histograms = char_histograms(processed_choices)
+
+    groups = []
+    for length in np.unique(query_lengths):
+        queries_idx = np.flatnonzero(query_lengths == length)
+        if length == 0:
+            # Las consultas vacías no se podan
+            groups.append((queries_idx, all_choices))
+            continue
+
+        columns = np.flatnonzero(length_upper_bound(length, choice_lengths, scorer) >= score_cutoff - EPSILON)
+        if use_histograms and len(columns) > 0:
+            keep = np.zeros(len(columns), dtype=bool)
+            for query in queries_idx:
+                keep |= histogram_upper_bound(query_histograms[query], choice_histograms[columns], length,
+                                              choice_lengths[columns], scorer) >= score_cutoff - EPSILON
+            columns = columns[keep]
+        groups.append((queries_idx, columns))
+
+    return groups
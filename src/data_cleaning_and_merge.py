@@ -1,73 +1,94 @@
 import pandas as pd
 import seaborn as sns
 from thefuzz import fuzz
-from thefuzz import process
 import matplotlib.pyplot as plt
 import numpy as np
 import os
 import glob
-import re
-import unidecode
+from concurrent.futures import ThreadPoolExecutor
+from src.fuzzy_matching import CANDIDATOS_DICCIONARIO, assign_match_columns, candidate_columns, match_keys
+from src.inegi_catalog import load_inegi_catalog
+from src.match_cache import MATCH_CACHE_PATH
+from src.padron_store import load_padron
+from src.schemas import detect_encoding, read_source, source_encoding
+from src.streaming import CHUNK_ROWS, iter_source_chunks, unique_rows, write_chunk
+from src.text_normalization import clean_text_series
 
 
 # Definición de funciones
 
-def load_datasets(directory):
+def load_dataset(file, schema=None):
+    # La codificación se detecta antes de leer, de modo que cada fichero se interpreta una sola vez
+    if schema is not None:
+        # Solo las columnas declaradas en el esquema, con sus tipos (ver src/schemas.py)
+        return read_source(file, schema, encoding=source_encoding(file, schema))
+    encoding = detect_encoding(file, ('cp1252', 'utf-8'))
+    return pd.read_csv(file, encoding=encoding, index_col=0, skiprows=1)
+
+
+def count_source_columns(directory):
+    """
+    Número de columnas de los CSV de directory tal como se publican, sin la columna de índice y sin proyectar
+    con el esquema: las mismas que tendría la concatenación de los ficheros leídos sin esquema. Solo se lee
+    la cabecera de cada fichero.
+    """
+    columns = {}
+    for file in sorted(glob.glob(os.path.join(directory, '*.csv'))):
+        encoding = detect_encoding(file, ('cp1252', 'utf-8'))
+        header = pd.read_csv(file, encoding=encoding, index_col=0, skiprows=1, nrows=0)
+        columns.update(dict.fromkeys(header.columns))
+    return len(columns)
+
+
+def load_datasets(directory, schema=None, max_workers=None):
+    """
+    Lee todos los CSV de directory a la vez en un pool de hilos y los concatena en el orden de sus nombres, de
+    modo que el resultado no depende de qué fichero termina antes. max_workers=1 los lee de forma secuencial.
+    """
     # Get a list of all CSV files in the directory
-    csv_files = glob.glob(os.path.join(directory, '*.csv'))
-
-    dataframes = []
-    for file in csv_files:
-        try:
-            # Try to read the CSV file with cp1252 encoding
-            df = pd.read_csv(file, encoding='cp1252', index_col=0, skiprows=1)
-        except UnicodeDecodeError:
-            # If it fails, try to read the CSV file with utf-8 encoding
-            df = pd.read_csv(file, encoding='utf-8', index_col=0, skiprows=1)
-        
+    csv_files = sorted(glob.glob(os.path.join(directory, '*.csv')))
+
+    if max_workers == 1:
+        dataframes = [load_dataset(file, schema) for file in csv_files]
+    else:
+        # El parser de C de pandas libera el GIL, así que los hilos leen los ficheros en paralelo
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            dataframes = list(executor.map(load_dataset, csv_files, [schema] * len(csv_files)))
+
+    for file, df in zip(csv_files, dataframes):
         # Print the columns of the current DataFrame
         print(f"Columns in {file}: {df.columns.tolist()}")
-        
-        dataframes.append(df)
 
     # Concatenate all DataFrames in the list
     merged_df = pd.concat(dataframes, ignore_index=True)
 
     return merged_df
 
-def clean_text(text):
-    """
-    De esta manera tenemos el texto sin espacios blancos extra y sobre todo con todas las palabras con capitalización correcta.
-    """
-    if pd.isna(text):
-        return text
-    text = text.strip()  # Eliminate white spaces
-    text = text.lower()  # Convert to lowercase
-    text = unidecode.unidecode(text)  # Remove accents
-    text = re.sub('-.*-', '', text)
-    text = re.sub('\s+', ' ', text)  # Eliminate extra white spaces
-    text = re.sub('^\s+|\s+?$', '', text)  # Eliminate spaces at the beginning and end
-    return text
-
-
 # Crear una función para encontrar la mejor coincidencia difusa con límites entre 90 y 100 de coincidencia
-def fuzzy_merge_prod(df_inegi, df_prod, key1, key2, threshold=96, limit=1):
+def fuzzy_merge_prod(df_inegi, df_prod, key1, key2, threshold=96, limit=1, block_by_state=True, fallback=False,
+                     use_cache=True, phonetic=False):
     """
     df_inegi: DataFrame de la izquierda (el DataFrame principal)
     df_prod: DataFrame de la derecha (el DataFrame con el que se quiere hacer el join)
     key1: Columna de la clave en df_inegi
     key2: Columna de la clave en df_prod
     threshold: Umbral de coincidencia difusa
-    limit: Número de coincidencias a encontrar
+    limit: Número de coincidencias a encontrar. Las candidatas a partir de la segunda se añaden como columnas
+    match_2, match_score_2... para la validación manual del diccionario
+    block_by_state: Comparar cada clave estado-municipio solo con los municipios de su estado
+    fallback: Buscar en todo el país las claves que no encuentran coincidencia en su estado
+    use_cache: Reutilizar las coincidencias guardadas en data/match_cache.sqlite de ejecuciones anteriores
+    phonetic: Asignar a las claves sin coincidencia difusa el único candidato que suena igual (s/z/c, ll/y, b/v,
+    h muda, x/j), si llega al umbral threshold
     """
-    s = df_prod[key2].tolist()
-
     # Encontrar las mejores coincidencias para cada clave en df_inegi
-    matches = df_inegi[key1].apply(lambda x: process.extractOne(x, s, score_cutoff=threshold))
+    best_matches, scores = match_keys(df_inegi[key1].tolist(), df_prod[key2].tolist(), score_cutoff=threshold,
+                                      block_by_state=block_by_state, fallback=fallback,
+                                      cache_path=MATCH_CACHE_PATH if use_cache else None, limit=limit,
+                                      phonetic=phonetic)
 
     # Crear una columna con las mejores coincidencias
-    df_inegi['best_match'] = [match[0] if match else None for match in matches]
-    df_inegi['match_score'] = [match[1] if match else None for match in matches]
+    assign_match_columns(df_inegi, best_matches, scores)
 
     # Hacer el merge con las mejores coincidencias
     df_merged = pd.merge(df_inegi, df_prod, left_on='best_match', right_on=key2, how='inner',
@@ -77,16 +98,16 @@ def fuzzy_merge_prod(df_inegi, df_prod, key1, key2, threshold=96, limit=1):
 
 
 # Crear una función para encontrar la mejor coincidencia difusa con límites entre 90 y 100 de coincidencia
-def fuzzy_merge_benef2023(df_benef, df_inegi, key1, key2, threshold=90, limit=1):
-    s = df_inegi[key2].tolist()
-
-    # Encontrar las mejores coincidencias para cada clave en df_inegi
-    matches = df_benef[key1].apply(lambda x: process.extractOne(x, s, score_cutoff=threshold))
+def fuzzy_merge_benef2023(df_benef, df_inegi, key1, key2, threshold=90, limit=1, block_by_state=True,
+                          fallback=False, use_cache=True, phonetic=False):
+    # Encontrar las mejores coincidencias para cada clave en df_benef
+    best_matches, scores = match_keys(df_benef[key1].tolist(), df_inegi[key2].tolist(), score_cutoff=threshold,
+                                      block_by_state=block_by_state, fallback=fallback,
+                                      cache_path=MATCH_CACHE_PATH if use_cache else None, limit=limit,
+                                      phonetic=phonetic)
 
     # Crear una columna con las mejores coincidencias
-    df_benef['best_match'] = [match[0] if match else None for match in matches]
-
-    df_benef['match_score'] = [match[1] if match else None for match in matches]
+    assign_match_columns(df_benef, best_matches, scores)
 
     # Hacer el merge con las mejores coincidencias
     df_merged = pd.merge(df_benef, df_inegi, left_on='best_match', right_on=key2, how='left',
@@ -122,8 +143,8 @@ def clean_inegi_data(dataset_inegi):
         'CVE_MUN'].astype(str)
 
     # Estandarizamos la limpieza de los datos en el dataset de INEGI
-    dataset_inegi_clean['NOM_ENT_Clean'] = dataset_inegi_clean['NOM_ENT'].apply(clean_text)
-    dataset_inegi_clean['NOM_MUN_Clean'] = dataset_inegi_clean['NOM_MUN'].apply(clean_text)
+    dataset_inegi_clean['NOM_ENT_Clean'] = clean_text_series(dataset_inegi_clean['NOM_ENT'])
+    dataset_inegi_clean['NOM_MUN_Clean'] = clean_text_series(dataset_inegi_clean['NOM_MUN'])
 
     dataset_inegi_clean["NOM_ENT_Clean"] = dataset_inegi_clean["NOM_ENT_Clean"].astype(str)
     dataset_inegi_clean["NOM_MUN_Clean"] = dataset_inegi_clean["NOM_MUN_Clean"].astype(str)
@@ -138,8 +159,8 @@ def clean_productores_and_benef_data(listado_productores=None, listado_beneficia
         # Existing cleaning logic for productores
         Estados_productores = listado_productores[['ESTADO', 'MUNICIPIO']]
         Estados_productores = drop_duplicates(Estados_productores)
-        Estados_productores['ESTADO_Clean'] = Estados_productores['ESTADO'].apply(clean_text)
-        Estados_productores['MUNICIPIO_Clean'] = Estados_productores['MUNICIPIO'].apply(clean_text)
+        Estados_productores['ESTADO_Clean'] = clean_text_series(Estados_productores['ESTADO'])
+        Estados_productores['MUNICIPIO_Clean'] = clean_text_series(Estados_productores['MUNICIPIO'])
         Estados_productores["ESTADO_Clean"] = Estados_productores["ESTADO_Clean"].astype(str)
         Estados_productores["MUNICIPIO_Clean"] = Estados_productores["MUNICIPIO_Clean"].astype(str)
         Estados_productores["KEY_prod"] = Estados_productores["ESTADO_Clean"] + "-" + Estados_productores[
@@ -156,8 +177,8 @@ def clean_productores_and_benef_data(listado_productores=None, listado_beneficia
         # Example:
         Estados_beneficiarios = listado_beneficiarios[['ESTADO', 'MUNICIPIO']]
         Estados_beneficiarios = drop_duplicates(Estados_beneficiarios)
-        Estados_beneficiarios['ESTADO_Clean'] = Estados_beneficiarios['ESTADO'].apply(clean_text)
-        Estados_beneficiarios['MUNICIPIO_Clean'] = Estados_beneficiarios['MUNICIPIO'].apply(clean_text)
+        Estados_beneficiarios['ESTADO_Clean'] = clean_text_series(Estados_beneficiarios['ESTADO'])
+        Estados_beneficiarios['MUNICIPIO_Clean'] = clean_text_series(Estados_beneficiarios['MUNICIPIO'])
         Estados_beneficiarios["ESTADO_Clean"] = Estados_beneficiarios["ESTADO_Clean"].astype(str)
         Estados_beneficiarios["MUNICIPIO_Clean"] = Estados_beneficiarios["MUNICIPIO_Clean"].astype(str)
         Estados_beneficiarios["KEY_benef"] = Estados_beneficiarios["ESTADO_Clean"] + "-" + Estados_beneficiarios[
@@ -170,41 +191,37 @@ def clean_productores_and_benef_data(listado_productores=None, listado_beneficia
 
 
 def data_cleaning():
-    path_dataset_inegi = 'data/inegi/dataset_inegi.csv'
-    dataset_inegi = pd.read_csv(path_dataset_inegi, encoding='cp1252' , dtype={'CVE_ENT': str, 'CVE_MUN': str})
-
-    listado_productores = load_datasets('data/productores_autorizados')
+    listado_productores = load_datasets('data/productores_autorizados', schema='productores_autorizados')
 
     stats = {
         'Número de filas': [listado_productores.shape[0]],
-        'Número de columnas': [listado_productores.shape[1]],
+        # Columnas de los listados publicados, no solo las que se leen con el esquema
+        'Número de columnas': [count_source_columns('data/productores_autorizados')],
         # Add more statistics here if needed
     }
     stats_df = pd.DataFrame(stats)
 
     stats_df.to_csv('data/productores_autorizados/diccionarios_E1/stats_iniciales_productores.csv', index=False)
 
-    dataset_inegi_clean = clean_inegi_data(dataset_inegi)
-
-    listado_productores = listado_productores.drop(columns=['Unnamed: 8', 'Unnamed: 9', 'Unnamed: 10'])
+    # Catálogo de municipios del corte de 2024 (dataset_inegi.csv), ya limpio y con KEY_inegi
+    dataset_inegi_clean = load_inegi_catalog('2024', 'municipios')
 
     # Solo las dos primeras columnas de lista_productores.
     Estados_productores = clean_productores_and_benef_data(listado_productores=listado_productores,
                                                            listado_beneficiarios=None)
-    # Primero creemos una columna clave en cada dataset -> INEGI
-    dataset_inegi_clean["KEY_inegi"] = dataset_inegi_clean["NOM_ENT_Clean"] + "-" + dataset_inegi_clean["NOM_MUN_Clean"]
-
     # Aplicar la función de coincidencia difusa
-    diccionario = fuzzy_merge_prod(dataset_inegi_clean, Estados_productores, 'KEY_inegi', 'KEY_prod')
+    diccionario = fuzzy_merge_prod(dataset_inegi_clean, Estados_productores, 'KEY_inegi', 'KEY_prod',
+                                   limit=CANDIDATOS_DICCIONARIO)
 
-    diccionario = diccionario[['CVE_ENT', 'NOM_ENT', 'CVE_MUN', 'NOM_MUN', 'KEY_prod']]
+    diccionario = diccionario[['CVE_ENT', 'NOM_ENT', 'CVE_MUN', 'NOM_MUN', 'KEY_prod'] +
+                              candidate_columns(CANDIDATOS_DICCIONARIO)]
     #diccionario['CVE_ENT'] = diccionario['CVE_ENT'].astype(str)
     #diccionario['CVE_MUN'] = diccionario['CVE_MUN'].astype(str)
     save_to_csv(diccionario, 'data/productores_autorizados/diccionarios_E1/diccionario_prod.csv')
 
     # Crear una variable KEY en listado de productores y el diccionario para hacer el join
-    listado_productores['ESTADO_Clean'] = listado_productores['ESTADO'].apply(clean_text)
-    listado_productores['MUNICIPIO_Clean'] = listado_productores['MUNICIPIO'].apply(clean_text)
+    listado_productores['ESTADO_Clean'] = clean_text_series(listado_productores['ESTADO'])
+    listado_productores['MUNICIPIO_Clean'] = clean_text_series(listado_productores['MUNICIPIO'])
     listado_productores['Estado-mun-KEY'] = listado_productores['ESTADO_Clean'].astype(str) + '-' + listado_productores[
         'MUNICIPIO_Clean'].astype(str)
     
@@ -279,51 +296,40 @@ def data_cleaning():
     listado_productores_complete['cve_mun'] = listado_productores_complete['cve_mun'].str.zfill(3)
 
     save_to_csv(listado_productores_complete, 'data/listados_completos/listado_productores_complete2023.csv')
+    load_padron(listado_productores_complete, 'productores', 2023)
 
 
-def data_cleaning2():
-    path_dataset_inegi = 'data/inegi/dataset_inegi.csv'
-    dataset_inegi = pd.read_csv(path_dataset_inegi, encoding='cp1252' , dtype={'CVE_ENT': str, 'CVE_MUN': str})
-
-    listado_beneficiarios = load_datasets('data/productores_beneficiarios')
-
-    dataset_inegi_clean = clean_inegi_data(dataset_inegi)
-
-    Estados_beneficiarios = clean_productores_and_benef_data(listado_productores=None,
-                                                             listado_beneficiarios=listado_beneficiarios)
-
-    dataset_inegi_clean["KEY_inegi"] = dataset_inegi_clean["NOM_ENT_Clean"] + "-" + dataset_inegi_clean["NOM_MUN_Clean"]
-
-    print(Estados_beneficiarios)
-
-    Estados_beneficiarios = Estados_beneficiarios.drop_duplicates(subset='KEY_benef')
-
-    diccionario = fuzzy_merge_benef2023(Estados_beneficiarios, dataset_inegi_clean, 'KEY_benef', 'KEY_inegi')
-
-    diccionario = diccionario[['CVE_ENT', 'NOM_ENT', 'CVE_MUN', 'NOM_MUN', 'KEY_benef']]
-    diccionario['CVE_ENT'] = diccionario['CVE_ENT'].astype(str)
-    diccionario['CVE_MUN'] = diccionario['CVE_MUN'].astype(str)
-    print(diccionario['CVE_ENT'].unique())
-
-    diccionario.drop_duplicates(subset=['KEY_benef'], inplace=True)
+def map_beneficiarios_2023(listado_beneficiarios, diccionario_verificado_simple, dataset_inegi_clean, start=0,
+                           seen_acuses=None):
+    """
+    Asigna a cada beneficiario de 2023 su entidad y municipio de INEGI a través del diccionario verificado y da
+    al listado su formato final.
 
-    save_to_csv(diccionario, 'data/productores_beneficiarios/diccionarios_E2/diccionario_benef.csv')
+    En modo streaming se llama una vez por bloque del listado: start es el id de la primera fila del bloque y
+    seen_acuses el conjunto de acuses ya escritos, que se actualiza, para eliminar los duplicados entre bloques.
 
-    listado_beneficiarios['ESTADO_Clean'] = listado_beneficiarios['ESTADO'].apply(clean_text)
-    listado_beneficiarios['MUNICIPIO_Clean'] = listado_beneficiarios['MUNICIPIO'].apply(clean_text)
+    Devuelve el listado final y el número de filas del cruce, para calcular el start del bloque siguiente.
+    """
+    listado_beneficiarios['ESTADO_Clean'] = clean_text_series(listado_beneficiarios['ESTADO'])
+    listado_beneficiarios['MUNICIPIO_Clean'] = clean_text_series(listado_beneficiarios['MUNICIPIO'])
     listado_beneficiarios['Estado-mun-KEY'] = listado_beneficiarios['ESTADO_Clean'].astype(str) + '-' + \
                                               listado_beneficiarios['MUNICIPIO_Clean'].astype(str)
 
-    diccionario_verificado_simple = pd.read_csv('data/productores_beneficiarios/diccionarios_E2/Diccionario_Simple.csv')
-
     listado_beneficiarios_parte_I = pd.merge(listado_beneficiarios, diccionario_verificado_simple,
                                              left_on="Estado-mun-KEY", right_on="KEY_benef", how='left',
                                              suffixes=('_benef', '_inegi'))
     listado_beneficiarios_parte_II = pd.merge(listado_beneficiarios_parte_I, dataset_inegi_clean,
                                               left_on="KEY_benef_Verificado", right_on="KEY_inegi", how='left',
                                               suffixes=('_benef', '_inegi'))
+    merged_rows = len(listado_beneficiarios_parte_II)
+    listado_beneficiarios_parte_II.index += start
     listado_beneficiarios_parte_II = listado_beneficiarios_parte_II.drop_duplicates(subset=['ACUSE ESTATAL'],
                                                                                     keep='first')
+    if seen_acuses is not None:
+        # Los acuses que ya aparecieron en bloques anteriores también son duplicados
+        acuses = listado_beneficiarios_parte_II['ACUSE ESTATAL'].astype(str)
+        listado_beneficiarios_parte_II = listado_beneficiarios_parte_II[~acuses.isin(seen_acuses)]
+        seen_acuses.update(acuses)
     listado_beneficiarios_parte_II = listado_beneficiarios_parte_II[
         ['ESTADO', 'MUNICIPIO', 'ACUSE ESTATAL', 'APELLIDO PATERNO', 'APELLIDO MATERNO', 'NOMBRE (S)', 'PAQUETE',
          'KEY_benef_Verificado', 'NOM_ENT', 'NOM_MUN', 'CVE_ENT', 'CVE_MUN']]
@@ -369,7 +375,65 @@ def data_cleaning2():
     listado_beneficiarios_parte_II['cve_ent'] = listado_beneficiarios_parte_II['cve_ent'].str.zfill(2)
     listado_beneficiarios_parte_II['cve_mun'] = listado_beneficiarios_parte_II['cve_mun'].str.zfill(3)
 
-    listado_beneficiarios_parte_II.to_csv('data/listados_completos/listado_beneficiarios_2023.csv', index=False)
+    return listado_beneficiarios_parte_II, merged_rows
+
+
+def data_cleaning2(streaming=False, chunksize=CHUNK_ROWS):
+    """
+    Con streaming=True el listado se lee y se escribe por bloques de chunksize filas: la memoria depende del
+    tamaño del bloque y no del listado. El resultado es el mismo.
+    """
+    listado_paths = sorted(glob.glob(os.path.join('data/productores_beneficiarios', '*.csv')))
+    if streaming:
+        # Para el diccionario solo hacen falta los pares estado-municipio distintos
+        listado_beneficiarios = unique_rows(listado_paths, 'beneficiarios_2023', ['ESTADO', 'MUNICIPIO'],
+                                            chunksize=chunksize)
+    else:
+        listado_beneficiarios = load_datasets('data/productores_beneficiarios', schema='beneficiarios_2023')
+
+    # Catálogo de municipios del corte de 2024 (dataset_inegi.csv), ya limpio y con KEY_inegi
+    dataset_inegi_clean = load_inegi_catalog('2024', 'municipios')
+
+    Estados_beneficiarios = clean_productores_and_benef_data(listado_productores=None,
+                                                             listado_beneficiarios=listado_beneficiarios)
+
+    print(Estados_beneficiarios)
+
+    Estados_beneficiarios = Estados_beneficiarios.drop_duplicates(subset='KEY_benef')
+
+    diccionario = fuzzy_merge_benef2023(Estados_beneficiarios, dataset_inegi_clean, 'KEY_benef', 'KEY_inegi',
+                                        limit=CANDIDATOS_DICCIONARIO)
+
+    diccionario = diccionario[['CVE_ENT', 'NOM_ENT', 'CVE_MUN', 'NOM_MUN', 'KEY_benef'] +
+                              candidate_columns(CANDIDATOS_DICCIONARIO)]
+    diccionario['CVE_ENT'] = diccionario['CVE_ENT'].astype(str)
+    diccionario['CVE_MUN'] = diccionario['CVE_MUN'].astype(str)
+    print(diccionario['CVE_ENT'].unique())
+
+    diccionario.drop_duplicates(subset=['KEY_benef'], inplace=True)
+
+    save_to_csv(diccionario, 'data/productores_beneficiarios/diccionarios_E2/diccionario_benef.csv')
+
+    diccionario_verificado_simple = pd.read_csv('data/productores_beneficiarios/diccionarios_E2/Diccionario_Simple.csv')
+    output_path = 'data/listados_completos/listado_beneficiarios_2023.csv'
+
+    if not streaming:
+        listado_beneficiarios_2023, _ = map_beneficiarios_2023(listado_beneficiarios, diccionario_verificado_simple,
+                                                               dataset_inegi_clean)
+        listado_beneficiarios_2023.to_csv(output_path, index=False)
+        load_padron(listado_beneficiarios_2023, 'beneficiarios', 2023)
+        return
+
+    start = 0
+    seen_acuses = set()
+    for i, chunk in enumerate(iter_source_chunks(listado_paths, 'beneficiarios_2023', chunksize=chunksize)):
+        listado_beneficiarios_2023, merged_rows = map_beneficiarios_2023(chunk.reset_index(drop=True),
+                                                                         diccionario_verificado_simple,
+                                                                         dataset_inegi_clean, start=start,
+                                                                         seen_acuses=seen_acuses)
+        write_chunk(listado_beneficiarios_2023, output_path, first=i == 0)
+        load_padron(listado_beneficiarios_2023, 'beneficiarios', 2023, replace=i == 0)
+        start += merged_rows
 
 
 def main():
@@ -1,34 +1,55 @@
 import pandas as pd
 import seaborn as sns
 from thefuzz import fuzz
-from thefuzz import process
 import matplotlib.pyplot as plt
 import numpy as np
 import os
 import glob
 import re
 import unidecode
+from concurrent.futures import ProcessPoolExecutor
+from src.data_cleaning_inegi import clean_inegi
+from src.fuzzy_matching import CANDIDATOS_DICCIONARIO, assign_match_columns, match_keys
+from src.inegi_catalog import load_inegi_index
+from src.inegi_index import merge_inegi
+from src.match_cache import MATCH_CACHE_PATH
+from src.padron_store import load_padron
+from src.schemas import ESQUEMAS, read_source
+from src.storage import EXTENSIONES, FORMATO, read_table, write_table
+from src.streaming import CHUNK_ROWS, iter_source_chunks, unique_rows, write_chunk
+from src.text_normalization import clean_text as clean_text_inegi, clean_text_series
 
 
 # Crear una función para encontrar la mejor coincidencia difusa con límites entre 85 y 100 de coincidencia
-def fuzzy_merge_benef2019_2022(df_benef, df_inegi, key1, key2, threshold=85, limit=1):
+def fuzzy_merge_benef2019_2022(df_benef, df_inegi, key1, key2, threshold=85, limit=1, block_by_state=False,
+                               fallback=False, use_cache=True, method='cdist', workers=-1, phonetic=False):
     """
     df_inegi: DataFrame de la izquierda (el DataFrame principal)
     df_prod: DataFrame de la derecha (el DataFrame con el que se quiere hacer el join)
     key1: Columna de la clave en df_inegi
     key2: Columna de la clave en df_prod
     threshold: Umbral de coincidencia difusa
-    limit: Número de coincidencias a encontrar
+    limit: Número de coincidencias a encontrar. Las candidatas a partir de la segunda se añaden como columnas
+    match_2, match_score_2... para la validación manual del diccionario
+    block_by_state: Comparar cada clave estado-municipio solo con los municipios de su estado (no aplica a las
+    claves municipio-localidad)
+    fallback: Buscar en todo el país las claves que no encuentran coincidencia en su estado
+    use_cache: Reutilizar las coincidencias guardadas en data/match_cache.sqlite de ejecuciones anteriores
+    method: Motor de coincidencia, 'cdist' (WRatio, como thefuzz), 'bktree' (ratio con índice BK-tree) o 'tfidf'
+    (WRatio sobre los candidatos más parecidos por n-gramas TF-IDF, pensado para buscar las localidades en el
+    catálogo nacional de INEGI en lugar de en las listas por entidad)
+    workers: Número de núcleos que usa el motor de coincidencia, -1 para usar todos
+    phonetic: Asignar a las claves sin coincidencia difusa el único candidato que suena igual (s/z/c, ll/y, b/v,
+    h muda, x/j), si llega al umbral threshold
     """
-    s = df_inegi[key2].tolist()
-
-    # Encontrar las mejores coincidencias para cada clave en df_inegi
-    matches = df_benef[key1].apply(lambda x: process.extractOne(x, s, score_cutoff=threshold))
+    # Encontrar las mejores coincidencias para cada clave en df_benef
+    best_matches, scores = match_keys(df_benef[key1].tolist(), df_inegi[key2].tolist(), score_cutoff=threshold,
+                                      block_by_state=block_by_state, fallback=fallback,
+                                      method=method, cache_path=MATCH_CACHE_PATH if use_cache else None,
+                                      workers=workers, limit=limit, phonetic=phonetic)
 
     # Crear una columna con las mejores coincidencias
-    df_benef['best_match'] = [match[0] if match else None for match in matches]
-
-    df_benef['match_score'] = [match[1] if match else None for match in matches]
+    assign_match_columns(df_benef, best_matches, scores)
 
     # Hacer el merge con las mejores coincidencias
     df_merged = pd.merge(df_benef, df_inegi, left_on='best_match', right_on=key2, how='left',
@@ -37,21 +58,6 @@ def fuzzy_merge_benef2019_2022(df_benef, df_inegi, key1, key2, threshold=85, lim
     return df_merged
 
 
-def clean_text_inegi(text):
-    """
-    De esta manera tenemos el texto sin espacios blancos extra y sobre todo con todas las palabras con capitalización correcta.
-    """
-    if pd.isna(text):
-        return text
-    text = text.strip()  # Eliminate white spaces
-    text = text.lower()  # Convert to lowercase
-    text = unidecode.unidecode(text)  # Remove accents
-    text = re.sub('-.*-', '', text)
-    text = re.sub('\s+', ' ', text)  # Eliminate extra white spaces
-    text = re.sub('^\s+|\s+?$', '', text)  # Eliminate spaces at the beginning and end
-    return text
-
-
 def drop_columns_inegi(dataset_inegi):
     # Eliminamos las columnas que no son de interés
     COLUMNS_TO_DROP = ['MAPA', 'Estatus', 'NOM_ABR', 'AMBITO', 'LATITUD', 'LONGITUD',
@@ -61,9 +67,9 @@ def drop_columns_inegi(dataset_inegi):
 
 
 def dataset_cleaning_inegi(dataset):
-    dataset['NOM_ENT_Clean'] = dataset['NOM_ENT'].apply(clean_text_inegi)
-    dataset['NOM_MUN_Clean'] = dataset['NOM_MUN'].apply(clean_text_inegi)
-    dataset['NOM_LOC_Clean'] = dataset['NOM_LOC'].apply(clean_text_inegi)
+    dataset['NOM_ENT_Clean'] = clean_text_series(dataset['NOM_ENT'])
+    dataset['NOM_MUN_Clean'] = clean_text_series(dataset['NOM_MUN'])
+    dataset['NOM_LOC_Clean'] = clean_text_series(dataset['NOM_LOC'])
 
 
 def inegi_rename_columns(dataset):
@@ -102,29 +108,33 @@ def create_listados_por_entidad(listado_beneficiarios, entities, prefix, datafra
 
 def load_inegi_uniqueloc(folder_path):
     """
-    Reads all CSV files in the specified folder and returns them as a dictionary of DataFrames.
+    Reads all INEGI_UNIQUELOC tables (Parquet, Arrow or CSV) in the specified folder and returns them as a
+    dictionary of DataFrames. If a table exists in several formats, the FORMATO version is used.
 
     Parameters:
-    - folder_path: The path to the folder containing the CSV files.
+    - folder_path: The path to the folder containing the tables.
 
     Returns:
-    - A dictionary where keys are the names of the CSV files (without the '.csv' extension) and values are the corresponding DataFrames.
+    - A dictionary where keys are the names of the files (without extension) and values are the corresponding DataFrames.
     """
     dataframes_dict = {}
 
     # List all files in the folder
     files = os.listdir(folder_path)
 
-    # Filter only CSV files
-    csv_files = [file for file in files if file.endswith('.csv')]
+    # Filter only table files, with the FORMATO version first
+    extensions = [EXTENSIONES[FORMATO]] + [extension for extension in EXTENSIONES.values()
+                                           if extension != EXTENSIONES[FORMATO]]
+    tables = {}
+    for extension in extensions:
+        for file_name in files:
+            var_name, file_extension = os.path.splitext(file_name)
+            if file_extension == extension:
+                tables.setdefault(var_name, file_name)
 
-    # Read each CSV file and add to the dictionary
-    for file_name in csv_files:
-        file_path = os.path.join(folder_path, file_name)
-        # Create a variable name dynamically by removing the '.csv' extension
-        var_name = file_name.replace('.csv', '')
-        # Read the CSV file and add the DataFrame to the dictionary
-        dataframes_dict[var_name] = pd.read_csv(file_path)
+    # Read each table and add it to the dictionary
+    for var_name, file_name in sorted(tables.items()):
+        dataframes_dict[var_name] = read_table(os.path.join(folder_path, file_name))
 
     # Optionally print the names of the variables created and the shape of each DataFrame
     for var_name, df in dataframes_dict.items():
@@ -133,49 +143,102 @@ def load_inegi_uniqueloc(folder_path):
     return dataframes_dict
 
 
+def fuzzy_merge_localidades_por_entidad(jobs, listados_por_entidad, inegi_uniquelocs, max_workers=None,
+                                        method='cdist'):
+    """
+    Ejecuta fuzzy_merge_benef2019_2022 para cada entidad en un pool de procesos.
+
+    Parameters:
+    - jobs: Lista de tuplas (nombre del listado por entidad, nombre del INEGI_UNIQUELOC de esa entidad).
+    - listados_por_entidad: Diccionario devuelto por create_listados_por_entidad.
+    - inegi_uniquelocs: Diccionario devuelto por load_inegi_uniqueloc.
+    - max_workers: Número de procesos. None usa todos los núcleos y 1 ejecuta las entidades de forma secuencial.
+    - method: Motor de coincidencia de fuzzy_merge_benef2019_2022.
+
+    Returns:
+    - La lista de DataFrames resultantes en el mismo orden que jobs.
+    """
+    args = [(listados_por_entidad[listado], inegi_uniquelocs[uniqueloc], 'KEY_benef_loc', 'KEY_inegi_localidad')
+            for listado, uniqueloc in jobs]
+
+    if max_workers == 1:
+        return [fuzzy_merge_benef2019_2022(*arg, limit=CANDIDATOS_DICCIONARIO, method=method) for arg in args]
+
+    # Cada proceso usa un solo núcleo para el motor de coincidencia, el paralelismo lo da el pool
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(fuzzy_merge_benef2019_2022, *arg, limit=CANDIDATOS_DICCIONARIO,
+                                   method=method, workers=1) for arg in args]
+        return [future.result() for future in futures]
+
+
 def cleaning_inegi():
-    dataset_inegi_clean_2019 = pd.read_csv('data/inegi/dataset_inegi_2019.csv')
-    dataset_inegi_clean_2020 = pd.read_csv('data/inegi/dataset_inegi_2020.csv')
-    dataset_inegi_clean_2021 = pd.read_csv('data/inegi/dataset_inegi_2021.csv')
-    dataset_inegi_clean_2022 = pd.read_csv('data/inegi/dataset_inegi_2022.csv')
+    # Los dataset_inegi_clean_{año} solo se regeneran si ha cambiado el fichero de INEGI del corte
+    clean_inegi(cuts=('2019', '2020', '2021', '2022'))
 
-    drop_columns_inegi(dataset_inegi_clean_2019)
-    drop_columns_inegi(dataset_inegi_clean_2020)
-    drop_columns_inegi(dataset_inegi_clean_2021)
-    drop_columns_inegi(dataset_inegi_clean_2022)
 
-    dataset_cleaning_inegi(dataset_inegi_clean_2019)
-    dataset_cleaning_inegi(dataset_inegi_clean_2020)
-    dataset_cleaning_inegi(dataset_inegi_clean_2021)
-    dataset_cleaning_inegi(dataset_inegi_clean_2022)
+def map_municipios_2019_2022(dataset_benef, diccionario_MUN_simple, INEGI_UNIQUEMUN, indice_MUN):
+    """
+    Asigna a cada fila del listado de beneficiarios su municipio de INEGI a través del diccionario de municipios
+    verificado y del índice de claves de municipios del corte. En modo streaming se llama una vez por bloque del
+    listado.
+    """
+    dataset_benef['ESTADO_Clean'] = clean_text_series(dataset_benef['ENTIDAD'])
+    dataset_benef['MUNICIPIO_Clean'] = clean_text_series(dataset_benef['MUNICIPIO'])
 
-    inegi_rename_columns(dataset_inegi_clean_2019)
-    inegi_rename_columns(dataset_inegi_clean_2020)
-    inegi_rename_columns(dataset_inegi_clean_2021)
-    inegi_rename_columns(dataset_inegi_clean_2022)
+    # Create KEY in listado beneficiarios
+    dataset_benef['Estado-mun-KEY'] = dataset_benef['ESTADO_Clean'].astype(str) + '-' + dataset_benef[
+        'MUNICIPIO_Clean'].astype(str)
 
-    dataset_inegi_clean_2019.to_csv('data/inegi/dataset_inegi_clean_2019.csv', index=False)
-    dataset_inegi_clean_2020.to_csv('data/inegi/dataset_inegi_clean_2020.csv', index=False)
-    dataset_inegi_clean_2021.to_csv('data/inegi/dataset_inegi_clean_2021.csv', index=False)
-    dataset_inegi_clean_2022.to_csv('data/inegi/dataset_inegi_clean_2022.csv', index=False)
+    dataset_benef.dropna(inplace=True)
 
+    listado_beneficiarios_parte_I = pd.merge(dataset_benef, diccionario_MUN_simple, left_on="Estado-mun-KEY",
+                                             right_on="KEY_benef_mun", how='left', suffixes=('_benef', '_inegi'))
+    listado_beneficiarios_parte_II = merge_inegi(listado_beneficiarios_parte_I, 'KEY_inegi_municipio',
+                                                 INEGI_UNIQUEMUN, indice_MUN)
+
+    print(listado_beneficiarios_parte_I.shape)
+    print(listado_beneficiarios_parte_II.shape)
 
-def data_cleaning3(dataset_inegi, dataset_benef, prefix):
-    dataset_inegi_clean = pd.read_csv(dataset_inegi, dtype={'CVE_ENT': str, 'CVE_MUN': str, 'CVE_LOC': str})
-    dataset_benef = pd.read_csv(dataset_benef)
+    return listado_beneficiarios_parte_II.drop(
+        columns=['ESTADO_Clean', 'MUNICIPIO_Clean', 'Estado-mun-KEY', 'KEY_inegi_municipio', 'Entidad_c_inegi',
+                 'Municipio_c_inegi', 'ESTRATIFICACIÓN', 'PROGRAMA', 'COMPONENTE', 'SUBCOMPONENTE', 'APOYO',
+                 'ACTIVIDAD', 'ESLABÓN'])
 
+
+def data_cleaning3(dataset_inegi, dataset_benef, prefix, max_workers=None, method='cdist', streaming=False,
+                   chunksize=CHUNK_ROWS):
+    """
+    Con streaming=True el listado de beneficiarios se lee y se cruza con los municipios por bloques de chunksize
+    filas, sin cargarlo entero en memoria. En 2021 y 2022 el cruce con las localidades necesita el listado
+    completo y se hace después, con el mismo resultado que sin streaming.
+
+    method es el motor con el que se cruzan las localidades de cada entidad con su INEGI_UNIQUELOC (ver
+    fuzzy_merge_benef2019_2022). Por defecto es 'cdist', como antes; 'tfidf' solo se usa si se pide aquí.
+    """
     cleaning_inegi()
 
+    dataset_inegi_clean = read_table(dataset_inegi)
+    dataset_benef_path = dataset_benef
+
+    # Índices de claves del corte: las filas de dataset_inegi_clean se toman con ellos en lugar de con pd.merge
+    indice_MUN = load_inegi_index(f'20{prefix}', 'municipios')
+    indice_LOC = load_inegi_index(f'20{prefix}', 'localidades')
+
     dataset_inegi_clean['CVE_ENT'] = dataset_inegi_clean['CVE_ENT'].astype(str).str.zfill(2)
     dataset_inegi_clean['CVE_MUN'] = dataset_inegi_clean['CVE_MUN'].astype(str).str.zfill(3)
     dataset_inegi_clean['CVE_LOC'] = dataset_inegi_clean['CVE_LOC'].astype(str).str.zfill(4)
 
     # Obtenemos las localidades únicas en el dataset.
-    Municipios = dataset_benef[['ENTIDAD', 'MUNICIPIO']]
+    if streaming:
+        Municipios = unique_rows(dataset_benef_path, 'beneficiarios_2019_2022', ['ENTIDAD', 'MUNICIPIO'],
+                                 chunksize=chunksize)
+    else:
+        dataset_benef = read_source(dataset_benef_path, 'beneficiarios_2019_2022')
+        Municipios = dataset_benef[['ENTIDAD', 'MUNICIPIO']]
     Municipios = Municipios.drop_duplicates()
 
-    Municipios['ENTIDAD_c_benef'] = Municipios['ENTIDAD'].apply(clean_text_inegi)
-    Municipios['MUNICIPIO_c_benef'] = Municipios['MUNICIPIO'].apply(clean_text_inegi)
+    Municipios['ENTIDAD_c_benef'] = clean_text_series(Municipios['ENTIDAD'])
+    Municipios['MUNICIPIO_c_benef'] = clean_text_series(Municipios['MUNICIPIO'])
 
     Municipios['KEY_benef_mun'] = Municipios['ENTIDAD_c_benef'].astype(str) + '-' + Municipios[
         'MUNICIPIO_c_benef'].astype(str)
@@ -191,7 +254,8 @@ def data_cleaning3(dataset_inegi, dataset_benef, prefix):
 
     INEGI_UNIQUEMUN.drop_duplicates(subset='KEY_inegi_municipio', keep='first', inplace=True)
 
-    diccionario_MUN = fuzzy_merge_benef2019_2022(Municipios, INEGI_UNIQUEMUN, 'KEY_benef_mun', 'KEY_inegi_municipio')
+    diccionario_MUN = fuzzy_merge_benef2019_2022(Municipios, INEGI_UNIQUEMUN, 'KEY_benef_mun', 'KEY_inegi_municipio',
+                                                 limit=CANDIDATOS_DICCIONARIO, block_by_state=True)
 
     diccionario_MUN.drop(columns=['ENTIDAD', 'MUNICIPIO', 'ENTIDAD_c_benef', 'MUNICIPIO_c_benef', 'Entidad_c_inegi',
                                   'Municipio_c_inegi'], inplace=True)
@@ -205,54 +269,53 @@ def data_cleaning3(dataset_inegi, dataset_benef, prefix):
 
     diccionario_MUN_simple = diccionario_MUN_simple.drop_duplicates(subset='KEY_benef_mun', keep='first')
 
-    dataset_benef['ESTADO_Clean'] = dataset_benef['ENTIDAD'].apply(clean_text_inegi)
-    dataset_benef['MUNICIPIO_Clean'] = dataset_benef['MUNICIPIO'].apply(clean_text_inegi)
-
-    # Create KEY in listado beneficiarios
-    dataset_benef['Estado-mun-KEY'] = dataset_benef['ESTADO_Clean'].astype(str) + '-' + dataset_benef[
-        'MUNICIPIO_Clean'].astype(str)
-
-    dataset_benef.dropna(inplace=True)
-
     diccionario_MUN_simple.drop_duplicates(inplace=True)
 
-    listado_beneficiarios_parte_I = pd.merge(dataset_benef, diccionario_MUN_simple, left_on="Estado-mun-KEY",
-                                             right_on="KEY_benef_mun", how='left', suffixes=('_benef', '_inegi'))
-    listado_beneficiarios_parte_II = pd.merge(listado_beneficiarios_parte_I, INEGI_UNIQUEMUN,
-                                              left_on="KEY_inegi_municipio",
-                                              right_on="KEY_inegi_municipio", how='left', suffixes=('_benef', '_inegi'))
-
-    print(listado_beneficiarios_parte_I.shape)
-    print(listado_beneficiarios_parte_II.shape)
-
-    listado_beneficiarios_parte_II = listado_beneficiarios_parte_II.drop(
-        columns=['ESTADO_Clean', 'MUNICIPIO_Clean', 'Estado-mun-KEY', 'KEY_inegi_municipio', 'Entidad_c_inegi',
-                 'Municipio_c_inegi', 'ESTRATIFICACIÓN', 'PROGRAMA', 'COMPONENTE', 'SUBCOMPONENTE', 'APOYO',
-                 'ACTIVIDAD', 'ESLABÓN'])
-
-    listado_beneficiarios_parte_II.to_csv(f'data/listados_completos/listado_beneficiarios_{prefix}.csv', index=False)
-
-    listado_beneficiarios_parte_II['ENTIDAD_c_benef'] = listado_beneficiarios_parte_II['ENTIDAD'].apply(
-        clean_text_inegi)
-    listado_beneficiarios_parte_II['MUNICIPIO_c_benef'] = listado_beneficiarios_parte_II['MUNICIPIO'].apply(
-        clean_text_inegi)
-    listado_beneficiarios_parte_II['LOCALIDAD_c_benef'] = listado_beneficiarios_parte_II['LOCALIDAD'].apply(
-        clean_text_inegi)
-
-    listado_beneficiarios_parte_II['KEY_benef_loc'] = listado_beneficiarios_parte_II['MUNICIPIO_c_benef'].astype(
-        str) + '-' + listado_beneficiarios_parte_II['LOCALIDAD_c_benef'].astype(str)
-    print('listado_benef: ', listado_beneficiarios_parte_II.isna().sum())
+    output_path = f'data/listados_completos/listado_beneficiarios_{prefix}.csv'
+    if streaming:
+        chunks = iter_source_chunks(dataset_benef_path, 'beneficiarios_2019_2022', chunksize=chunksize)
+        for i, chunk in enumerate(chunks):
+            write_chunk(map_municipios_2019_2022(chunk, diccionario_MUN_simple, INEGI_UNIQUEMUN, indice_MUN), output_path,
+                        first=i == 0)
+    else:
+        listado_beneficiarios_parte_II = map_municipios_2019_2022(dataset_benef, diccionario_MUN_simple,
+                                                                  INEGI_UNIQUEMUN, indice_MUN)
+        listado_beneficiarios_parte_II.to_csv(output_path, index=False)
+
+    # 2019 y 2020 cruzan las localidades a partir de listado_beneficiarios_{año}_match.csv, 2021 y 2022 a partir
+    # del listado con los municipios asignados, que en modo streaming se vuelve a leer del fichero escrito. Este
+    # cruce elimina las filas repetidas de todo el listado, así que no se puede hacer por bloques.
+    if streaming and prefix in (21, 22):
+        dtype = {column: column_type for column, column_type in
+                 ESQUEMAS['beneficiarios_2019_2022']['columns'].items() if column_type is not None}
+        # Las claves geoestadísticas (CVE_ENT_inegi, CVE_MUN_benef...) se leen como texto para no perder los ceros
+        # a la izquierda
+        header = pd.read_csv(output_path, nrows=0).columns
+        dtype.update({column: str for column in header if column.startswith('CVE_')})
+        listado_beneficiarios_parte_II = pd.read_csv(output_path, dtype=dtype)
+
+    if not streaming or prefix in (21, 22):
+        listado_beneficiarios_parte_II['ENTIDAD_c_benef'] = clean_text_series(
+            listado_beneficiarios_parte_II['ENTIDAD'])
+        listado_beneficiarios_parte_II['MUNICIPIO_c_benef'] = clean_text_series(
+            listado_beneficiarios_parte_II['MUNICIPIO'])
+        listado_beneficiarios_parte_II['LOCALIDAD_c_benef'] = clean_text_series(
+            listado_beneficiarios_parte_II['LOCALIDAD'])
+
+        listado_beneficiarios_parte_II['KEY_benef_loc'] = listado_beneficiarios_parte_II['MUNICIPIO_c_benef'].astype(
+            str) + '-' + listado_beneficiarios_parte_II['LOCALIDAD_c_benef'].astype(str)
+        print('listado_benef: ', listado_beneficiarios_parte_II.isna().sum())
 
     if prefix == 19:
         listado_beneficiarios_2019_match = pd.read_csv('data/listados_completos/listado_beneficiarios_2019_match.csv')
 
         listado_beneficiarios_2019_match = listado_beneficiarios_2019_match.drop(columns=['Unnamed: 0'])
-        listado_beneficiarios_2019_match['ENTIDAD_c_benef'] = listado_beneficiarios_2019_match['ENTIDAD'].apply(
-            clean_text_inegi)
-        listado_beneficiarios_2019_match['MUNICIPIO_c_benef'] = listado_beneficiarios_2019_match['MUNICIPIO'].apply(
-            clean_text_inegi)
-        listado_beneficiarios_2019_match['LOCALIDAD_c_benef'] = listado_beneficiarios_2019_match['LOCALIDAD'].apply(
-            clean_text_inegi)
+        listado_beneficiarios_2019_match['ENTIDAD_c_benef'] = clean_text_series(
+            listado_beneficiarios_2019_match['ENTIDAD'])
+        listado_beneficiarios_2019_match['MUNICIPIO_c_benef'] = clean_text_series(
+            listado_beneficiarios_2019_match['MUNICIPIO'])
+        listado_beneficiarios_2019_match['LOCALIDAD_c_benef'] = clean_text_series(
+            listado_beneficiarios_2019_match['LOCALIDAD'])
 
         listado_beneficiarios_2019_match['KEY_benef_loc'] = listado_beneficiarios_2019_match[
                                                                 'MUNICIPIO_c_benef'].astype(str) + '-' + \
@@ -271,100 +334,28 @@ def data_cleaning3(dataset_inegi, dataset_benef, prefix):
         listados_beneficiarios_por_entidad = create_listados_por_entidad(listado_beneficiarios_2019, entities, 19)
         inegi_uniquelocs = load_inegi_uniqueloc('data/productores_beneficiarios 2019-2022/diccionarios_E3/2019')
 
-        Localidades_19_GUERRERO_parte_I = fuzzy_merge_benef2019_2022(
-            listados_beneficiarios_por_entidad['Localidades_19_GUERRERO'],
-            inegi_uniquelocs['INEGI_UNIQUELOC_2019_guerrero'], 'KEY_benef_loc', 'KEY_inegi_localidad')
-        Localidades_19_GUERRERO_parte_I.shape
-
-        Localidades_19_PUEBLA_parte_I = fuzzy_merge_benef2019_2022(
-            listados_beneficiarios_por_entidad['Localidades_19_PUEBLA'],
-            inegi_uniquelocs['INEGI_UNIQUELOC_2019_puebla'], 'KEY_benef_loc', 'KEY_inegi_localidad')
-        Localidades_19_PUEBLA_parte_I.shape
-
-        Localidades_19_MEXICO_parte_I = fuzzy_merge_benef2019_2022(
-            listados_beneficiarios_por_entidad['Localidades_19_MÉXICO'],
-            inegi_uniquelocs['INEGI_UNIQUELOC_2019_méxico'], 'KEY_benef_loc', 'KEY_inegi_localidad')
-        Localidades_19_MEXICO_parte_I.shape
-
-        Localidades_19_GUANAJUATO_parte_I = fuzzy_merge_benef2019_2022(
-            listados_beneficiarios_por_entidad['Localidades_19_GUANAJUATO'],
-            inegi_uniquelocs['INEGI_UNIQUELOC_2019_guanajuato'], 'KEY_benef_loc', 'KEY_inegi_localidad')
-        Localidades_19_GUANAJUATO_parte_I.shape
-
-        Localidades_19_QUERETARO_parte_I = fuzzy_merge_benef2019_2022(
-            listados_beneficiarios_por_entidad['Localidades_19_QUERÉTARO'],
-            inegi_uniquelocs['INEGI_UNIQUELOC_2019_querétaro'], 'KEY_benef_loc', 'KEY_inegi_localidad')
-        Localidades_19_QUERETARO_parte_I.shape
-
-        Localidades_19_ZACATECAS_parte_I = fuzzy_merge_benef2019_2022(
-            listados_beneficiarios_por_entidad['Localidades_19_ZACATECAS'],
-            inegi_uniquelocs['INEGI_UNIQUELOC_2019_zacatecas'], 'KEY_benef_loc', 'KEY_inegi_localidad')
-        Localidades_19_ZACATECAS_parte_I.shape
-
-        Localidades_19_VERACRUZ_DE_IGNACIO_DE_LA_LLAVE_parte_I = fuzzy_merge_benef2019_2022(
-            listados_beneficiarios_por_entidad['Localidades_19_VERACRUZ_DE_IGNACIO_DE_LA_LLAVE'],
-            inegi_uniquelocs['INEGI_UNIQUELOC_2019_veracruz_de_ignacio_de_la_llave'], 'KEY_benef_loc',
-            'KEY_inegi_localidad')
-        Localidades_19_VERACRUZ_DE_IGNACIO_DE_LA_LLAVE_parte_I.shape
-
-        Localidades_19_HIDALGO_parte_I = fuzzy_merge_benef2019_2022(
-            listados_beneficiarios_por_entidad['Localidades_19_HIDALGO'],
-            inegi_uniquelocs['INEGI_UNIQUELOC_2019_hidalgo'], 'KEY_benef_loc', 'KEY_inegi_localidad')
-        Localidades_19_HIDALGO_parte_I.shape
-
-        Localidades_19_MICHOACAN_parte_I = fuzzy_merge_benef2019_2022(
-            listados_beneficiarios_por_entidad['Localidades_19_MICHOACÁN_DE_OCAMPO'],
-            inegi_uniquelocs['INEGI_UNIQUELOC_2019_michoacán_de_ocampo'], 'KEY_benef_loc', 'KEY_inegi_localidad')
-        Localidades_19_MICHOACAN_parte_I.shape
-
-        Localidades_19_OAXACA_parte_I = fuzzy_merge_benef2019_2022(
-            listados_beneficiarios_por_entidad['Localidades_19_OAXACA'],
-            inegi_uniquelocs['INEGI_UNIQUELOC_2019_oaxaca'], 'KEY_benef_loc', 'KEY_inegi_localidad')
-        Localidades_19_OAXACA_parte_I.shape
-
-        Localidades_19_COLIMA_parte_I = fuzzy_merge_benef2019_2022(
-            listados_beneficiarios_por_entidad['Localidades_19_COLIMA'],
-            inegi_uniquelocs['INEGI_UNIQUELOC_2019_colima'], 'KEY_benef_loc', 'KEY_inegi_localidad')
-        Localidades_19_COLIMA_parte_I.shape
-
-        Localidades_19_CHIAPAS_parte_I = fuzzy_merge_benef2019_2022(
-            listados_beneficiarios_por_entidad['Localidades_19_CHIAPAS'],
-            inegi_uniquelocs['INEGI_UNIQUELOC_2019_chiapas'], 'KEY_benef_loc', 'KEY_inegi_localidad')
-        Localidades_19_CHIAPAS_parte_I.shape
-
-        Localidades_19_POTOSI_parte_I = fuzzy_merge_benef2019_2022(
-            listados_beneficiarios_por_entidad['Localidades_19_SAN_LUIS_POTOSÍ'],
-            inegi_uniquelocs['INEGI_UNIQUELOC_2019_san_luis_potosí'], 'KEY_benef_loc', 'KEY_inegi_localidad')
-        Localidades_19_POTOSI_parte_I.shape
-
-        Localidades_19_JALISCO_parte_I = fuzzy_merge_benef2019_2022(
-            listados_beneficiarios_por_entidad['Localidades_19_JALISCO'],
-            inegi_uniquelocs['INEGI_UNIQUELOC_2019_jalisco'], 'KEY_benef_loc', 'KEY_inegi_localidad')
-        Localidades_19_JALISCO_parte_I.shape
-
-        Localidades_19_NAYARIT_parte_I = fuzzy_merge_benef2019_2022(
-            listados_beneficiarios_por_entidad['Localidades_19_NAYARIT'],
-            inegi_uniquelocs['INEGI_UNIQUELOC_2019_nayarit'], 'KEY_benef_loc', 'KEY_inegi_localidad')
-        Localidades_19_NAYARIT_parte_I.shape
-
-        # Concatenate datasets vertically
-        diccionario_LOC_19 = pd.concat([
-            Localidades_19_GUERRERO_parte_I,
-            Localidades_19_PUEBLA_parte_I,
-            Localidades_19_MEXICO_parte_I,
-            Localidades_19_GUANAJUATO_parte_I,
-            Localidades_19_QUERETARO_parte_I,
-            Localidades_19_ZACATECAS_parte_I,
-            Localidades_19_VERACRUZ_DE_IGNACIO_DE_LA_LLAVE_parte_I,
-            Localidades_19_HIDALGO_parte_I,
-            Localidades_19_MICHOACAN_parte_I,
-            Localidades_19_OAXACA_parte_I,
-            Localidades_19_COLIMA_parte_I,
-            Localidades_19_CHIAPAS_parte_I,
-            Localidades_19_POTOSI_parte_I,
-            Localidades_19_JALISCO_parte_I,
-            Localidades_19_NAYARIT_parte_I
-        ], axis=0)
+        # Cada entidad se cruza con su INEGI_UNIQUELOC en un proceso distinto. El orden de la lista fija el orden
+        # de concatenación del diccionario.
+        jobs = [
+            ('Localidades_19_GUERRERO', 'INEGI_UNIQUELOC_2019_guerrero'),
+            ('Localidades_19_PUEBLA', 'INEGI_UNIQUELOC_2019_puebla'),
+            ('Localidades_19_MÉXICO', 'INEGI_UNIQUELOC_2019_méxico'),
+            ('Localidades_19_GUANAJUATO', 'INEGI_UNIQUELOC_2019_guanajuato'),
+            ('Localidades_19_QUERÉTARO', 'INEGI_UNIQUELOC_2019_querétaro'),
+            ('Localidades_19_ZACATECAS', 'INEGI_UNIQUELOC_2019_zacatecas'),
+            ('Localidades_19_VERACRUZ_DE_IGNACIO_DE_LA_LLAVE', 'INEGI_UNIQUELOC_2019_veracruz_de_ignacio_de_la_llave'),
+            ('Localidades_19_HIDALGO', 'INEGI_UNIQUELOC_2019_hidalgo'),
+            ('Localidades_19_MICHOACÁN_DE_OCAMPO', 'INEGI_UNIQUELOC_2019_michoacán_de_ocampo'),
+            ('Localidades_19_OAXACA', 'INEGI_UNIQUELOC_2019_oaxaca'),
+            ('Localidades_19_COLIMA', 'INEGI_UNIQUELOC_2019_colima'),
+            ('Localidades_19_CHIAPAS', 'INEGI_UNIQUELOC_2019_chiapas'),
+            ('Localidades_19_SAN_LUIS_POTOSÍ', 'INEGI_UNIQUELOC_2019_san_luis_potosí'),
+            ('Localidades_19_JALISCO', 'INEGI_UNIQUELOC_2019_jalisco'),
+            ('Localidades_19_NAYARIT', 'INEGI_UNIQUELOC_2019_nayarit')
+        ]
+        diccionario_LOC_19 = pd.concat(
+            fuzzy_merge_localidades_por_entidad(jobs, listados_beneficiarios_por_entidad, inegi_uniquelocs,
+                                                max_workers=max_workers, method=method), axis=0)
 
         diccionario_LOC_19.drop(columns=['BENEFICIARIO', 'ZONA', 'ENTIDAD', 'MUNICIPIO', 'LOCALIDAD', 'PRODUCTO',
                                          'FECHA', 'MONTO FEDERAL', 'CICLO AGRÍCOLA', 'ENTIDAD_c_benef',
@@ -389,10 +380,10 @@ def data_cleaning3(dataset_inegi, dataset_benef, prefix):
         print('key: ', diccionario_LOC_19_simple.columns)
         print('here is the shape: ', listado_beneficiarios_2019_match.shape)
 
-        listado_beneficiarios_2019_match['MUNICIPIO_Clean'] = listado_beneficiarios_2019_match['MUNICIPIO'].apply(
-            clean_text_inegi)
-        listado_beneficiarios_2019_match['LOCALIDAD_Clean'] = listado_beneficiarios_2019_match['LOCALIDAD'].apply(
-            clean_text_inegi)
+        listado_beneficiarios_2019_match['MUNICIPIO_Clean'] = clean_text_series(
+            listado_beneficiarios_2019_match['MUNICIPIO'])
+        listado_beneficiarios_2019_match['LOCALIDAD_Clean'] = clean_text_series(
+            listado_beneficiarios_2019_match['LOCALIDAD'])
 
         # Create KEY in listado beneficiarios
         listado_beneficiarios_2019_match['Municipio-loc-KEY'] = listado_beneficiarios_2019_match[
@@ -418,11 +409,9 @@ def data_cleaning3(dataset_inegi, dataset_benef, prefix):
                                                                  'Localidad_c_inegi', 'POB_TOTAL'])
         INEGI_UNIQUELOC_2019 = INEGI_UNIQUELOC_2019.drop_duplicates(subset='KEY_inegi_localidad', keep='first')
 
-        listado_beneficiarios_parte_II_localidades = pd.merge(listado_beneficiarios_parte_I_localidades,
-                                                              INEGI_UNIQUELOC_2019,
-                                                              left_on="KEY_inegi_localidad",
-                                                              right_on="KEY_inegi_localidad", how='left',
-                                                              suffixes=('_benef', '_inegi'))
+        listado_beneficiarios_parte_II_localidades = merge_inegi(listado_beneficiarios_parte_I_localidades,
+                                                                 'KEY_inegi_localidad', INEGI_UNIQUELOC_2019,
+                                                                 indice_LOC)
 
         listado_beneficiarios_parte_II_localidades.drop(columns=['ENTIDAD', 'MUNICIPIO', 'LOCALIDAD', 'ENTIDAD_c_benef',
                                                                  'MUNICIPIO_c_benef', 'LOCALIDAD_c_benef',
@@ -446,18 +435,19 @@ def data_cleaning3(dataset_inegi, dataset_benef, prefix):
                                                                    'MONTO FEDERAL': 'Monto entregado',
                                                                    'CICLO AGRÍCOLA': 'Ciclo agrícola'}, inplace=True)
 
-        listado_beneficiarios_parte_II_localidades.to_csv(
-            'data/listados_completos/listado_beneficiarios_2019_localidades.csv', index=False)
+        write_table(listado_beneficiarios_parte_II_localidades,
+                    'data/listados_completos/listado_beneficiarios_2019_localidades.csv', fmt=FORMATO)
+        load_padron(listado_beneficiarios_parte_II_localidades, 'beneficiarios', 2019)
 
     elif prefix == 20:
         listado_beneficiarios_2020_match = pd.read_csv('data/listados_completos/listado_beneficiarios_2020_match.csv')
 
-        listado_beneficiarios_2020_match['ENTIDAD_c_benef'] = listado_beneficiarios_2020_match['ENTIDAD'].apply(
-            clean_text_inegi)
-        listado_beneficiarios_2020_match['MUNICIPIO_c_benef'] = listado_beneficiarios_2020_match['MUNICIPIO'].apply(
-            clean_text_inegi)
-        listado_beneficiarios_2020_match['LOCALIDAD_c_benef'] = listado_beneficiarios_2020_match['LOCALIDAD'].apply(
-            clean_text_inegi)
+        listado_beneficiarios_2020_match['ENTIDAD_c_benef'] = clean_text_series(
+            listado_beneficiarios_2020_match['ENTIDAD'])
+        listado_beneficiarios_2020_match['MUNICIPIO_c_benef'] = clean_text_series(
+            listado_beneficiarios_2020_match['MUNICIPIO'])
+        listado_beneficiarios_2020_match['LOCALIDAD_c_benef'] = clean_text_series(
+            listado_beneficiarios_2020_match['LOCALIDAD'])
 
         listado_beneficiarios_2020_match['KEY_benef_loc'] = listado_beneficiarios_2020_match[
                                                                 'MUNICIPIO_c_benef'].astype(str) + '-' + \
@@ -471,33 +461,15 @@ def data_cleaning3(dataset_inegi, dataset_benef, prefix):
         listados_beneficiarios_por_entidad = create_listados_por_entidad(listado_beneficiarios_2020, entities, 20)
         inegi_uniquelocs = load_inegi_uniqueloc('data/productores_beneficiarios 2019-2022/diccionarios_E3/2020')
 
-        Localidades_20_GUERRERO_parte_I = fuzzy_merge_benef2019_2022(
-            listados_beneficiarios_por_entidad['Localidades_20_GUERRERO'],
-            inegi_uniquelocs['INEGI_UNIQUELOC_2020_guerrero'], 'KEY_benef_loc', 'KEY_inegi_localidad')
-        Localidades_20_GUERRERO_parte_I.shape
-
-        Localidades_20_PUEBLA_parte_I = fuzzy_merge_benef2019_2022(
-            listados_beneficiarios_por_entidad['Localidades_20_PUEBLA'],
-            inegi_uniquelocs['INEGI_UNIQUELOC_2020_puebla'], 'KEY_benef_loc', 'KEY_inegi_localidad')
-        Localidades_20_PUEBLA_parte_I.shape
-
-        Localidades_20_MORELOS_parte_I = fuzzy_merge_benef2019_2022(
-            listados_beneficiarios_por_entidad['Localidades_20_MORELOS'],
-            inegi_uniquelocs['INEGI_UNIQUELOC_2020_morelos'], 'KEY_benef_loc', 'KEY_inegi_localidad')
-        Localidades_20_MORELOS_parte_I.shape
-
-        Localidades_20_TLAXCALA_parte_I = fuzzy_merge_benef2019_2022(
-            listados_beneficiarios_por_entidad['Localidades_20_TLAXCALA'],
-            inegi_uniquelocs['INEGI_UNIQUELOC_2020_tlaxcala'], 'KEY_benef_loc', 'KEY_inegi_localidad')
-        Localidades_20_TLAXCALA_parte_I.shape
-
-        # Concatenate datasets vertically
-        diccionario_LOC_20 = pd.concat([
-            Localidades_20_GUERRERO_parte_I,
-            Localidades_20_PUEBLA_parte_I,
-            Localidades_20_MORELOS_parte_I,
-            Localidades_20_TLAXCALA_parte_I
-        ], axis=0)
+        jobs = [
+            ('Localidades_20_GUERRERO', 'INEGI_UNIQUELOC_2020_guerrero'),
+            ('Localidades_20_PUEBLA', 'INEGI_UNIQUELOC_2020_puebla'),
+            ('Localidades_20_MORELOS', 'INEGI_UNIQUELOC_2020_morelos'),
+            ('Localidades_20_TLAXCALA', 'INEGI_UNIQUELOC_2020_tlaxcala')
+        ]
+        diccionario_LOC_20 = pd.concat(
+            fuzzy_merge_localidades_por_entidad(jobs, listados_beneficiarios_por_entidad, inegi_uniquelocs,
+                                                max_workers=max_workers, method=method), axis=0)
 
         diccionario_LOC_20.drop(columns=['BENEFICIARIO', 'ZONA', 'ENTIDAD', 'MUNICIPIO', 'LOCALIDAD', 'PRODUCTO',
                                          'FECHA', 'MONTO FEDERAL', 'CICLO AGRÍCOLA', 'ENTIDAD_c_benef',
@@ -523,10 +495,10 @@ def data_cleaning3(dataset_inegi, dataset_benef, prefix):
         diccionario_LOC_20_simple.rename(columns={'ï»¿KEY_benef_loc': 'KEY_benef_loc'}, inplace=True)
         print('here is the shape: ', listado_beneficiarios_2020_match.shape)
 
-        listado_beneficiarios_2020_match['MUNICIPIO_Clean'] = listado_beneficiarios_2020_match['MUNICIPIO'].apply(
-            clean_text_inegi)
-        listado_beneficiarios_2020_match['LOCALIDAD_Clean'] = listado_beneficiarios_2020_match['LOCALIDAD'].apply(
-            clean_text_inegi)
+        listado_beneficiarios_2020_match['MUNICIPIO_Clean'] = clean_text_series(
+            listado_beneficiarios_2020_match['MUNICIPIO'])
+        listado_beneficiarios_2020_match['LOCALIDAD_Clean'] = clean_text_series(
+            listado_beneficiarios_2020_match['LOCALIDAD'])
 
         # Create KEY in listado beneficiarios
         listado_beneficiarios_2020_match['Municipio-loc-KEY'] = listado_beneficiarios_2020_match[
@@ -554,11 +526,9 @@ def data_cleaning3(dataset_inegi, dataset_benef, prefix):
                                                                  'Localidad_c_inegi', 'POB_TOTAL'])
         INEGI_UNIQUELOC_2020 = INEGI_UNIQUELOC_2020.drop_duplicates(subset='KEY_inegi_localidad', keep='first')
 
-        listado_beneficiarios_parte_II_localidades = pd.merge(listado_beneficiarios_parte_I_localidades,
-                                                              INEGI_UNIQUELOC_2020,
-                                                              left_on="KEY_inegi_localidad",
-                                                              right_on="KEY_inegi_localidad", how='left',
-                                                              suffixes=('_benef', '_inegi'))
+        listado_beneficiarios_parte_II_localidades = merge_inegi(listado_beneficiarios_parte_I_localidades,
+                                                                 'KEY_inegi_localidad', INEGI_UNIQUELOC_2020,
+                                                                 indice_LOC)
 
         print('listado_beneficiarios_parte_II_localidades: ', listado_beneficiarios_parte_II_localidades.columns)
 
@@ -584,8 +554,9 @@ def data_cleaning3(dataset_inegi, dataset_benef, prefix):
                                                                    'MONTO FEDERAL': 'Monto entregado',
                                                                    'CICLO AGRÍCOLA': 'Ciclo agrícola'}, inplace=True)
 
-        listado_beneficiarios_parte_II_localidades.to_csv(
-            'data/listados_completos/listado_beneficiarios_2020_localidades.csv', index=False)
+        write_table(listado_beneficiarios_parte_II_localidades,
+                    'data/listados_completos/listado_beneficiarios_2020_localidades.csv', fmt=FORMATO)
+        load_padron(listado_beneficiarios_parte_II_localidades, 'beneficiarios', 2020)
 
     elif prefix == 21:
         listado_beneficiarios_2021 = listado_beneficiarios_parte_II.copy()
@@ -595,33 +566,15 @@ def data_cleaning3(dataset_inegi, dataset_benef, prefix):
         listados_beneficiarios_por_entidad = create_listados_por_entidad(listado_beneficiarios_2021, entities, 21)
         inegi_uniquelocs = load_inegi_uniqueloc('data/productores_beneficiarios 2019-2022/diccionarios_E3/2021')
 
-        Localidades_21_GUERRERO_parte_I = fuzzy_merge_benef2019_2022(
-            listados_beneficiarios_por_entidad['Localidades_21_GUERRERO'],
-            inegi_uniquelocs['INEGI_UNIQUELOC_2021_guerrero'], 'KEY_benef_loc', 'KEY_inegi_localidad')
-        Localidades_21_GUERRERO_parte_I.shape
-
-        Localidades_21_PUEBLA_parte_I = fuzzy_merge_benef2019_2022(
-            listados_beneficiarios_por_entidad['Localidades_21_PUEBLA'],
-            inegi_uniquelocs['INEGI_UNIQUELOC_2021_puebla'], 'KEY_benef_loc', 'KEY_inegi_localidad')
-        Localidades_21_PUEBLA_parte_I.shape
-
-        Localidades_21_MORELOS_parte_I = fuzzy_merge_benef2019_2022(
-            listados_beneficiarios_por_entidad['Localidades_21_MORELOS'],
-            inegi_uniquelocs['INEGI_UNIQUELOC_2021_morelos'], 'KEY_benef_loc', 'KEY_inegi_localidad')
-        Localidades_21_MORELOS_parte_I.shape
-
-        Localidades_21_TLAXCALA_parte_I = fuzzy_merge_benef2019_2022(
-            listados_beneficiarios_por_entidad['Localidades_21_TLAXCALA'],
-            inegi_uniquelocs['INEGI_UNIQUELOC_2021_tlaxcala'], 'KEY_benef_loc', 'KEY_inegi_localidad')
-        Localidades_21_TLAXCALA_parte_I.shape
-
-        # Concatenate datasets vertically
-        diccionario_LOC_21 = pd.concat([
-            Localidades_21_GUERRERO_parte_I,
-            Localidades_21_PUEBLA_parte_I,
-            Localidades_21_MORELOS_parte_I,
-            Localidades_21_TLAXCALA_parte_I
-        ], axis=0)
+        jobs = [
+            ('Localidades_21_GUERRERO', 'INEGI_UNIQUELOC_2021_guerrero'),
+            ('Localidades_21_PUEBLA', 'INEGI_UNIQUELOC_2021_puebla'),
+            ('Localidades_21_MORELOS', 'INEGI_UNIQUELOC_2021_morelos'),
+            ('Localidades_21_TLAXCALA', 'INEGI_UNIQUELOC_2021_tlaxcala')
+        ]
+        diccionario_LOC_21 = pd.concat(
+            fuzzy_merge_localidades_por_entidad(jobs, listados_beneficiarios_por_entidad, inegi_uniquelocs,
+                                                max_workers=max_workers, method=method), axis=0)
 
         diccionario_LOC_21.drop(columns=['BENEFICIARIO', 'ZONA', 'ENTIDAD', 'MUNICIPIO', 'LOCALIDAD', 'PRODUCTO',
                                          'FECHA', 'MONTO FEDERAL', 'CICLO AGRÍCOLA', 'KEY_benef_mun',
@@ -648,10 +601,10 @@ def data_cleaning3(dataset_inegi, dataset_benef, prefix):
         print('key: ', diccionario_LOC_21_simple.columns)
         print('here is the shape: ', listado_beneficiarios_parte_II.shape)
 
-        listado_beneficiarios_parte_II['MUNICIPIO_Clean'] = listado_beneficiarios_parte_II['MUNICIPIO'].apply(
-            clean_text_inegi)
-        listado_beneficiarios_parte_II['LOCALIDAD_Clean'] = listado_beneficiarios_parte_II['LOCALIDAD'].apply(
-            clean_text_inegi)
+        listado_beneficiarios_parte_II['MUNICIPIO_Clean'] = clean_text_series(
+            listado_beneficiarios_parte_II['MUNICIPIO'])
+        listado_beneficiarios_parte_II['LOCALIDAD_Clean'] = clean_text_series(
+            listado_beneficiarios_parte_II['LOCALIDAD'])
 
         # Create KEY in listado beneficiarios
         listado_beneficiarios_parte_II['Municipio-loc-KEY'] = listado_beneficiarios_parte_II['MUNICIPIO_Clean'].astype(
@@ -679,11 +632,9 @@ def data_cleaning3(dataset_inegi, dataset_benef, prefix):
         INEGI_UNIQUELOC_2021 = INEGI_UNIQUELOC_2021.drop_duplicates(subset='KEY_inegi_localidad', keep='first')
 
         # TODO: REVISAR ESTA PARTE (ARTURO)
-        listado_beneficiarios_parte_II_localidades = pd.merge(listado_beneficiarios_parte_I_localidades,
-                                                              INEGI_UNIQUELOC_2021,
-                                                              left_on="KEY_inegi_localidad",
-                                                              right_on="KEY_inegi_localidad", how='left',
-                                                              suffixes=('_benef', '_inegi'))
+        listado_beneficiarios_parte_II_localidades = merge_inegi(listado_beneficiarios_parte_I_localidades,
+                                                                 'KEY_inegi_localidad', INEGI_UNIQUELOC_2021,
+                                                                 indice_LOC)
 
         listado_beneficiarios_parte_II_localidades.drop(columns=['ENTIDAD', 'MUNICIPIO', 'LOCALIDAD', 'KEY_benef_mun',
                                                                  'CVE_ENT_benef', 'Entidad_inegi_benef',
@@ -709,8 +660,9 @@ def data_cleaning3(dataset_inegi, dataset_benef, prefix):
                                                                    'MONTO FEDERAL': 'Monto entregado',
                                                                    'CICLO AGRÍCOLA': 'Ciclo agrícola'}, inplace=True)
 
-        listado_beneficiarios_parte_II_localidades.to_csv(
-            'data/listados_completos/listado_beneficiarios_2021_localidades.csv', index=False)
+        write_table(listado_beneficiarios_parte_II_localidades,
+                    'data/listados_completos/listado_beneficiarios_2021_localidades.csv', fmt=FORMATO)
+        load_padron(listado_beneficiarios_parte_II_localidades, 'beneficiarios', 2021)
 
     elif prefix == 22:
 
@@ -723,62 +675,20 @@ def data_cleaning3(dataset_inegi, dataset_benef, prefix):
         listados_beneficiarios_por_entidad = create_listados_por_entidad(listado_beneficiarios_2022, entities, 22)
         inegi_uniquelocs = load_inegi_uniqueloc('data/productores_beneficiarios 2019-2022/diccionarios_E3/2022')
 
-        Localidades_22_GUERRERO_parte_I = fuzzy_merge_benef2019_2022(
-            listados_beneficiarios_por_entidad['Localidades_22_GUERRERO'],
-            inegi_uniquelocs['INEGI_UNIQUELOC_2022_guerrero'], 'KEY_benef_loc', 'KEY_inegi_localidad')
-        Localidades_22_GUERRERO_parte_I.shape
-
-        Localidades_22_PUEBLA_parte_I = fuzzy_merge_benef2019_2022(
-            listados_beneficiarios_por_entidad['Localidades_22_PUEBLA'],
-            inegi_uniquelocs['INEGI_UNIQUELOC_2022_puebla'], 'KEY_benef_loc', 'KEY_inegi_localidad')
-        Localidades_22_PUEBLA_parte_I.shape
-
-        Localidades_22_MORELOS_parte_I = fuzzy_merge_benef2019_2022(
-            listados_beneficiarios_por_entidad['Localidades_22_MORELOS'],
-            inegi_uniquelocs['INEGI_UNIQUELOC_2022_morelos'], 'KEY_benef_loc', 'KEY_inegi_localidad')
-        Localidades_22_MORELOS_parte_I.shape
-
-        Localidades_22_TLAXCALA_parte_I = fuzzy_merge_benef2019_2022(
-            listados_beneficiarios_por_entidad['Localidades_22_TLAXCALA'],
-            inegi_uniquelocs['INEGI_UNIQUELOC_2022_tlaxcala'], 'KEY_benef_loc', 'KEY_inegi_localidad')
-        Localidades_22_TLAXCALA_parte_I.shape
-
-        Localidades_22_DURANGO_parte_I = fuzzy_merge_benef2019_2022(
-            listados_beneficiarios_por_entidad['Localidades_22_DURANGO'],
-            inegi_uniquelocs['INEGI_UNIQUELOC_2022_durango'], 'KEY_benef_loc', 'KEY_inegi_localidad')
-        Localidades_22_DURANGO_parte_I.shape
-
-        Localidades_22_OAXACA_parte_I = fuzzy_merge_benef2019_2022(
-            listados_beneficiarios_por_entidad['Localidades_22_OAXACA'],
-            inegi_uniquelocs['INEGI_UNIQUELOC_2022_oaxaca'], 'KEY_benef_loc', 'KEY_inegi_localidad')
-        Localidades_22_OAXACA_parte_I.shape
-
-        Localidades_22_NAYARIT_parte_I = fuzzy_merge_benef2019_2022(
-            listados_beneficiarios_por_entidad['Localidades_22_NAYARIT'],
-            inegi_uniquelocs['INEGI_UNIQUELOC_2022_nayarit'], 'KEY_benef_loc', 'KEY_inegi_localidad')
-        Localidades_22_NAYARIT_parte_I.shape
-
-        Localidades_22_CHIAPAS_parte_I = fuzzy_merge_benef2019_2022(
-            listados_beneficiarios_por_entidad['Localidades_22_CHIAPAS'],
-            inegi_uniquelocs['INEGI_UNIQUELOC_2022_chiapas'], 'KEY_benef_loc', 'KEY_inegi_localidad')
-        Localidades_22_CHIAPAS_parte_I.shape
-
-        Localidades_22_ZACATECAS_parte_I = fuzzy_merge_benef2019_2022(
-            listados_beneficiarios_por_entidad['Localidades_22_ZACATECAS'],
-            inegi_uniquelocs['INEGI_UNIQUELOC_2022_zacatecas'], 'KEY_benef_loc', 'KEY_inegi_localidad')
-        Localidades_22_ZACATECAS_parte_I.shape
-
-        diccionario_LOC_22 = pd.concat([
-            Localidades_22_GUERRERO_parte_I,
-            Localidades_22_PUEBLA_parte_I,
-            Localidades_22_MORELOS_parte_I,
-            Localidades_22_TLAXCALA_parte_I,
-            Localidades_22_DURANGO_parte_I,
-            Localidades_22_OAXACA_parte_I,
-            Localidades_22_NAYARIT_parte_I,
-            Localidades_22_CHIAPAS_parte_I,
-            Localidades_22_ZACATECAS_parte_I
-        ], axis=0)
+        jobs = [
+            ('Localidades_22_GUERRERO', 'INEGI_UNIQUELOC_2022_guerrero'),
+            ('Localidades_22_PUEBLA', 'INEGI_UNIQUELOC_2022_puebla'),
+            ('Localidades_22_MORELOS', 'INEGI_UNIQUELOC_2022_morelos'),
+            ('Localidades_22_TLAXCALA', 'INEGI_UNIQUELOC_2022_tlaxcala'),
+            ('Localidades_22_DURANGO', 'INEGI_UNIQUELOC_2022_durango'),
+            ('Localidades_22_OAXACA', 'INEGI_UNIQUELOC_2022_oaxaca'),
+            ('Localidades_22_NAYARIT', 'INEGI_UNIQUELOC_2022_nayarit'),
+            ('Localidades_22_CHIAPAS', 'INEGI_UNIQUELOC_2022_chiapas'),
+            ('Localidades_22_ZACATECAS', 'INEGI_UNIQUELOC_2022_zacatecas')
+        ]
+        diccionario_LOC_22 = pd.concat(
+            fuzzy_merge_localidades_por_entidad(jobs, listados_beneficiarios_por_entidad, inegi_uniquelocs,
+                                                max_workers=max_workers, method=method), axis=0)
 
         diccionario_LOC_22.drop(columns=['BENEFICIARIO', 'ZONA', 'ENTIDAD', 'MUNICIPIO', 'LOCALIDAD', 'PRODUCTO',
                                          'FECHA', 'MONTO FEDERAL', 'CICLO AGRÍCOLA', 'KEY_benef_mun',
@@ -806,10 +716,10 @@ def data_cleaning3(dataset_inegi, dataset_benef, prefix):
 
         print('here is the shape: ', listado_beneficiarios_parte_II.shape)
 
-        listado_beneficiarios_parte_II['MUNICIPIO_Clean'] = listado_beneficiarios_parte_II['MUNICIPIO'].apply(
-            clean_text_inegi)
-        listado_beneficiarios_parte_II['LOCALIDAD_Clean'] = listado_beneficiarios_parte_II['LOCALIDAD'].apply(
-            clean_text_inegi)
+        listado_beneficiarios_parte_II['MUNICIPIO_Clean'] = clean_text_series(
+            listado_beneficiarios_parte_II['MUNICIPIO'])
+        listado_beneficiarios_parte_II['LOCALIDAD_Clean'] = clean_text_series(
+            listado_beneficiarios_parte_II['LOCALIDAD'])
 
         # Create KEY in listado beneficiarios
         listado_beneficiarios_parte_II['Municipio-loc-KEY'] = listado_beneficiarios_parte_II['MUNICIPIO_Clean'].astype(
@@ -831,11 +741,9 @@ def data_cleaning3(dataset_inegi, dataset_benef, prefix):
         INEGI_UNIQUELOC_2022 = INEGI_UNIQUELOC_2022.drop_duplicates(subset='KEY_inegi_localidad', keep='first')
 
         # TODO: REVISAR ESTA PARTE (ARTURO)
-        listado_beneficiarios_parte_II_localidades = pd.merge(listado_beneficiarios_parte_I_localidades,
-                                                              INEGI_UNIQUELOC_2022,
-                                                              left_on="KEY_inegi_localidad",
-                                                              right_on="KEY_inegi_localidad", how='left',
-                                                              suffixes=('_benef', '_inegi'))
+        listado_beneficiarios_parte_II_localidades = merge_inegi(listado_beneficiarios_parte_I_localidades,
+                                                                 'KEY_inegi_localidad', INEGI_UNIQUELOC_2022,
+                                                                 indice_LOC)
 
         listado_beneficiarios_parte_II_localidades.drop(columns=['ENTIDAD', 'MUNICIPIO', 'LOCALIDAD', 'KEY_benef_mun',
                                                                  'CVE_ENT_benef', 'Entidad_inegi_benef',
@@ -861,8 +769,9 @@ def data_cleaning3(dataset_inegi, dataset_benef, prefix):
                                                                    'MONTO FEDERAL': 'Monto entregado',
                                                                    'CICLO AGRÍCOLA': 'Ciclo agrícola'}, inplace=True)
 
-        listado_beneficiarios_parte_II_localidades.to_csv(
-            'data/listados_completos/listado_beneficiarios_2022_localidades.csv', index=False)
+        write_table(listado_beneficiarios_parte_II_localidades,
+                    'data/listados_completos/listado_beneficiarios_2022_localidades.csv', fmt=FORMATO)
+        load_padron(listado_beneficiarios_parte_II_localidades, 'beneficiarios', 2022)
 
 
 def main():
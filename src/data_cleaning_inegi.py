@@ -1,48 +1,13 @@
-import pandas as pd
-import seaborn as sns
-from thefuzz import fuzz
-from thefuzz import process
-import matplotlib.pyplot as plt
-import numpy as np
+import json
 import os
-import glob
-import re
-import unidecode
-
-
-def clean_text(text):
-    """
-    De esta manera tenemos el texto sin espacios blancos extra y sobre todo con todas las palabras con capitalización correcta.
-    """
-    if pd.isna(text):
-        return text
-    text = text.strip()  # Eliminate white spaces
-    text = text.lower()  # Convert to lowercase
-    text = unidecode.unidecode(text)  # Remove accents
-    text = re.sub('-.*-', '', text)
-    text = re.sub('\s+', ' ', text)  # Eliminate extra white spaces
-    text = re.sub('^\s+|\s+?$', '', text)  # Eliminate spaces at the beginning and end
-    return text
-
-
-def load_dataset(path, encoding='utf-8'):
-    return pd.read_csv(path, encoding=encoding, dtype={'CVE_ENT': str, 'CVE_MUN': str})
+from src.inegi_catalog import load_inegi_catalog, update_inegi_catalog
+from src.storage import FORMATO, table_path, write_table
 
 
 def drop_columns(dataset, columns):
     return dataset.drop(columns, axis=1)
 
 
-def remove_duplicates(dataset):
-    return dataset.drop_duplicates()
-
-
-def clean_text_column(dataset, columns):
-    for column in columns:
-        dataset[f'{column}_Clean'] = dataset[column].apply(clean_text)
-    return dataset
-
-
 def rename_columns(dataset):
     return dataset.rename(columns={
         'CVE_ENT': 'CVE_ENT',
@@ -57,39 +22,42 @@ def rename_columns(dataset):
     })
 
 
-def save_dataset(dataset, path):
-    dataset.to_csv(path, index=False)
-
+def _source_hash_path(output_path):
+    return table_path(output_path) + '.json'
 
-def clean_inegi():
-    COLUMNS_TO_DROP = ['MAPA', 'Estatus', 'NOM_ABR', 'AMBITO', 'LATITUD', 'LONGITUD',
-                       'LAT_DECIMAL', 'LON_DECIMAL', 'ALTITUD', 'CVE_CARTA', 'POB_MASCULINA',
-                       'POB_FEMENINA', 'TOTAL DE VIVIENDAS HABITADAS']
 
-    columns_to_clean = ['NOM_ENT', 'NOM_MUN', 'NOM_LOC']
+def _read_source_hash(output_path):
+    # Hash sha256 del fichero de INEGI con el que se generó el dataset limpio, None si no se sabe
+    try:
+        with open(_source_hash_path(output_path), encoding='utf-8') as file:
+            return json.load(file)['sha256']
+    except (OSError, ValueError, KeyError):
+        return None
 
-    paths = {
-        '2019': 'data/inegi/dataset_inegi_2019.csv',
-        '2020': 'data/inegi/dataset_inegi_2020.csv',
-        '2021': 'data/inegi/dataset_inegi_2021.csv',
-        '2022': 'data/inegi/dataset_inegi_2022.csv'
-    }
 
-    for year, path in paths.items():
-        dataset = load_dataset(path, encoding='utf-8')
-        dataset = drop_columns(dataset, COLUMNS_TO_DROP)
-        dataset = remove_duplicates(dataset)
-        dataset = clean_text_column(dataset, columns_to_clean)
+def clean_inegi(cuts=('2019', '2020', '2021', '2022', '2024')):
+    """
+    Genera los dataset_inegi_clean* de cada corte, en FORMATO, a partir de su catálogo de localidades. Junto a
+    cada dataset limpio se guarda en un .json el hash sha256 del fichero de INEGI del que sale, y el dataset solo
+    se reescribe si falta o si ese hash no es el del manifiesto del catálogo; si no, no se hace nada.
+    """
+    for cut in cuts:
+        manifest = update_inegi_catalog(cut)
+        # El corte de 2024 es el dataset principal, dataset_inegi.csv
+        if cut == '2024':
+            output_path = 'data/inegi/dataset_inegi_clean.csv'
+        else:
+            output_path = f'data/inegi/dataset_inegi_clean_{cut}.csv'
+        # No basta con manifest['rebuilt']: los catálogos pueden haberse regenerado en otra llamada (por ejemplo
+        # desde load_inegi_catalog) sin que se reescribiera el dataset limpio
+        if os.path.exists(table_path(output_path)) and _read_source_hash(output_path) == manifest['sha256']:
+            continue
+        dataset = load_inegi_catalog(cut, 'localidades')
+        dataset = drop_columns(dataset, ['KEY_inegi', 'KEY_inegi_localidad'])
         dataset = rename_columns(dataset)
-        save_dataset(dataset, f'data/inegi/dataset_inegi_clean_{year}.csv')
-
-    # Procesar el dataset principal
-    dataset_inegi = load_dataset('data/inegi/dataset_inegi.csv', encoding='cp1252')
-    dataset_inegi = drop_columns(dataset_inegi, COLUMNS_TO_DROP)
-    dataset_inegi = remove_duplicates(dataset_inegi)
-    dataset_inegi = clean_text_column(dataset_inegi, columns_to_clean)
-    dataset_inegi = rename_columns(dataset_inegi)
-    save_dataset(dataset_inegi, 'data/inegi/dataset_inegi_clean.csv')
+        write_table(dataset, output_path, fmt=FORMATO)
+        with open(_source_hash_path(output_path), 'w', encoding='utf-8') as file:
+            json.dump({'cut': cut, 'sha256': manifest['sha256']}, file, indent=2)
 
 
 def main():
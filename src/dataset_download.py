@@ -1,33 +1,307 @@
+import hashlib
+import json
+import os
+import queue
+import time
 import requests
+import urllib3
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from requests.adapters import HTTPAdapter
 from src import scrape_urls
 
-def download_datasets(urls, destination_folder, progress_callback):
-    failed_urls = []
-    good_urls = []
-    total_urls = len(urls)
-
-    for i, url in enumerate(urls):
-        response = requests.get(url)
-        if response.status_code == 200:
-            # Create a file path based on the URL
-            filename = url.split("/")[-1]
-            destination_path = f"{destination_folder}/{filename}"
-            with open(destination_path, 'wb') as file:
-                file.write(response.content)
-            good_urls.append(url)
+# Descargas simultáneas. Todas usan la misma sesión, que mantiene abiertas (keep-alive) hasta este número de
+# conexiones con el servidor, de modo que cada fichero no paga de nuevo la conexión TCP y TLS.
+MAX_WORKERS = 8
+
+# Segundos de espera para conectar y para recibir datos del servidor
+TIMEOUT = (10, 120)
+
+# Tamaño de los bloques en los que se escribe cada descarga
+CHUNK_BYTES = 1 << 20
+
+# Manifiesto de las descargas: por url, el fichero, su ETag y Last-Modified, su tamaño y su hash sha256
+DOWNLOAD_MANIFEST_PATH = 'data/download_manifest.json'
+
+# Cada cuántos segundos se actualiza la barra de progreso como mínimo
+PROGRESS_INTERVAL = 0.2
+
+
+def create_session(pool_size=MAX_WORKERS):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def _part_size(part_path):
+    try:
+        return os.path.getsize(part_path)
+    except OSError:
+        return 0
+
+
+def destination_filename(url):
+    # Nombre del fichero descargado: el último segmento de la url
+    return url.split("/")[-1]
+
+
+def download_file(session, url, destination_folder, on_progress=None, previous=None):
+    """
+    Descarga url en destination_folder por bloques de CHUNK_BYTES, sin tener el fichero en memoria. Se escribe en
+    <fichero>.part, que se renombra al terminar; si la descarga se interrumpe, la siguiente continúa desde el
+    final del .part con una petición Range condicionada con If-Range al ETag o Last-Modified guardados en
+    <fichero>.part.json (si el servidor no admite Range o el fichero ha cambiado, vuelve a empezar).
+
+    previous es la entrada del manifiesto de descargas de la url. Si el fichero descargado entonces sigue en
+    disco, la petición es condicional (If-None-Match / If-Modified-Since) y el servidor no lo vuelve a enviar si
+    no ha cambiado.
+
+    on_progress recibe (bytes descargados, bytes totales o None) a medida que avanza. Devuelve el estado
+    ('updated', 'unchanged' o 'failed') y la nueva entrada del manifiesto (None si ha fallado).
+    """
+    # Create a file path based on the URL
+    filename = destination_filename(url)
+    destination_path = f"{destination_folder}/{filename}"
+    part_path = destination_path + '.part'
+
+    for attempt in range(2):
+        if_range = _read_part_validator(part_path) if attempt == 0 else None
+        # Sin validador no se puede saber si el .part es del fichero que hay ahora en el servidor
+        offset = _part_size(part_path) if if_range else 0
+        if offset:
+            headers = {'Range': f'bytes={offset}-', 'If-Range': if_range}
         else:
-            failed_urls.append(url)
+            headers = _conditional_headers(previous, destination_path)
+        # Sin compresión: los bytes en disco, el offset de Range y Content-Length cuentan lo mismo
+        headers['Accept-Encoding'] = 'identity'
+        digest = _file_digest(part_path) if offset else hashlib.sha256()
+        encoded = False
+        try:
+            with session.get(url, headers=headers, stream=True, timeout=TIMEOUT) as response:
+                if response.status_code == 304:
+                    return 'unchanged', dict(previous, checked_at=time.time())
+                encoded = response.headers.get('Content-Encoding', 'identity').lower() != 'identity'
+                if response.status_code == 416 or (response.status_code == 206 and (
+                        encoded or not _range_starts_at(response, offset))):
+                    # El .part no corresponde a lo que tiene ahora el servidor: se descarga de nuevo
+                    _remove_part(part_path)
+                    continue
+                if response.status_code == 200:
+                    # Fichero completo: el servidor no admite Range o el fichero ha cambiado (If-Range)
+                    offset = 0
+                    digest = hashlib.sha256()
+                elif response.status_code != 206:
+                    return 'failed', None
+
+                validators = {'etag': response.headers.get('ETag'),
+                              'last_modified': response.headers.get('Last-Modified')}
+                if encoded:
+                    # El servidor comprime aunque se le pida lo contrario: Content-Length es el tamaño comprimido
+                    # y lo descargado no se puede continuar con Range
+                    total = None
+                    chunks = response.iter_content(chunk_size=CHUNK_BYTES)
+                else:
+                    length = response.headers.get('Content-Length')
+                    total = offset + int(length) if length is not None else None
+                    chunks = response.raw.stream(CHUNK_BYTES, decode_content=False)
+                    _write_part_validator(part_path, validators)
+                downloaded = offset
+                with open(part_path, 'ab' if offset else 'wb') as file:
+                    for chunk in chunks:
+                        file.write(chunk)
+                        digest.update(chunk)
+                        downloaded += len(chunk)
+                        if on_progress is not None:
+                            on_progress(downloaded, total)
+        except (requests.RequestException, urllib3.exceptions.HTTPError) as error:
+            # Lo descargado se queda en el .part para continuar en la siguiente descarga
+            print(f"Error downloading {url}: {error}")
+            if encoded:
+                _remove_part(part_path)
+            return 'failed', None
+
+        if total is not None and downloaded != total:
+            print(f"Error downloading {url}: {downloaded} of {total} bytes")
+            return 'failed', None
+        os.replace(part_path, destination_path)
+        _remove_part(part_path, validator_only=True)
+        entry = dict(path=destination_path, size=downloaded, sha256=digest.hexdigest(), checked_at=time.time(),
+                     **validators)
+        return 'updated', entry
+    return 'failed', None
+
+
+def _read_part_validator(part_path):
+    """
+    Validador (ETag fuerte o Last-Modified) de la respuesta con la que se empezó a escribir el .part, para la
+    cabecera If-Range: si el fichero ha cambiado en el servidor, este responde con el fichero completo en vez de
+    con el resto del nuevo, que no se puede añadir a lo ya descargado.
+    """
+    if not os.path.exists(part_path):
+        return None
+    try:
+        with open(part_path + '.json', encoding='utf-8') as file:
+            validators = json.load(file)
+    except (OSError, ValueError):
+        return None
+    etag = validators.get('etag')
+    if etag and not etag.startswith('W/'):
+        return etag
+    return validators.get('last_modified')
+
+
+def _write_part_validator(part_path, validators):
+    with open(part_path + '.json', 'w', encoding='utf-8') as file:
+        json.dump(validators, file)
+
+
+def _remove_part(part_path, validator_only=False):
+    paths = [part_path + '.json'] if validator_only else [part_path, part_path + '.json']
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _conditional_headers(previous, destination_path):
+    # Solo se pregunta al servidor si el fichero ha cambiado cuando la copia local es la del manifiesto
+    if not previous or previous.get('path') != destination_path:
+        return {}
+    try:
+        if os.path.getsize(destination_path) != previous.get('size'):
+            return {}
+    except OSError:
+        return {}
+    headers = {}
+    if previous.get('etag'):
+        headers['If-None-Match'] = previous['etag']
+    if previous.get('last_modified'):
+        headers['If-Modified-Since'] = previous['last_modified']
+    return headers
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(CHUNK_BYTES), b''):
+            digest.update(block)
+    return digest
+
+
+def read_download_manifest(path=DOWNLOAD_MANIFEST_PATH):
+    try:
+        with open(path, encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_download_manifest(manifest, path=DOWNLOAD_MANIFEST_PATH):
+    # Se escribe entero en un temporal y se renombra, para no dejar un manifiesto a medias
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path + '.tmp', 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def _range_starts_at(response, offset):
+    # Content-Range: bytes <inicio>-<fin>/<total>
+    content_range = response.headers.get('Content-Range', '')
+    return content_range.startswith(f'bytes {offset}-')
+
+
+def download_datasets(urls, destination_folder, progress_callback, max_workers=MAX_WORKERS, session=None,
+                      manifest_path=DOWNLOAD_MANIFEST_PATH):
+    """
+    Descarga las urls en destination_folder con un pool de max_workers hilos que comparten una sesión de
+    requests. progress_callback recibe el avance (de 0 a 1) por bytes descargados, contando también los
+    ficheros a medio descargar, y se llama desde este hilo, como necesita Streamlit.
+
+    Con manifest_path las descargas son condicionales: los ficheros que no han cambiado en el servidor desde la
+    última descarga no se vuelven a descargar (unchanged_urls) y el resto se descargan (updated_urls).
+    good_urls son ambos; good_urls, failed_urls, unchanged_urls y updated_urls mantienen el orden de urls.
+
+    Las urls repetidas se descargan una sola vez. Una url que se guardaría en el mismo fichero que otra anterior
+    de la lista se da por fallida sin descargarla: las dos escribirían a la vez en el mismo .part.
+    """
+    urls = list(dict.fromkeys(urls))
+    owners = {}
+    downloaded = {}
+    for url in urls:
+        owner = owners.setdefault(destination_filename(url), url)
+        if owner != url:
+            print(f"Error downloading {url}: same destination file as {owner}")
+            downloaded[url] = ('failed', None)
+
+    owns_session = session is None
+    session = session or create_session(max_workers)
+    manifest = read_download_manifest(manifest_path) if manifest_path else {}
+    # Avance de cada url: (bytes descargados, bytes totales o None, terminada)
+    state = {url: (0, None, False) for url in urls if url not in downloaded}
+    updates = queue.Queue()
+
+    def report():
+        while not updates.empty():
+            url, values = updates.get()
+            if values is None:
+                # Descarga terminada (o fallida): cuenta entera
+                size, total, _ = state[url]
+                total = total if total is not None else size
+                values = (total, total, True)
+            state[url] = values
+        if not state:
+            return
+        if all(total is not None for _, total, _ in state.values()):
+            # Todos los tamaños se conocen: avance por bytes
+            total = sum(total for _, total, _ in state.values())
+            progress = sum(size for size, _, _ in state.values()) / total if total else 1.0
+        else:
+            # Mientras no se conocen todos, cada fichero pesa lo mismo
+            progress = sum(1.0 if done else (size / total if total else 0.0)
+                           for size, total, done in state.values()) / len(state)
+        progress_callback(min(progress, 1.0))
+
+    def download(url):
+        result = download_file(session, url, destination_folder,
+                               on_progress=lambda size, total: updates.put((url, (size, total, False))),
+                               previous=manifest.get(url))
+        updates.put((url, None))
+        return result
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(download, url): url for url in state}
+            pending = set(futures)
+            while pending:
+                finished, pending = wait(pending, timeout=PROGRESS_INTERVAL, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    downloaded[futures[future]] = future.result()
+                report()
+    finally:
+        if owns_session:
+            session.close()
+
+    if manifest_path:
+        for url, (status, entry) in downloaded.items():
+            if entry is not None:
+                manifest[url] = entry
+        write_download_manifest(manifest, manifest_path)
 
-        # Calculate and update progress after each URL is processed
-        current_progress = (i + 1) / total_urls
-        progress_callback(current_progress)
+    good_urls = [url for url in urls if downloaded[url][0] != 'failed']
+    failed_urls = [url for url in urls if downloaded[url][0] == 'failed']
+    unchanged_urls = [url for url in urls if downloaded[url][0] == 'unchanged']
+    updated_urls = [url for url in urls if downloaded[url][0] == 'updated']
 
     # Return results
     return {
         'good_count': len(good_urls),
         'good_urls': good_urls,
         'failed_count': len(failed_urls),
-        'failed_urls': failed_urls
+        'failed_urls': failed_urls,
+        'unchanged_count': len(unchanged_urls),
+        'unchanged_urls': unchanged_urls,
+        'updated_count': len(updated_urls),
+        'updated_urls': updated_urls
     }
 # Example usage:
 '''
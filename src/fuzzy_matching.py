@@ -0,0 +1,459 @@
+import logging
+import numpy as np
+from rapidfuzz import fuzz
+from rapidfuzz import process
+from rapidfuzz import utils
+from src.bk_tree import BKTree
+from src.candidate_pruning import candidate_groups
+from src.match_cache import catalog_version, load_cached_matches, save_matches
+from src.match_results import match_result, top_candidates
+from src.phonetic import build_phonetic_index, phonetic_key
+from src.tfidf_matching import TOP_K, extract_best_matches_tfidf
+
+# Incluir estas líneas en cada script para registrar los logs
+logger = logging.getLogger("Fertilizantes")
+
+# Número máximo de celdas (consultas x candidatos) de la matriz de puntuaciones que se calculan de una vez.
+# Con float32 son unos 64 MB por lote.
+MAX_CELDAS_POR_LOTE = 2 ** 24
+
+# Motores de coincidencia disponibles: 'cdist' puntúa con WRatio (igual que process.extractOne), 'bktree'
+# puntúa con ratio usando un índice BK-tree sobre la distancia de edición y 'tfidf' puntúa con WRatio solo los
+# candidatos más parecidos por n-gramas de caracteres (para catálogos nacionales de localidades)
+METHODS = ('cdist', 'bktree', 'tfidf')
+
+# Número de candidatas que se escriben en los diccionarios exportados para la validación manual
+CANDIDATOS_DICCIONARIO = 3
+
+# Índices BK-tree ya construidos, por versión del catálogo
+_BKTREE_INDEX = {}
+MAX_BKTREE_INDEX = 32
+
+# Índices de claves fonéticas ya construidos, por versión del catálogo
+_PHONETIC_INDEX = {}
+MAX_PHONETIC_INDEX = 32
+
+
+def extract_best_matches(queries, choices, score_cutoff=0, scorer=fuzz.WRatio, workers=-1, prune=True, stats=None,
+                         limit=1):
+    """
+    Motor común de coincidencia difusa. Equivale a llamar a process.extractOne(query, choices,
+    score_cutoff=score_cutoff) para cada query, pero puntúa todas las consultas de un lote contra todos
+    los candidatos en una sola llamada vectorizada (rapidfuzz.process.cdist) repartida entre los núcleos.
+
+    queries: Lista de claves a buscar
+    choices: Lista de claves candidatas (por ejemplo, las claves de INEGI)
+    score_cutoff: Umbral de coincidencia difusa, con la misma semántica que en process.extractOne
+    scorer: Función de puntuación de rapidfuzz (por defecto WRatio, igual que thefuzz)
+    workers: Número de núcleos a usar, -1 para usar todos
+    prune: Descartar antes de puntuar los candidatos que por longitud o por caracteres no pueden alcanzar el
+    umbral (ver src/candidate_pruning.py). No cambia el resultado.
+    stats: Diccionario opcional donde se acumulan los pares consulta-candidato posibles ('pairs') y los
+    descartados por la poda ('pruned')
+    limit: Número de candidatas a devolver por clave, como en process.extract. Salen de la misma matriz de
+    puntuaciones que la mejor coincidencia.
+
+    Devuelve dos arrays del mismo tamaño que queries: la mejor coincidencia (None si ninguna supera el
+    umbral) y su puntuación (NaN si ninguna supera el umbral). Con limit > 1 los arrays tienen una columna por
+    candidata, ordenadas de mayor a menor puntuación.
+    """
+    queries = list(queries)
+    choices = list(choices)
+
+    best_matches = np.full((len(queries), limit), None, dtype=object)
+    best_scores = np.full((len(queries), limit), np.nan)
+
+    if len(queries) == 0 or len(choices) == 0:
+        return match_result(best_matches, best_scores, limit)
+
+    # Las claves que no son texto (NaN) no se comparan y se quedan sin coincidencia
+    valid = np.array([isinstance(query, str) for query in queries])
+    valid_idx = np.flatnonzero(valid)
+    valid_queries = [utils.default_process(queries[i]) for i in valid_idx]
+    processed_choices = [utils.default_process(choice) if isinstance(choice, str) else None for choice in choices]
+    choices_array = np.array(choices, dtype=object)
+
+    # thefuzz redondea la puntuación a entero antes de compararla con el umbral, por lo que una
+    # puntuación de 95.5 supera un umbral de 96. Se relaja el corte en medio punto y se filtra tras redondear.
+    cutoff = max(score_cutoff - 0.5, 0)
+
+    if prune:
+        groups = candidate_groups(valid_queries, processed_choices, cutoff, scorer)
+    else:
+        groups = [(np.arange(len(valid_queries)), np.arange(len(choices)))]
+
+    scored_pairs = 0
+    for group_queries, columns in groups:
+        scored_pairs += len(group_queries) * len(columns)
+        if len(columns) == 0:
+            continue
+        group_choices = [processed_choices[column] for column in columns]
+
+        batch_size = max(1, MAX_CELDAS_POR_LOTE // len(columns))
+        for start in range(0, len(group_queries), batch_size):
+            batch_idx = group_queries[start:start + batch_size]
+            scores = process.cdist([valid_queries[i] for i in batch_idx], group_choices, scorer=scorer,
+                                   processor=None, score_cutoff=cutoff, workers=workers)
+            # Se redondea antes de ordenar para que, en caso de empate, gane el primer candidato,
+            # igual que en process.extractOne. Los candidatos descartados no pueden superar el umbral, así
+            # que no alteran el resultado.
+            scores = np.rint(scores)
+            best = top_candidates(scores, limit)
+            scores = np.take_along_axis(scores, best, axis=1)
+
+            rows, ranks = np.nonzero(scores >= score_cutoff)
+            idx = valid_idx[batch_idx]
+            best_matches[idx[rows], ranks] = choices_array[columns[best[rows, ranks]]]
+            best_scores[idx[rows], ranks] = scores[rows, ranks]
+
+    if stats is not None:
+        total_pairs = len(valid_queries) * len(choices)
+        stats['pairs'] = stats.get('pairs', 0) + total_pairs
+        stats['pruned'] = stats.get('pruned', 0) + total_pairs - scored_pairs
+
+    logger.debug("Coincidencia difusa: %s de %s claves con coincidencia (umbral %s, %s candidatos)",
+                int(np.count_nonzero(~np.isnan(best_scores[:, 0]))), len(queries), score_cutoff, len(choices))
+
+    return match_result(best_matches, best_scores, limit)
+
+
+def get_phonetic_index(choices):
+    """
+    Devuelve el índice de claves fonéticas de un catálogo (ver src/phonetic.py). Se construye una sola vez por
+    catálogo y se reutiliza en las siguientes llamadas.
+    """
+    version = catalog_version(choices, 'phonetic')
+    if version not in _PHONETIC_INDEX:
+        if len(_PHONETIC_INDEX) >= MAX_PHONETIC_INDEX:
+            _PHONETIC_INDEX.pop(next(iter(_PHONETIC_INDEX)))
+        _PHONETIC_INDEX[version] = build_phonetic_index(choices)
+    return _PHONETIC_INDEX[version]
+
+
+def get_bktree_index(choices):
+    """
+    Devuelve el BK-tree de un catálogo de candidatos. Se construye una sola vez por catálogo (por ejemplo,
+    cada INEGI_UNIQUELOC_* por estado) y se reutiliza en las siguientes llamadas.
+    """
+    version = catalog_version(choices, 'bktree')
+    if version not in _BKTREE_INDEX:
+        tree = BKTree()
+        for index, choice in enumerate(choices):
+            if isinstance(choice, str):
+                tree.add(utils.default_process(choice), index)
+        if len(_BKTREE_INDEX) >= MAX_BKTREE_INDEX:
+            _BKTREE_INDEX.pop(next(iter(_BKTREE_INDEX)))
+        _BKTREE_INDEX[version] = tree
+    return _BKTREE_INDEX[version]
+
+
+def extract_best_matches_bktree(queries, choices, score_cutoff=0, stats=None, limit=1):
+    """
+    Igual que extract_best_matches con scorer=fuzz.ratio, pero consultando un BK-tree del catálogo en lugar de
+    puntuar todos los candidatos. Del umbral se deriva la distancia Indel máxima que puede tener un candidato
+    para llegar a score_cutoff, y solo se visitan las ramas del árbol que pueden contener candidatos así.
+
+    ratio = 100 * (1 - d / (lq + lc)) >= t  implica  d <= (1 - t) * (lq + lc), y como lc <= lq + d,
+    d <= 2 * (1 - t) * lq / t.
+
+    stats: Igual que en extract_best_matches; los pares descartados son los nodos del árbol no visitados.
+    limit: Igual que en extract_best_matches
+    """
+    queries = list(queries)
+    choices = list(choices)
+
+    best_matches = np.full((len(queries), limit), None, dtype=object)
+    best_scores = np.full((len(queries), limit), np.nan)
+
+    if len(queries) == 0 or len(choices) == 0:
+        return match_result(best_matches, best_scores, limit)
+
+    tree = get_bktree_index(choices)
+    # Misma relajación de medio punto que en extract_best_matches por el redondeo de la puntuación
+    t = max(score_cutoff - 0.5, 0) / 100
+    visited = 0
+
+    for i, query in enumerate(queries):
+        if not isinstance(query, str):
+            continue
+        processed = utils.default_process(query)
+        max_distance = int(2 * (1 - t) * len(processed) / t) if t > 0 else float('inf')
+        candidates, query_visited = tree.search(processed, max_distance)
+        visited += query_visited
+
+        scored = []
+        for index, word, distance in candidates:
+            lensum = len(processed) + len(word)
+            score = np.rint(100 * (1 - distance / lensum)) if lensum else 100
+            if score >= score_cutoff:
+                scored.append((-score, index))
+
+        # En caso de empate gana el primer candidato del catálogo, igual que en process.extractOne
+        for rank, (score, index) in enumerate(sorted(scored)[:limit]):
+            best_matches[i, rank] = choices[index]
+            best_scores[i, rank] = -score
+
+    if stats is not None:
+        total_pairs = tree.size * sum(isinstance(query, str) for query in queries)
+        stats['pairs'] = stats.get('pairs', 0) + total_pairs
+        stats['pruned'] = stats.get('pruned', 0) + total_pairs - visited
+
+    logger.debug("BK-tree: %s nodos visitados de %s posibles para %s claves", visited, tree.size * len(queries),
+                 len(queries))
+
+    return match_result(best_matches, best_scores, limit)
+
+
+def _extract(queries, choices, score_cutoff, method, workers, stats=None, limit=1):
+    # Siempre devuelve arrays con una columna por candidata
+    if method == 'bktree':
+        best_matches, best_scores = extract_best_matches_bktree(queries, choices, score_cutoff=score_cutoff,
+                                                                stats=stats, limit=limit)
+    elif method == 'tfidf':
+        best_matches, best_scores = extract_best_matches_tfidf(queries, choices, score_cutoff=score_cutoff,
+                                                               top_k=TOP_K, workers=workers, stats=stats,
+                                                               limit=limit)
+    else:
+        best_matches, best_scores = extract_best_matches(queries, choices, score_cutoff=score_cutoff,
+                                                         workers=workers, stats=stats, limit=limit)
+    return best_matches.reshape(len(best_matches), limit), best_scores.reshape(len(best_scores), limit)
+
+
+def split_state_key(key):
+    """
+    Separa una clave de la forma estado-municipio en sus dos partes. Si la clave no contiene '-' se devuelve
+    la clave completa como estado y una cadena vacía como municipio.
+    """
+    estado, _, municipio = key.partition('-')
+    return estado, municipio
+
+
+def extract_best_matches_by_state(queries, choices, score_cutoff=0, state_cutoff=80, fallback=False,
+                                  method='cdist', workers=-1, stats=None, limit=1):
+    """
+    Bloqueo por estado para claves de la forma estado-municipio (KEY_inegi, KEY_prod, KEY_benef_mun...).
+    Primero se resuelve la parte de la entidad contra los estados del catálogo de candidatos y después cada
+    clave se compara solo con los municipios de su estado. La puntuación se sigue calculando sobre la clave
+    completa, de modo que score_cutoff tiene el mismo significado que sin bloqueo.
+
+    queries: Lista de claves a buscar
+    choices: Lista de claves candidatas
+    score_cutoff: Umbral de coincidencia difusa de la clave completa
+    state_cutoff: Umbral para resolver la entidad (por ejemplo 'veracruz' contra 'veracruz de ignacio de la llave')
+    fallback: Si es True, las claves sin coincidencia dentro de su estado se buscan en todo el país
+    method: Motor de coincidencia para las claves completas, uno de METHODS
+    workers: Número de núcleos a usar, -1 para usar todos
+    stats: Diccionario opcional con los pares descartados por la poda, como en extract_best_matches
+    limit: Número de candidatas a devolver por clave, como en extract_best_matches
+
+    Devuelve los mismos dos arrays que extract_best_matches.
+    """
+    queries = list(queries)
+    choices = list(choices)
+
+    best_matches = np.full((len(queries), limit), None, dtype=object)
+    best_scores = np.full((len(queries), limit), np.nan)
+
+    if len(queries) == 0 or len(choices) == 0:
+        return match_result(best_matches, best_scores, limit)
+
+    # Bloques de candidatos por estado, conservando el orden original del catálogo
+    blocks = {}
+    for choice in choices:
+        if isinstance(choice, str):
+            blocks.setdefault(split_state_key(choice)[0], []).append(choice)
+    states = list(blocks)
+
+    # Resolver la parte de la entidad de cada clave contra los estados del catálogo
+    query_states = list(dict.fromkeys(split_state_key(query)[0] for query in queries if isinstance(query, str)))
+    resolved = {state: state for state in query_states if state in blocks}
+    pending = [state for state in query_states if state not in blocks]
+    if pending:
+        state_matches, _ = extract_best_matches(pending, states, score_cutoff=state_cutoff, workers=workers)
+        resolved.update({state: match for state, match in zip(pending, state_matches) if match is not None})
+    unresolved = [state for state in query_states if state not in resolved]
+
+    # Agrupar las claves por el estado resuelto y buscar cada grupo solo dentro de su bloque
+    groups = {}
+    for i, query in enumerate(queries):
+        if isinstance(query, str) and split_state_key(query)[0] in resolved:
+            groups.setdefault(resolved[split_state_key(query)[0]], []).append(i)
+
+    for state, idx in groups.items():
+        group_matches, group_scores = _extract([queries[i] for i in idx], blocks[state], score_cutoff, method,
+                                               workers, stats, limit)
+        best_matches[idx] = group_matches
+        best_scores[idx] = group_scores
+
+    unmatched = np.flatnonzero(np.isnan(best_scores[:, 0]))
+    logger.info("Bloqueo por estado: %s de %s claves con coincidencia dentro de su estado. Entidades sin resolver: %s",
+                len(queries) - len(unmatched), len(queries), unresolved)
+
+    if fallback and len(unmatched) > 0:
+        fallback_matches, fallback_scores = _extract([queries[i] for i in unmatched], choices, score_cutoff,
+                                                     method, workers, stats, limit)
+        best_matches[unmatched] = fallback_matches
+        best_scores[unmatched] = fallback_scores
+
+    return match_result(best_matches, best_scores, limit)
+
+
+def _alternatives(queries, matches, choices, score_cutoff, block_by_state, fallback, workers, limit):
+    # Candidatas alternativas (de la segunda a la limit) de las claves resueltas por clave fonética: las mejores
+    # por WRatio que llegan a score_cutoff, sin la coincidencia ya asignada
+    if block_by_state:
+        candidates, scores = extract_best_matches_by_state(queries, choices, score_cutoff=score_cutoff,
+                                                           fallback=fallback, method='cdist', workers=workers,
+                                                           limit=limit)
+    else:
+        candidates, scores = _extract(queries, choices, score_cutoff, 'cdist', workers, limit=limit)
+    candidates = np.asarray(candidates, dtype=object).reshape(len(queries), limit)
+    scores = np.asarray(scores, dtype=float).reshape(len(queries), limit)
+
+    alternatives = np.full((len(queries), limit - 1), None, dtype=object)
+    alternative_scores = np.full((len(queries), limit - 1), np.nan)
+    for i, match in enumerate(matches):
+        keep = [rank for rank in range(limit) if candidates[i, rank] is not None and candidates[i, rank] != match]
+        keep = keep[:limit - 1]
+        alternatives[i, :len(keep)] = candidates[i, keep]
+        alternative_scores[i, :len(keep)] = scores[i, keep]
+    return alternatives, alternative_scores
+
+
+def match_keys(queries, choices, score_cutoff=0, block_by_state=False, fallback=False, method='cdist', workers=-1,
+               cache_path=None, limit=1, phonetic=False, phonetic_cutoff=None):
+    """
+    Punto de entrada común de las funciones fuzzy_merge_*. Devuelve la mejor coincidencia de cada clave de
+    queries dentro de choices y su puntuación. Las claves que aparecen tal cual en choices se resuelven con
+    un hash join (puntuación 100), después se consultan las ya resueltas en la caché en disco y solo las
+    restantes pasan por el motor de coincidencia difusa. Por último, con phonetic, las que siguen sin
+    coincidencia se buscan por clave fonética.
+
+    queries: Lista de claves a buscar
+    choices: Lista de claves candidatas
+    score_cutoff: Umbral de coincidencia difusa
+    block_by_state: Si es True, las claves (estado-municipio) solo se comparan con los candidatos de su estado
+    fallback: Con bloqueo, buscar en todo el país las claves que no encuentran coincidencia en su estado
+    method: Motor de coincidencia, uno de METHODS ('cdist' puntúa con WRatio, 'bktree' con ratio, 'tfidf' con
+    WRatio sobre los candidatos más parecidos por TF-IDF)
+    workers: Número de núcleos a usar, -1 para usar todos
+    cache_path: Ruta de la caché de coincidencias (ver src/match_cache.py), None para no usarla
+    limit: Número de candidatas a devolver por clave. Con limit > 1 se devuelve una columna por candidata,
+    ordenadas de mayor a menor puntuación; las claves con coincidencia exacta solo tienen la primera y las de
+    coincidencia fonética tienen como alternativas las candidatas que llegan a phonetic_cutoff.
+    phonetic: Resolver por igualdad de clave fonética (Xalapa/Jalapa, Villa/Biya...) las claves sin coincidencia
+    difusa. La coincidencia solo se acepta si su puntuación WRatio llega a phonetic_cutoff.
+    phonetic_cutoff: Umbral de las coincidencias fonéticas, None para usar score_cutoff. Puede ser menor que
+    score_cutoff para aceptar variantes ortográficas que no llegan al umbral difuso.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Motor de coincidencia desconocido: {method}. Opciones: {METHODS}")
+    if limit < 1:
+        raise ValueError(f"limit debe ser al menos 1: {limit}")
+
+    queries = np.array(list(queries), dtype=object)
+    choices = list(choices)
+
+    best_matches = np.full((len(queries), limit), None, dtype=object)
+    best_scores = np.full((len(queries), limit), np.nan)
+
+    # Coincidencias exactas
+    catalog = set(choice for choice in choices if isinstance(choice, str))
+    exact = np.array([isinstance(query, str) and query in catalog for query in queries], dtype=bool)
+    best_matches[exact, 0] = queries[exact]
+    best_scores[exact, 0] = 100
+
+    pending = np.flatnonzero(~exact)
+
+    # Coincidencias ya calculadas en ejecuciones anteriores con la misma versión del catálogo
+    cached_count = 0
+    if cache_path is not None and len(pending) > 0:
+        # Con 'tfidf' el resultado depende también del número de candidatos que se puntúan
+        engine_params = (TOP_K,) if method == 'tfidf' else ()
+        version = catalog_version(choices, method, block_by_state, fallback, limit, *engine_params)
+        cached = load_cached_matches(cache_path, version, queries[pending], score_cutoff)
+        hits = np.array([query in cached for query in queries[pending]], dtype=bool)
+        for i in pending[hits]:
+            best_match, score, candidates = cached[queries[i]]
+            for rank, (match, value) in enumerate([(best_match, score)] + candidates):
+                best_matches[i, rank] = match
+                best_scores[i, rank] = np.nan if value is None else value
+        cached_count = int(hits.sum())
+        pending = pending[~hits]
+
+    # Coincidencias difusas para el resto de claves
+    stats = {}
+    if len(pending) > 0:
+        if block_by_state:
+            fuzzy_matches, fuzzy_scores = extract_best_matches_by_state(queries[pending], choices,
+                                                                        score_cutoff=score_cutoff, fallback=fallback,
+                                                                        method=method, workers=workers, stats=stats,
+                                                                        limit=limit)
+            fuzzy_matches = fuzzy_matches.reshape(len(pending), limit)
+            fuzzy_scores = fuzzy_scores.reshape(len(pending), limit)
+        else:
+            fuzzy_matches, fuzzy_scores = _extract(queries[pending], choices, score_cutoff, method, workers, stats,
+                                                   limit)
+        best_matches[pending] = fuzzy_matches
+        best_scores[pending] = fuzzy_scores
+        if cache_path is not None:
+            save_matches(cache_path, version, queries[pending], fuzzy_matches, fuzzy_scores, score_cutoff)
+
+    fuzzy_count = int(np.count_nonzero(~np.isnan(best_scores[pending, 0])))
+
+    # Coincidencias por clave fonética, con búsquedas en un diccionario en lugar de puntuar todos los pares. Solo
+    # para las claves sin coincidencia difusa, de modo que nunca sustituyen a una candidata con mejor puntuación
+    phonetic_count = 0
+    unmatched = pending[np.isnan(best_scores[pending, 0])]
+    if phonetic and len(unmatched) > 0:
+        index = get_phonetic_index(choices)
+        phonetic_matches = np.array([index.get(phonetic_key(query)) for query in queries[unmatched]], dtype=object)
+        hits = np.array([match is not None for match in phonetic_matches], dtype=bool)
+        if hits.any():
+            phonetic_scores = np.rint(process.cpdist(queries[unmatched[hits]], phonetic_matches[hits],
+                                                     scorer=fuzz.WRatio, processor=utils.default_process,
+                                                     workers=workers))
+            # Las coincidencias fonéticas por debajo del umbral no se aceptan
+            phonetic_cutoff = score_cutoff if phonetic_cutoff is None else phonetic_cutoff
+            accepted = phonetic_scores >= phonetic_cutoff
+            hits[np.flatnonzero(hits)[~accepted]] = False
+            best_matches[unmatched[hits], 0] = phonetic_matches[hits]
+            best_scores[unmatched[hits], 0] = phonetic_scores[accepted]
+            if limit > 1 and hits.any():
+                alternatives, alternative_scores = _alternatives(queries[unmatched[hits]], phonetic_matches[hits],
+                                                                 choices, phonetic_cutoff, block_by_state, fallback,
+                                                                 workers, limit)
+                best_matches[unmatched[hits], 1:] = alternatives
+                best_scores[unmatched[hits], 1:] = alternative_scores
+        phonetic_count = int(hits.sum())
+    logger.info("Claves resueltas: %s por coincidencia exacta, %s por clave fonética, %s desde la caché, "
+                "%s por coincidencia difusa, %s sin coincidencia (total %s)", int(exact.sum()), phonetic_count,
+                cached_count, fuzzy_count, len(pending) - fuzzy_count - phonetic_count, len(queries))
+    if stats.get('pairs'):
+        logger.info("Poda de candidatos: %s de %s pares consulta-candidato descartados sin puntuar (%.1f %%)",
+                    stats['pruned'], stats['pairs'], 100 * stats['pruned'] / stats['pairs'])
+
+    return match_result(best_matches, best_scores, limit)
+
+
+def candidate_columns(limit):
+    """
+    Nombres de las columnas que assign_match_columns añade para las candidatas alternativas.
+    """
+    return [column for rank in range(2, limit + 1) for column in (f'match_{rank}', f'match_score_{rank}')]
+
+
+def assign_match_columns(df, best_matches, scores):
+    """
+    Escribe en df la mejor coincidencia ('best_match', 'match_score') y, si match_keys devolvió más de una
+    candidata, las siguientes ('match_2', 'match_score_2', ...) para poder validar el diccionario sin buscar
+    en INEGI a mano.
+    """
+    best_matches = np.asarray(best_matches, dtype=object).reshape(len(df), -1)
+    scores = np.asarray(scores, dtype=float).reshape(len(df), -1)
+
+    df['best_match'] = best_matches[:, 0]
+    df['match_score'] = [int(score) if not np.isnan(score) else None for score in scores[:, 0]]
+    for rank in range(2, best_matches.shape[1] + 1):
+        df[f'match_{rank}'] = best_matches[:, rank - 1]
+        df[f'match_score_{rank}'] = [int(score) if not np.isnan(score) else None for score in scores[:, rank - 1]]
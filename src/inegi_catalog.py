@@ -0,0 +1,175 @@
+import hashlib
+import json
+import logging
+import os
+from src.inegi_index import build_index, open_index, write_index
+from src.schemas import COLUMNAS_INEGI, read_source
+from src.storage import EXTENSIONES, FORMATO, read_table, write_table
+from src.text_normalization import clean_text_series
+
+# Incluir estas líneas en cada script para registrar los logs
+logger = logging.getLogger("Fertilizantes")
+
+CATALOG_DIR = 'data/inegi/catalogos'
+
+# Cortes de INEGI: fichero descargado y su esquema en src/schemas.py. 'dataset_inegi.csv' es el corte de abril
+# de 2024 (ver data/inegi/info.txt), los de 2019-2022 tienen fecha de corte de diciembre de cada año.
+CORTES_INEGI = {
+    '2019': ('data/inegi/dataset_inegi_2019.csv', 'inegi'),
+    '2020': ('data/inegi/dataset_inegi_2020.csv', 'inegi'),
+    '2021': ('data/inegi/dataset_inegi_2021.csv', 'inegi'),
+    '2022': ('data/inegi/dataset_inegi_2022.csv', 'inegi'),
+    '2024': ('data/inegi/dataset_inegi.csv', 'inegi_2024'),
+}
+
+NIVELES = ('entidades', 'municipios', 'localidades')
+
+# Longitud de las claves geoestadísticas con ceros a la izquierda
+ANCHO_CVE = {'CVE_ENT': 2, 'CVE_MUN': 3, 'CVE_LOC': 4}
+
+# Claves de coincidencia de los pipelines con índice de claves (src/inegi_index.py) en cada corte
+CLAVES_INDICE = {'municipios': 'KEY_inegi', 'localidades': 'KEY_inegi_localidad'}
+
+# Tamaño de los bloques con los que se calcula el hash del fichero fuente
+CHUNK_BYTES = 1 << 20
+
+
+def file_hash(path):
+    """
+    Hash sha256 del contenido de un fichero, leído por bloques para no cargar en memoria los 58 MB del corte
+    nacional.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(CHUNK_BYTES), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def catalog_path(cut, level, catalog_dir=CATALOG_DIR):
+    return os.path.join(catalog_dir, cut, level + EXTENSIONES[FORMATO])
+
+
+def index_path(cut, level, catalog_dir=CATALOG_DIR):
+    return os.path.join(catalog_dir, cut, f'indice_{level}.npy')
+
+
+def _manifest_path(cut, catalog_dir):
+    return os.path.join(catalog_dir, cut, 'manifest.json')
+
+
+def _read_manifest(cut, catalog_dir):
+    try:
+        with open(_manifest_path(cut, catalog_dir), encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def build_catalogs(dataset_inegi):
+    """
+    Construye los catálogos de entidades, municipios y localidades de un corte de INEGI, con las claves
+    geoestadísticas con ceros a la izquierda, los nombres limpios (*_Clean) y las claves de coincidencia de los
+    pipelines: KEY_inegi (entidad-municipio) y KEY_inegi_localidad (municipio-localidad).
+    """
+    localidades = dataset_inegi[[column for column in COLUMNAS_INEGI if column in dataset_inegi.columns]]
+    localidades = localidades.drop_duplicates().copy()
+    for column, width in ANCHO_CVE.items():
+        if column in localidades.columns:
+            localidades[column] = localidades[column].astype(str).str.zfill(width)
+
+    for column in ['NOM_ENT', 'NOM_MUN', 'NOM_LOC']:
+        if column in localidades.columns:
+            localidades[f'{column}_Clean'] = clean_text_series(localidades[column]).astype(str)
+
+    localidades['KEY_inegi'] = localidades['NOM_ENT_Clean'] + '-' + localidades['NOM_MUN_Clean']
+    if 'NOM_LOC_Clean' in localidades.columns:
+        localidades['KEY_inegi_localidad'] = localidades['NOM_MUN_Clean'] + '-' + localidades['NOM_LOC_Clean']
+
+    municipios = localidades[['CVE_ENT', 'NOM_ENT', 'CVE_MUN', 'NOM_MUN', 'NOM_ENT_Clean', 'NOM_MUN_Clean',
+                              'KEY_inegi']].drop_duplicates()
+    municipios.insert(4, 'CVE_MUN_Unique', municipios['CVE_ENT'] + '-' + municipios['CVE_MUN'])
+
+    entidades = localidades[['CVE_ENT', 'NOM_ENT', 'NOM_ENT_Clean']].drop_duplicates()
+
+    return {'entidades': entidades, 'municipios': municipios, 'localidades': localidades}
+
+
+def update_inegi_catalog(cut, source_path=None, encoding=None, catalog_dir=CATALOG_DIR, force=False):
+    """
+    Genera los catálogos de un corte de INEGI en catalog_dir/<corte>/ si no existen o si el fichero fuente ha
+    cambiado. El manifest.json de cada corte guarda el hash sha256 del fichero fuente, que es la versión de los
+    catálogos. Mientras el tamaño y la fecha de modificación del fichero fuente no cambien ni siquiera se
+    vuelve a calcular el hash.
+
+    Devuelve el manifiesto, con 'rebuilt' a True si se han vuelto a generar los catálogos.
+    """
+    default_path, schema = CORTES_INEGI.get(cut, (None, 'inegi'))
+    source_path = source_path or default_path
+
+    stat = os.stat(source_path)
+    manifest = _read_manifest(cut, catalog_dir)
+    artifacts_exist = all(os.path.exists(catalog_path(cut, level, catalog_dir)) for level in NIVELES) and \
+        all(os.path.exists(index_path(cut, level, catalog_dir)) for level in CLAVES_INDICE)
+
+    if manifest is not None and artifacts_exist and not force:
+        if manifest['size'] == stat.st_size and manifest['mtime'] == stat.st_mtime:
+            return dict(manifest, rebuilt=False)
+        source_hash = file_hash(source_path)
+        if manifest['sha256'] == source_hash:
+            # El fichero se ha vuelto a descargar sin cambios
+            manifest.update(size=stat.st_size, mtime=stat.st_mtime)
+            _write_manifest(cut, catalog_dir, manifest)
+            return dict(manifest, rebuilt=False)
+    else:
+        source_hash = file_hash(source_path)
+
+    logger.info("Generando los catálogos de INEGI del corte %s desde %s", cut, source_path)
+    dataset_inegi = read_source(source_path, schema, encoding=encoding)
+    catalogs = build_catalogs(dataset_inegi)
+
+    os.makedirs(os.path.join(catalog_dir, cut), exist_ok=True)
+    for level, catalog in catalogs.items():
+        write_table(catalog, catalog_path(cut, level, catalog_dir))
+    for level, key_column in CLAVES_INDICE.items():
+        write_index(build_index(catalogs['localidades'], key_column), index_path(cut, level, catalog_dir))
+
+    manifest = {
+        'cut': cut,
+        'source': source_path,
+        'sha256': source_hash,
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'rows': {level: len(catalog) for level, catalog in catalogs.items()},
+    }
+    _write_manifest(cut, catalog_dir, manifest)
+    logger.info("Catálogos de INEGI del corte %s: %s", cut, manifest['rows'])
+    return dict(manifest, rebuilt=True)
+
+
+def _write_manifest(cut, catalog_dir, manifest):
+    with open(_manifest_path(cut, catalog_dir), 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2)
+
+
+def load_inegi_catalog(cut, level, source_path=None, encoding=None, catalog_dir=CATALOG_DIR, columns=None):
+    """
+    Carga el catálogo de un nivel ('entidades', 'municipios' o 'localidades') de un corte de INEGI, generándolo
+    antes solo si el fichero fuente ha cambiado desde la última vez. Con columns solo se leen esas columnas.
+    """
+    if level not in NIVELES:
+        raise ValueError(f"Nivel de catálogo desconocido: {level}. Debe ser uno de {NIVELES}")
+    update_inegi_catalog(cut, source_path=source_path, encoding=encoding, catalog_dir=catalog_dir)
+    return read_table(catalog_path(cut, level, catalog_dir), columns=columns)
+
+
+def load_inegi_index(cut, level, source_path=None, encoding=None, catalog_dir=CATALOG_DIR):
+    """
+    Abre, mapeado en memoria, el índice de claves de municipios (KEY_inegi) o de localidades
+    (KEY_inegi_localidad) de un corte de INEGI. Se genera junto con los catálogos, de modo que solo se vuelve a
+    construir cuando cambia el fichero fuente.
+    """
+    if level not in CLAVES_INDICE:
+        raise ValueError(f"Nivel de índice desconocido: {level}. Debe ser uno de {tuple(CLAVES_INDICE)}")
+    update_inegi_catalog(cut, source_path=source_path, encoding=encoding, catalog_dir=catalog_dir)
+    return open_index(index_path(cut, level, catalog_dir))
@@ -0,0 +1,127 @@
+import logging
+import os
+import numpy as np
+import pandas as pd
+
+# Incluir estas líneas en cada script para registrar los logs
+logger = logging.getLogger("Fertilizantes")
+
+# Registro del índice de claves de un corte de INEGI: hash de 64 bits de la clave de coincidencia, claves
+# geoestadísticas numéricas y fila del catálogo de localidades (y de dataset_inegi_clean) de la que salen.
+# Ocupa 17 bytes por clave, frente a los cientos de bytes por fila del catálogo con nombres y población.
+INDEX_DTYPE = np.dtype([
+    ('hash', '<u8'),
+    ('cve_ent', '<u1'),
+    ('cve_mun', '<u2'),
+    ('cve_loc', '<u2'),
+    ('row', '<u4'),
+])
+
+# Índices abiertos en este proceso. El fichero se mapea en memoria, de modo que los procesos del pipeline y
+# las sesiones de Streamlit comparten las mismas páginas del sistema operativo en vez de cargar una copia cada
+# uno.
+_INDICES_ABIERTOS = {}
+
+
+def key_hash(keys):
+    """
+    Hash de 64 bits de un array de claves de texto, calculado de forma vectorizada y estable entre ejecuciones.
+    """
+    keys = np.asarray(keys, dtype=object)
+    return pd.util.hash_array(keys, categorize=False)
+
+
+def build_index(localidades, key_column):
+    """
+    Construye el índice de la columna key_column del catálogo de localidades de un corte, ordenado por hash.
+    Como en los drop_duplicates(keep='first') de los pipelines, cada clave apunta a su primera fila.
+    """
+    keys = localidades[key_column].astype(str).reset_index(drop=True)
+    first = ~keys.duplicated(keep='first').to_numpy()
+    rows = np.flatnonzero(first)
+    hashes = key_hash(keys.to_numpy()[first])
+
+    if len(np.unique(hashes)) != len(hashes):
+        raise ValueError(f"Colisión de hash entre claves distintas de {key_column}")
+
+    index = np.empty(len(rows), dtype=INDEX_DTYPE)
+    index['hash'] = hashes
+    index['row'] = rows
+    for field, column in [('cve_ent', 'CVE_ENT'), ('cve_mun', 'CVE_MUN'), ('cve_loc', 'CVE_LOC')]:
+        index[field] = localidades[column].to_numpy()[first].astype(int)
+    index.sort(order='hash')
+    return index
+
+
+def write_index(index, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    np.save(path, index, allow_pickle=False)
+    _INDICES_ABIERTOS.pop(path, None)
+    return path
+
+
+def open_index(path):
+    """
+    Abre un índice guardado con write_index mapeándolo en memoria. Se reutiliza mientras el fichero no cambie.
+    """
+    mtime = os.path.getmtime(path)
+    cached = _INDICES_ABIERTOS.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    index = np.load(path, mmap_mode='r', allow_pickle=False)
+    if index.dtype != INDEX_DTYPE:
+        raise ValueError(f"{path} no es un índice de claves de INEGI")
+    _INDICES_ABIERTOS[path] = (mtime, index)
+    return index
+
+
+def lookup_index(index, keys):
+    """
+    Busca un array de claves en el índice. Devuelve un DataFrame alineado con keys con CVE_ENT, CVE_MUN y
+    CVE_LOC (con ceros a la izquierda, NaN si la clave no está) y la fila del catálogo de cada clave (-1 si no
+    está).
+    """
+    keys = pd.Series(keys, dtype=object).reset_index(drop=True)
+    valid = keys.notna().to_numpy()
+    hashes = np.zeros(len(keys), dtype='<u8')
+    hashes[valid] = key_hash(keys[valid].astype(str).to_numpy())
+
+    found = valid.copy()
+    positions = np.zeros(len(keys), dtype=np.intp)
+    if len(index):
+        positions = np.minimum(np.searchsorted(index['hash'], hashes), len(index) - 1)
+        found &= index['hash'][positions] == hashes
+    else:
+        found[:] = False
+    entries = np.asarray(index[positions]) if len(index) else np.zeros(len(keys), dtype=INDEX_DTYPE)
+
+    result = pd.DataFrame({'row': np.where(found, entries['row'].astype(np.int64), -1)})
+    for field, column, width in [('cve_ent', 'CVE_ENT', 2), ('cve_mun', 'CVE_MUN', 3), ('cve_loc', 'CVE_LOC', 4)]:
+        values = pd.Series(entries[field]).astype(str).str.zfill(width)
+        result[column] = values.where(found)
+    return result
+
+
+def merge_inegi(df, key_column, inegi, index, suffixes=('_benef', '_inegi')):
+    """
+    Equivale a pd.merge(df, inegi, on=key_column, how='left', suffixes=suffixes) cuando inegi es
+    dataset_inegi_clean, o un drop_duplicates(subset=key_column, keep='first') suyo con el índice original, pero
+    sin construir la tabla hash del merge: las filas de inegi se toman directamente con el índice del corte.
+    """
+    lookup = lookup_index(index, df[key_column])
+    rows = lookup['row'].to_numpy()
+    right = inegi.drop(columns=[key_column], errors='ignore').reindex(rows).reset_index(drop=True)
+
+    # Comprobación de que el índice corresponde a la tabla: las claves geoestadísticas tienen que coincidir
+    found = rows >= 0
+    for column, width in [('CVE_ENT', 2), ('CVE_MUN', 3)]:
+        if column in right.columns:
+            expected = right.loc[found, column].astype(str).str.zfill(width).to_numpy()
+            if not (expected == lookup.loc[found, column].to_numpy()).all():
+                raise ValueError(f"El índice de claves no corresponde a la tabla de INEGI ({column} distinto)")
+
+    left = df.reset_index(drop=True)
+    overlap = set(left.columns) & set(right.columns)
+    left = left.rename(columns={column: column + suffixes[0] for column in overlap})
+    right = right.rename(columns={column: column + suffixes[1] for column in overlap})
+    return pd.concat([left, right], axis=1)
@@ -1,92 +1,99 @@
-import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from src.storage import FORMATO, read_table, write_table
 
-def procesar_datos_inegi_por_estado(path_dataset_inegi, estado, output_path):
+# Estados con beneficiarios en el listado de cada año, para los que se genera su INEGI_UNIQUELOC
+ESTADOS_UNIQUELOC = {
+    '2019': ['Puebla', 'México', 'Guanajuato', 'Querétaro', 'Zacatecas', 'Veracruz de Ignacio de la Llave', 'Hidalgo',
+             'Michoacán de Ocampo', 'Oaxaca', 'Colima', 'Chiapas', 'San Luis Potosí', 'Jalisco', 'Nayarit',
+             'Guerrero'],
+    '2020': ['Guerrero', 'Morelos', 'Tlaxcala', 'Puebla'],
+    '2021': ['Guerrero', 'Morelos', 'Tlaxcala', 'Puebla'],
+    '2022': ['Guerrero', 'Oaxaca', 'Puebla', 'Morelos', 'Chiapas', 'Durango', 'Tlaxcala', 'Nayarit', 'Zacatecas'],
+}
+
+
+def uniqueloc_path(year, estado):
+    return (f'data/productores_beneficiarios 2019-2022/diccionarios_E3/{year}/'
+            f'INEGI_UNIQUELOC_{year}_{estado.lower().replace(" ", "_")}.csv')
+
+
+def procesar_datos_inegi(path_dataset_inegi, output_paths):
+    """
+    Genera los INEGI_UNIQUELOC de varios estados de un corte leyendo el dataset_inegi_clean una sola vez.
+    output_paths es un diccionario estado -> ruta de salida. Cada fichero es el mismo que se obtiene
+    procesando el estado por separado: las filas de INEGI de ese estado sin duplicados y, para cada
+    municipio-localidad, la de mayor POB_TOTAL.
+    """
     # Leer los datos desde el archivo CSV
-    dataset_inegi = pd.read_csv(path_dataset_inegi)
-    
+    dataset_inegi = read_table(path_dataset_inegi)
+
+    # Filtrar datos por los estados especificados
+    dataset_inegi = dataset_inegi[dataset_inegi['Entidad_inegi'].isin(list(output_paths))].copy()
+
     # Crear columnas de clave única para municipio y localidad
     dataset_inegi['KEY_inegi_municipio'] = dataset_inegi['Entidad_c_inegi'].astype(str) + '-' + dataset_inegi['Municipio_c_inegi'].astype(str)
     dataset_inegi['KEY_inegi_localidad'] = dataset_inegi['Municipio_c_inegi'].astype(str) + '-' + dataset_inegi['Localidad_c_inegi'].astype(str)
-    
-    # Filtrar datos por el estado especificado
-    datos_estado = dataset_inegi[dataset_inegi['Entidad_inegi'] == estado]
-    
-    # Eliminar filas duplicadas basadas en Entidad_inegi, Municipio_inegi y Localidad_inegi
-    datos_estado = datos_estado.drop_duplicates()
-    
-    # Ordenar el DataFrame por Entidad_inegi, Municipio_inegi y Localidad_inegi
-    df_sorted = datos_estado.sort_values(by=['Entidad_inegi', 'Municipio_inegi', 'Localidad_inegi'])
-    
-    # Identificar duplicados basados en Entidad_inegi, Municipio_inegi y Localidad_inegi
-    duplicados = df_sorted[df_sorted.duplicated(subset=['Entidad_inegi', 'Municipio_inegi', 'Localidad_inegi'], keep=False)]
-    print("Número de rows con base en Entidad, Municipio y Localidad: ", duplicados.shape)
-    
+
+    # Eliminar filas duplicadas. Las filas de estados distintos nunca son iguales, así que equivale a hacerlo
+    # estado por estado
+    datos_estados = dataset_inegi.drop_duplicates()
+
     # Contar duplicados agrupados por Entidad_inegi, Municipio_inegi y Localidad_inegi
-    conteo_duplicados = duplicados.groupby(['Entidad_inegi', 'Municipio_inegi', 'Localidad_inegi']).size().reset_index(name='Numero_Duplicados')
-    
-    # Ordenar por el número de duplicados en orden descendente
+    claves = ['Entidad_inegi', 'Municipio_inegi', 'Localidad_inegi']
+    duplicados = datos_estados[datos_estados.duplicated(subset=claves, keep=False)]
+    print("Número de rows con base en Entidad, Municipio y Localidad: ", duplicados.shape)
+    conteo_duplicados = duplicados.groupby(claves).size().reset_index(name='Numero_Duplicados')
     conteo_duplicados = conteo_duplicados.sort_values(by='Numero_Duplicados', ascending=False)
-    
-    # Mostrar el conteo de duplicados ordenado por count
     print(conteo_duplicados)
-    total_duplicados = conteo_duplicados['Numero_Duplicados'].sum()
-    print("Total de duplicados: ", total_duplicados)
-    
+    print("Total de duplicados: ", conteo_duplicados['Numero_Duplicados'].sum())
+
     # Seleccionar la localidad con mayor número de habitantes para cada combinación única de municipio-localidad
-    datos_estado = datos_estado.loc[datos_estado.groupby(['Municipio_inegi', 'Localidad_inegi'])['POB_TOTAL'].idxmax()]
-    
-    # Eliminar la columna de clave única de municipio
-    datos_estado.drop(columns=["KEY_inegi_municipio"], inplace=True)
-    
-    # Eliminar duplicados basados en Municipio_inegi y Localidad_inegi
-    datos_estado.drop_duplicates(subset=['Municipio_inegi', 'Localidad_inegi'], inplace=True)
-    
-    # Guardar el DataFrame resultante en un archivo CSV
-    datos_estado.to_csv(output_path, index=False, encoding='utf-8')
+    # de cada estado. Los grupos quedan ordenados por estado y, dentro de cada estado, por municipio y localidad,
+    # el mismo orden que al agrupar cada estado por separado
+    datos_estados = datos_estados.loc[datos_estados.groupby(claves)['POB_TOTAL'].idxmax()]
 
-def generate_uniqueloc():
-    # Ejemplo de uso de la función para Guerrero
-    path_dataset_inegi_2019 = 'data/inegi/dataset_inegi_clean_2019.csv'
+    # Eliminar la columna de clave única de municipio
+    datos_estados = datos_estados.drop(columns=["KEY_inegi_municipio"])
 
-    estados1 = ['Puebla', 'México', 'Guanajuato', 'Querétaro', 'Zacatecas', 'Veracruz de Ignacio de la Llave', 'Hidalgo', 'Michoacán de Ocampo', 'Oaxaca', 'Colima', 'Chiapas', 'San Luis Potosí', 'Jalisco', 'Nayarit', 'Guerrero']
+    # Escribir todos los estados en la misma pasada. Un estado sin localidades en el corte se escribe vacío
+    por_estado = dict(list(datos_estados.groupby('Entidad_inegi', sort=False)))
+    for estado, output_path in output_paths.items():
+        datos_estado = por_estado.get(estado, datos_estados.iloc[0:0])
 
-    # Procesar los datos para cada estado
-    for estado in estados1:
-        output_path = f'data/productores_beneficiarios 2019-2022/diccionarios_E3/2019/INEGI_UNIQUELOC_2019_{estado.lower().replace(" ", "_")}.csv'
-        procesar_datos_inegi_por_estado(path_dataset_inegi_2019, estado, output_path)
+        # Eliminar duplicados basados en Municipio_inegi y Localidad_inegi
+        datos_estado = datos_estado.drop_duplicates(subset=['Municipio_inegi', 'Localidad_inegi'])
 
-    # Ejemplo de uso de la función para Guerrero
-    path_dataset_inegi_2020 = 'data/inegi/dataset_inegi_clean_2020.csv'
+        # Guardar el DataFrame resultante en FORMATO (Parquet), con la misma ruta y la extensión del formato
+        write_table(datos_estado, output_path, fmt=FORMATO)
 
-    estados2 = ['Guerrero', 'Morelos', 'Tlaxcala', 'Puebla']
 
-    # Procesar los datos para cada estado
-    for estado in estados2:
-        output_path = f'data/productores_beneficiarios 2019-2022/diccionarios_E3/2020/INEGI_UNIQUELOC_2020_{estado.lower().replace(" ", "_")}.csv'
-        procesar_datos_inegi_por_estado(path_dataset_inegi_2020, estado, output_path)
+def procesar_datos_inegi_por_estado(path_dataset_inegi, estado, output_path):
+    procesar_datos_inegi(path_dataset_inegi, {estado: output_path})
 
-    # Ejemplo de uso de la función para Guerrero
-    path_dataset_inegi_2021 = 'data/inegi/dataset_inegi_clean_2021.csv'
 
-    estados3 = ['Guerrero', 'Morelos', 'Tlaxcala', 'Puebla']
+def procesar_año(year):
+    path_dataset_inegi = f'data/inegi/dataset_inegi_clean_{year}.csv'
+    procesar_datos_inegi(path_dataset_inegi, {estado: uniqueloc_path(year, estado)
+                                              for estado in ESTADOS_UNIQUELOC[year]})
 
-    # Procesar los datos para cada estado
-    for estado in estados3:
-        output_path = f'data/productores_beneficiarios 2019-2022/diccionarios_E3/2021/INEGI_UNIQUELOC_2021_{estado.lower().replace(" ", "_")}.csv'
-        procesar_datos_inegi_por_estado(path_dataset_inegi_2021, estado, output_path)
 
-    # Ejemplo de uso de la función para Guerrero
-    path_dataset_inegi_2022 = 'data/inegi/dataset_inegi_clean_2022.csv'
+def generate_uniqueloc(years=tuple(ESTADOS_UNIQUELOC), max_workers=1):
+    """
+    Genera los INEGI_UNIQUELOC de cada año, con una lectura de su dataset_inegi_clean por año. Con max_workers
+    distinto de 1 los años se procesan a la vez en un pool de procesos (None usa todos los núcleos).
+    """
+    if max_workers == 1:
+        for year in years:
+            procesar_año(year)
+        return
 
-    estados4 = ['Guerrero', 'Oaxaca', 'Puebla', 'Morelos', 'Chiapas', 'Durango', 'Tlaxcala', 'Nayarit', 'Zacatecas']
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for future in [executor.submit(procesar_año, year) for year in years]:
+            future.result()
 
-    # Procesar los datos para cada estado
-    for estado in estados4:
-        output_path = f'data/productores_beneficiarios 2019-2022/diccionarios_E3/2022/INEGI_UNIQUELOC_2022_{estado.lower().replace(" ", "_")}.csv'
-        procesar_datos_inegi_por_estado(path_dataset_inegi_2022, estado, output_path)
 
 def main():
     generate_uniqueloc()
-    
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import logging
+import numpy as np
+import os
+import sqlite3
+import time
+
+# Incluir estas líneas en cada script para registrar los logs
+logger = logging.getLogger("Fertilizantes")
+
+MATCH_CACHE_PATH = 'data/match_cache.sqlite'
+
+# Número máximo de entradas que se guardan. Al superarlo se eliminan las menos usadas recientemente.
+MAX_ENTRIES = 1_000_000
+
+# Límite de parámetros por consulta de SQLite
+CHUNK_SIZE = 500
+
+
+def catalog_version(choices, *params):
+    """
+    Calcula la versión de un catálogo de candidatos como el hash de su contenido (las claves de INEGI de
+    dataset_inegi_clean_2019.csv, de un INEGI_UNIQUELOC_* por estado...) y de los parámetros de búsqueda que
+    influyen en el resultado. Un nuevo corte de INEGI produce una versión distinta y no reutiliza entradas.
+    """
+    digest = hashlib.sha256()
+    for param in params:
+        digest.update(repr(param).encode('utf-8') + b'\0')
+    for choice in choices:
+        digest.update(str(choice).encode('utf-8') + b'\n')
+    return digest.hexdigest()
+
+
+def _connect(path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    conn = sqlite3.connect(path, timeout=60)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS match_cache (
+            catalog TEXT NOT NULL,
+            query TEXT NOT NULL,
+            threshold REAL NOT NULL,
+            best_match TEXT,
+            score REAL,
+            last_used REAL NOT NULL,
+            candidates TEXT,
+            PRIMARY KEY (catalog, query, threshold)
+        )""")
+    # Cachés creadas antes de guardar las candidatas alternativas
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(match_cache)")]
+    if 'candidates' not in columns:
+        conn.execute("ALTER TABLE match_cache ADD COLUMN candidates TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_match_cache_last_used ON match_cache (last_used)")
+    return conn
+
+
+def load_cached_matches(path, version, queries, threshold):
+    """
+    Devuelve un diccionario query -> (best_match, score, candidates) con las claves ya resueltas para esta
+    versión del catálogo y este umbral. Las claves sin coincidencia también se guardan, con best_match None.
+    candidates es la lista de pares [match, score] de las siguientes candidatas (vacía si solo se pidió una).
+    """
+    cached = {}
+    queries = list(dict.fromkeys(query for query in queries if isinstance(query, str)))
+    if not queries or not os.path.exists(path):
+        return cached
+
+    with _connect(path) as conn:
+        for start in range(0, len(queries), CHUNK_SIZE):
+            chunk = queries[start:start + CHUNK_SIZE]
+            placeholders = ','.join('?' * len(chunk))
+            rows = conn.execute(f"SELECT query, best_match, score, candidates FROM match_cache "
+                                f"WHERE catalog = ? AND threshold = ? AND query IN ({placeholders})",
+                                [version, threshold] + chunk).fetchall()
+            cached.update({query: (best_match, score, json.loads(candidates) if candidates else [])
+                           for query, best_match, score, candidates in rows})
+            conn.execute(f"UPDATE match_cache SET last_used = ? "
+                         f"WHERE catalog = ? AND threshold = ? AND query IN ({placeholders})",
+                         [time.time(), version, threshold] + chunk)
+    conn.close()
+
+    return cached
+
+
+def save_matches(path, version, queries, best_matches, scores, threshold, max_entries=MAX_ENTRIES):
+    """
+    Guarda el resultado de la búsqueda de cada clave y elimina las entradas menos usadas si la caché
+    supera max_entries. Si best_matches y scores tienen una columna por candidata (limit > 1), la primera es
+    la mejor coincidencia y las demás se guardan en candidates.
+    """
+    now = time.time()
+    queries = list(queries)
+    best_matches = np.asarray(best_matches, dtype=object).reshape(len(queries), -1)
+    scores = np.asarray(scores, dtype=float).reshape(len(queries), -1)
+    rows = [(version, query, threshold, matches[0], _score(values[0]), now,
+             json.dumps([[match, _score(value)] for match, value in zip(matches[1:], values[1:])])
+             if len(matches) > 1 else None)
+            for query, matches, values in zip(queries, best_matches, scores) if isinstance(query, str)]
+    if not rows:
+        return
+
+    with _connect(path) as conn:
+        conn.executemany("INSERT OR REPLACE INTO match_cache (catalog, query, threshold, best_match, score, "
+                         "last_used, candidates) VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        excess = conn.execute("SELECT COUNT(*) FROM match_cache").fetchone()[0] - max_entries
+        if excess > 0:
+            conn.execute("DELETE FROM match_cache WHERE rowid IN "
+                         "(SELECT rowid FROM match_cache ORDER BY last_used ASC LIMIT ?)", (excess,))
+            logger.info("Caché de coincidencias: %s entradas eliminadas por tamaño", excess)
+    conn.close()
+
+
+def _score(score):
+    # NaN (sin coincidencia) se guarda como NULL
+    return None if score != score else float(score)
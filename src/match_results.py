@@ -0,0 +1,18 @@
+import numpy as np
+
+
+def top_candidates(scores, limit):
+    """
+    Índices de las limit columnas con mayor puntuación de cada fila. En caso de empate va antes la columna
+    anterior del catálogo, igual que en process.extractOne y process.extract.
+    """
+    if limit == 1:
+        return scores.argmax(axis=1)[:, None]
+    return np.argsort(-scores, axis=1, kind='stable')[:, :limit]
+
+
+def match_result(best_matches, best_scores, limit):
+    # Con una sola candidata se devuelven arrays de una dimensión, como antes de existir limit
+    if limit == 1:
+        return best_matches[:, 0], best_scores[:, 0]
+    return best_matches, best_scores
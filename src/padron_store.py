@@ -0,0 +1,163 @@
+import logging
+import os
+import sqlite3
+import pandas as pd
+
+# Incluir estas líneas en cada script para registrar los logs
+logger = logging.getLogger("Fertilizantes")
+
+PADRON_PATH = 'data/padron.sqlite'
+
+# Columnas de la tabla padron, comunes a todos los listados finales. Cada listado rellena las que tiene: los de
+# 2023 no tienen localidad y los de 2019-2022 no tienen acuse.
+COLUMNAS_PADRON = ['listado', 'year', 'id', 'cve_ent', 'entidad', 'cve_mun', 'municipio', 'cve_loc', 'localidad',
+                   'acuse', 'beneficiario', 'paquete', 'producto', 'monto', 'fecha', 'ciclo']
+
+# Columnas de los listado_beneficiarios_20xx_localidades (data_cleaning3)
+COLUMNAS_LOCALIDADES = {
+    'Clave de entidad': 'cve_ent',
+    'Entidad federativa': 'entidad',
+    'Clave de municipio': 'cve_mun',
+    'Municipio': 'municipio',
+    'Clave de localidad': 'cve_loc',
+    'Localidad': 'localidad',
+    'Nombre del beneficiario': 'beneficiario',
+    'Producto cultivado': 'producto',
+    'Monto entregado': 'monto',
+    'Fecha de entrega del beneficio': 'fecha',
+    'Ciclo agrícola': 'ciclo',
+}
+
+ANCHO_CVE = {'cve_ent': 2, 'cve_mun': 3, 'cve_loc': 4}
+
+
+def _connect(path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    conn = sqlite3.connect(path, timeout=60)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS padron (
+            listado TEXT NOT NULL,
+            year INTEGER NOT NULL,
+            id INTEGER,
+            cve_ent TEXT,
+            entidad TEXT,
+            cve_mun TEXT,
+            municipio TEXT,
+            cve_loc TEXT,
+            localidad TEXT,
+            acuse TEXT,
+            beneficiario TEXT,
+            paquete TEXT,
+            producto TEXT,
+            monto REAL,
+            fecha TEXT,
+            ciclo TEXT
+        )""")
+    # Consultas por municipio o localidad a lo largo de los años, por acuse y por listado
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_padron_municipio ON padron (cve_ent, cve_mun, year)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_padron_localidad ON padron (cve_ent, cve_mun, cve_loc)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_padron_acuse ON padron (acuse)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_padron_listado ON padron (listado, year)")
+    return conn
+
+
+def padron_rows(df, listado, year):
+    """
+    Convierte un listado final a las columnas de la tabla padron: los listados de 2023 (data_cleaning y
+    data_cleaning2) ya tienen sus nombres en minúscula y los de 2019-2022 los de COLUMNAS_LOCALIDADES.
+    """
+    rows = df.rename(columns=COLUMNAS_LOCALIDADES)
+    if 'beneficiario' not in rows.columns and 'nombre_propio' in rows.columns:
+        names = rows[['nombre_propio', 'apellido_paterno', 'apellido_materno']].fillna('').astype(str)
+        rows['beneficiario'] = names.apply(lambda name: ' '.join(part for part in name if part), axis=1)
+    rows = rows.reindex(columns=COLUMNAS_PADRON)
+    rows['listado'] = listado
+    rows['year'] = year
+
+    for column, width in ANCHO_CVE.items():
+        # Las claves se guardan como texto con ceros a la izquierda, aunque vengan de un CSV como números
+        values = rows[column].dropna()
+        values = values.astype('Int64').astype(str) if pd.api.types.is_numeric_dtype(values) else values.astype(str)
+        rows[column] = values.str.zfill(width).reindex(rows.index)
+    for column in ['acuse', 'paquete', 'fecha']:
+        rows[column] = rows[column].where(rows[column].isna(), rows[column].astype(str))
+    return rows.astype(object).where(rows.notna(), None)
+
+
+def load_padron(df, listado, year, path=PADRON_PATH, replace=True):
+    """
+    Carga un listado final en la base de datos del padrón. Con replace=True se sustituyen antes las filas
+    cargadas en una ejecución anterior del mismo listado y año; en modo streaming solo el primer bloque
+    sustituye y los siguientes se añaden.
+    """
+    rows = padron_rows(df, listado, year)
+    placeholders = ', '.join('?' * len(COLUMNAS_PADRON))
+    with _connect(path) as conn:
+        if replace:
+            conn.execute("DELETE FROM padron WHERE listado = ? AND year = ?", (listado, year))
+        conn.executemany(f"INSERT INTO padron ({', '.join(COLUMNAS_PADRON)}) VALUES ({placeholders})",
+                         rows.itertuples(index=False, name=None))
+    conn.close()
+    logger.info("Padrón: %s filas de %s %s cargadas en %s", len(rows), listado, year, path)
+
+
+def query_padron(path=PADRON_PATH, cve_ent=None, cve_mun=None, cve_loc=None, acuse=None, years=None,
+                 listado=None, columns=None):
+    """
+    Consulta el padrón con los filtros indicados, que se resuelven con los índices de la tabla. Por ejemplo, los
+    beneficiarios de un municipio entre 2019 y 2023:
+
+        query_padron(cve_ent='12', cve_mun='013', years=range(2019, 2024), listado='beneficiarios')
+
+    Devuelve un DataFrame con las columnas de COLUMNAS_PADRON (o solo columns).
+    """
+    columns = columns or COLUMNAS_PADRON
+    unknown = set(columns) - set(COLUMNAS_PADRON)
+    if unknown:
+        raise ValueError(f"Columnas desconocidas del padrón: {sorted(unknown)}")
+
+    conditions, params = [], []
+    for column, value in [('cve_ent', cve_ent), ('cve_mun', cve_mun), ('cve_loc', cve_loc), ('acuse', acuse),
+                          ('listado', listado)]:
+        if value is not None:
+            value = str(value).zfill(ANCHO_CVE[column]) if column in ANCHO_CVE else str(value)
+            conditions.append(f"{column} = ?")
+            params.append(value)
+    if years is not None:
+        years = [int(year) for year in years]
+        conditions.append(f"year IN ({', '.join('?' * len(years))})")
+        params.extend(years)
+
+    query = f"SELECT {', '.join(columns)} FROM padron"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY year, listado, id"
+
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=columns)
+    with _connect(path) as conn:
+        result = pd.read_sql_query(query, conn, params=params)
+    conn.close()
+    return result
+
+
+def summary_padron(path=PADRON_PATH, cve_ent=None, cve_mun=None):
+    """
+    Número de registros y monto total por listado y año, opcionalmente de una entidad o un municipio.
+    """
+    conditions, params = [], []
+    for column, value in [('cve_ent', cve_ent), ('cve_mun', cve_mun)]:
+        if value is not None:
+            conditions.append(f"{column} = ?")
+            params.append(str(value).zfill(ANCHO_CVE[column]))
+    query = "SELECT listado, year, COUNT(*) AS registros, SUM(monto) AS monto FROM padron"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " GROUP BY listado, year ORDER BY year, listado"
+
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=['listado', 'year', 'registros', 'monto'])
+    with _connect(path) as conn:
+        result = pd.read_sql_query(query, conn, params=params)
+    conn.close()
+    return result
@@ -0,0 +1,57 @@
+import re
+import unidecode
+
+# Reglas de la clave fonética, en orden. Están pensadas para nombres de lugares de México, donde conviven la
+# ortografía española y la de origen náhuatl o maya (Xalapa/Jalapa, Huatulco/Watulco, Villa/Biya...).
+# El texto llega en minúsculas, así que las mayúsculas marcan sonidos que las reglas siguientes no deben tocar.
+REGLAS_FONETICAS = [
+    (re.compile(r'ch'), 'C'),  # 'ch' es un sonido propio, se protege antes de quitar las 'h'
+    (re.compile(r'hu(?=[aeio])'), 'w'),  # Huatulco, Watulco
+    (re.compile(r'gu(?=[ei])'), 'G'),  # 'g' fuerte: Guerrero, Guelatao
+    (re.compile(r'h'), ''),  # 'h' muda
+    (re.compile(r'qu'), 'k'),
+    (re.compile(r'c(?=[ei])'), 's'),
+    (re.compile(r'[cqk]'), 'k'),
+    (re.compile(r'z'), 's'),
+    (re.compile(r'g(?=[ei])'), 'j'),
+    (re.compile(r'x'), 'j'),  # Xalapa, Jalapa; México, Méjico
+    (re.compile(r'll'), 'y'),
+    (re.compile(r'v'), 'b'),
+    (re.compile(r'y(?![aeiou])'), 'i'),  # 'y' con sonido de vocal: Rey, Rei
+    (re.compile(r'([a-zA-Z0-9])\1+'), r'\1'),  # Letras dobles: rr, ss...
+]
+
+
+def phonetic_key(text):
+    """
+    Clave fonética de un nombre en español de México: dos nombres con la misma clave se pronuncian igual aunque
+    se escriban distinto (s/z/c, ll/y, b/v, h muda, x/j). Se respetan los separadores '-' de las claves
+    estado-municipio y municipio-localidad.
+    """
+    if not isinstance(text, str):
+        return None
+    text = unidecode.unidecode(text).lower()
+    text = re.sub(r'[^a-z0-9\-]+', ' ', text)
+    text = re.sub(r'\s*-\s*', '-', text).strip()
+    for pattern, replacement in REGLAS_FONETICAS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def build_phonetic_index(choices):
+    """
+    Índice clave fonética -> nombre del catálogo. Las claves fonéticas que comparten varios nombres distintos
+    del catálogo son ambiguas y no se incluyen, para que este nivel solo resuelva coincidencias seguras.
+    """
+    index = {}
+    ambiguous = set()
+    for choice in choices:
+        key = phonetic_key(choice)
+        if not key or key in ambiguous:
+            continue
+        if key in index and index[key] != choice:
+            del index[key]
+            ambiguous.add(key)
+        else:
+            index.setdefault(key, choice)
+    return index
@@ -0,0 +1,153 @@
+import codecs
+import logging
+import pandas as pd
+
+# Incluir estas líneas en cada script para registrar los logs
+logger = logging.getLogger("Fertilizantes")
+
+# Columnas de los ficheros de localidades de INEGI que usa el pipeline. Las claves CVE_* se leen como texto
+# para no perder los ceros a la izquierda; POB_TOTAL se deja inferir.
+COLUMNAS_INEGI = {
+    'CVE_ENT': str,
+    'NOM_ENT': str,
+    'CVE_MUN': str,
+    'NOM_MUN': str,
+    'CVE_LOC': str,
+    'NOM_LOC': str,
+    'POB_TOTAL': None,
+}
+
+# Esquemas de los ficheros de entrada conocidos:
+# - columns: columnas que se leen y su tipo (None para dejar que pandas lo infiera).
+# - project: si solo se leen las columnas de columns (usecols) o todas.
+# - encoding: codificación, o tupla de codificaciones que se prueban en orden.
+# - skiprows: filas de título antes de la cabecera.
+ESQUEMAS = {
+    'inegi': {
+        'columns': COLUMNAS_INEGI,
+        'project': True,
+        'encoding': 'utf-8',
+        'skiprows': None,
+    },
+    # Corte de abril de 2024, dataset_inegi.csv
+    'inegi_2024': {
+        'columns': COLUMNAS_INEGI,
+        'project': True,
+        'encoding': 'cp1252',
+        'skiprows': None,
+    },
+    'productores_autorizados': {
+        'columns': {
+            'ESTADO': str,
+            'MUNICIPIO': str,
+            'ACUSE': str,
+            'APELLIDO PATERNO': str,
+            'APELLIDO MATERNO': str,
+            'NOMBRE (S)': str,
+            'PAQUETE': None,
+        },
+        'project': True,
+        'encoding': ('cp1252', 'utf-8'),
+        'skiprows': 1,
+    },
+    'beneficiarios_2023': {
+        'columns': {
+            'ESTADO': str,
+            'MUNICIPIO': str,
+            'ACUSE ESTATAL': str,
+            'APELLIDO PATERNO': str,
+            'APELLIDO MATERNO': str,
+            'NOMBRE (S)': str,
+            'PAQUETE': None,
+        },
+        'project': True,
+        'encoding': ('cp1252', 'utf-8'),
+        'skiprows': 1,
+    },
+    # En data_cleaning3 se eliminan las filas con algún valor vacío en cualquier columna (dropna), de modo que
+    # se leen todas para no cambiar qué filas se conservan; solo se fijan los tipos.
+    'beneficiarios_2019_2022': {
+        'columns': {
+            'BENEFICIARIO': str,
+            'ZONA': str,
+            'ENTIDAD': str,
+            'MUNICIPIO': str,
+            'LOCALIDAD': str,
+            'ESTRATIFICACIÓN': str,
+            'PROGRAMA': str,
+            'COMPONENTE': str,
+            'SUBCOMPONENTE': str,
+            'PRODUCTO': str,
+            'FECHA': str,
+            'MONTO FEDERAL': None,
+            'APOYO': str,
+            'ACTIVIDAD': str,
+            'ESLABÓN': str,
+            'CICLO AGRÍCOLA': str,
+        },
+        'project': False,
+        'encoding': 'utf-8',
+        'skiprows': None,
+    },
+}
+
+
+def read_source(path, schema, encoding=None, columns=None, **kwargs):
+    """
+    Lee un fichero de entrada con su esquema de ESQUEMAS: solo las columnas declaradas (si el esquema las
+    proyecta), con sus tipos y con la codificación del esquema. encoding permite forzar otra codificación,
+    columns leer solo algunas de las columnas y el resto de argumentos se pasan a pd.read_csv.
+    """
+    spec = ESQUEMAS[schema]
+    dtype = {column: column_type for column, column_type in spec['columns'].items() if column_type is not None}
+
+    # Se admiten ficheros a los que les falte alguna columna declarada
+    if columns is None and spec['project']:
+        columns = spec['columns']
+    usecols = (lambda column: column in columns) if columns is not None else None
+
+    encodings = encoding or spec['encoding']
+    if isinstance(encodings, str):
+        encodings = (encodings,)
+
+    for i, file_encoding in enumerate(encodings):
+        try:
+            # Parser de C: el de pyarrow infiere los tipos antes de aplicar dtype y las claves CVE_* pierden
+            # los ceros a la izquierda
+            return pd.read_csv(path, encoding=file_encoding, usecols=usecols, dtype=dtype,
+                               skiprows=spec['skiprows'], engine='c', **kwargs)
+        except UnicodeDecodeError:
+            if i == len(encodings) - 1:
+                raise
+            logger.debug("No se puede leer %s con la codificación %s, se prueba con %s", path, file_encoding,
+                         encodings[i + 1])
+
+
+def source_encoding(path, schema, block_size=1 << 20):
+    """
+    Primera codificación del esquema con la que se puede decodificar todo el fichero. Se comprueba por bloques,
+    sin cargarlo en memoria, para poder leerlo después por partes (chunksize), donde un error de decodificación
+    solo aparecería al llegar al bloque que lo contiene.
+    """
+    return detect_encoding(path, ESQUEMAS[schema]['encoding'], block_size=block_size)
+
+
+def detect_encoding(path, encodings, block_size=1 << 20):
+    """
+    Primera de encodings con la que se pueden decodificar todos los bytes del fichero. Solo se decodifican los
+    bytes, sin interpretar el CSV, así que es mucho más rápido que intentar leerlo con pd.read_csv y volver a
+    empezar con otra codificación al encontrar un byte inválido.
+    """
+    if isinstance(encodings, str):
+        return encodings
+    for encoding in encodings[:-1]:
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            with open(path, 'rb') as file:
+                for block in iter(lambda: file.read(block_size), b''):
+                    decoder.decode(block)
+                decoder.decode(b'', final=True)
+            return encoding
+        except UnicodeDecodeError:
+            logger.debug("No se puede leer %s con la codificación %s", path, encoding)
+    return encodings[-1]
@@ -2,30 +2,115 @@ import requests
 from bs4 import BeautifulSoup
 import os   
 import pandas as pd
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 
-def scrape_urls(url):
-    response = requests.get(url)
-    soup = BeautifulSoup(response.text, 'html.parser')
+# Tipos de recurso que se publican en las páginas de los datasets de datos.gob.mx
+RESOURCE_TYPES = ('csv', 'xlsx', 'zip')
 
-    urls = []
-    for link in soup.find_all('a'):
-        href = link.get('href')
-        if href and href.startswith('http') and href.endswith('.csv'):
-            urls.append(href)
+# Segundos durante los que se reutilizan los recursos de una página sin volver a pedirla al portal. La caché es
+# del proceso, así que recargar la página de Streamlit no vuelve a consultar datos.gob.mx.
+CACHE_TTL = 60 * 60
 
-    return urls
+# Páginas que se piden a la vez
+MAX_WORKERS = 4
+
+TIMEOUT = (10, 60)
+
+_cache = {}
+_cache_lock = threading.Lock()
 
-def scrape_xlsx(url):
-    response = requests.get(url)
-    soup = BeautifulSoup(response.text, 'html.parser')
 
-    urls = []
+def parse_resources(html, page_url):
+    """
+    Recursos (csv, xlsx y zip) enlazados en una página de dataset, en una sola pasada por sus enlaces y en el
+    orden en que aparecen. Los enlaces repetidos se devuelven una vez.
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+
+    resources = []
+    seen = set()
     for link in soup.find_all('a'):
         href = link.get('href')
-        if href and href.startswith('http') and href.endswith('.xlsx'):
-            urls.append(href)
+        if not href or not href.startswith('http') or href in seen:
+            continue
+        resource_type = href.rsplit('.', 1)[-1].lower()
+        if resource_type not in RESOURCE_TYPES:
+            continue
+        seen.add(href)
+        resources.append({
+            'url': href,
+            'format': resource_type,
+            'filename': href.split('/')[-1],
+            'title': link.get('title') or link.get_text(strip=True),
+            'page': page_url,
+        })
+
+    return resources
+
+
+def _fetch_resources(session, url):
+    # None si la página no se ha podido obtener, para que un error no detenga la consulta de las demás páginas
+    try:
+        response = session.get(url, timeout=TIMEOUT)
+    except requests.RequestException as error:
+        print(f"Error scraping {url}: {error}")
+        return None
+    if response.status_code != 200:
+        print(f"Error scraping {url}: {response.status_code}")
+        return None
+    return parse_resources(response.text, url)
+
 
-    return urls
+def discover_resources(page_urls, ttl=CACHE_TTL, max_workers=MAX_WORKERS):
+    """
+    Recursos de cada una de las páginas de page_urls, como un diccionario página -> lista de recursos (ver
+    parse_resources). Las páginas que no están en la caché o que llevan más de ttl segundos en ella se piden a
+    la vez, con una sesión compartida; las que fallan devuelven una lista vacía y no se guardan.
+    """
+    page_urls = list(dict.fromkeys(page_urls))
+    now = time.time()
+    with _cache_lock:
+        cached = {url: _cache[url][1] for url in page_urls if url in _cache and now - _cache[url][0] < ttl}
+    missing = [url for url in page_urls if url not in cached]
+
+    if missing:
+        with requests.Session() as session:
+            adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                fetched = dict(zip(missing, executor.map(lambda url: _fetch_resources(session, url), missing)))
+        with _cache_lock:
+            for url, resources in fetched.items():
+                if resources is not None:
+                    _cache[url] = (now, resources)
+        cached.update({url: resources or [] for url, resources in fetched.items()})
+
+    return {url: cached[url] for url in page_urls}
+
+
+def resource_urls(page_urls, resource_type):
+    # URLs de los recursos de un tipo en todas las páginas, en el orden de page_urls
+    if isinstance(page_urls, str):
+        page_urls = [page_urls]
+    resources = discover_resources(page_urls)
+    return [resource['url'] for url in page_urls for resource in resources[url]
+            if resource['format'] == resource_type]
+
+
+def clear_resource_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def scrape_urls(url):
+    return resource_urls(url, 'csv')
+
+def scrape_xlsx(url):
+    return resource_urls(url, 'xlsx')
 
 '''
 url = "https://www.datos.gob.mx/busca/dataset/programa-de-fertilizantes-2023-listados-autorizados"
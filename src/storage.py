@@ -0,0 +1,85 @@
+import logging
+import os
+import pandas as pd
+
+# Incluir estas líneas en cada script para registrar los logs
+logger = logging.getLogger("Fertilizantes")
+
+# Formato de los ficheros intermedios y finales del pipeline (catálogos de INEGI, dataset_inegi_clean_*,
+# INEGI_UNIQUELOC_* y listados de localidades). Parquet y Arrow IPC conservan los tipos de las columnas, de
+# modo que las claves CVE_* se leen como texto con sus ceros a la izquierda y no hay que volver a inferirlos.
+FORMATO = 'parquet'
+
+EXTENSIONES = {'parquet': '.parquet', 'arrow': '.arrow', 'csv': '.csv'}
+
+COMPRESION = 'zstd'
+
+# Columnas de claves geoestadísticas que, en CSV, se leen siempre como texto
+COLUMNAS_CVE = {'CVE_ENT': str, 'CVE_MUN': str, 'CVE_LOC': str}
+
+
+def table_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    for fmt, fmt_extension in EXTENSIONES.items():
+        if extension == fmt_extension:
+            return fmt
+    raise ValueError(f"Formato de tabla desconocido: {path}. Extensiones admitidas: {list(EXTENSIONES.values())}")
+
+
+def table_path(path, fmt=FORMATO):
+    """
+    Ruta del fichero path con la extensión del formato fmt: 'data/inegi/dataset_inegi_clean_2019.csv' ->
+    'data/inegi/dataset_inegi_clean_2019.parquet'.
+    """
+    return os.path.splitext(path)[0] + EXTENSIONES[fmt]
+
+
+def resolve_table(path):
+    """
+    Devuelve la ruta con la que se debe leer la tabla path: la versión en FORMATO si existe y, si no, path. Así
+    las rutas .csv que se pasan desde main.py siguen funcionando con los ficheros ya convertidos.
+    """
+    preferred = table_path(path)
+    if os.path.exists(preferred):
+        return preferred
+    return path
+
+
+def table_exists(path):
+    return os.path.exists(resolve_table(path))
+
+
+def write_table(df, path, fmt=None):
+    """
+    Guarda df en path en formato Parquet, Arrow IPC o CSV según fmt o, si no se indica, según la extensión de
+    path. Devuelve la ruta escrita.
+    """
+    if fmt is not None:
+        path = table_path(path, fmt)
+    fmt = table_format(path)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    if fmt == 'parquet':
+        df.to_parquet(path, index=False, compression=COMPRESION)
+    elif fmt == 'arrow':
+        df.reset_index(drop=True).to_feather(path, compression=COMPRESION)
+    else:
+        df.to_csv(path, index=False, encoding='utf-8')
+    logger.debug("Tabla guardada en %s: %s filas, %s columnas", path, df.shape[0], df.shape[1])
+    return path
+
+
+def read_table(path, columns=None):
+    """
+    Lee una tabla guardada con write_table. Con columns solo se leen esas columnas (en Parquet y Arrow sin leer
+    siquiera el resto del fichero). Se usa resolve_table, de modo que path puede ser la ruta .csv original.
+    """
+    path = resolve_table(path)
+    fmt = table_format(path)
+    if fmt == 'parquet':
+        return pd.read_parquet(path, columns=columns)
+    if fmt == 'arrow':
+        return pd.read_feather(path, columns=columns)
+    dtype = {column: str for column in COLUMNAS_CVE if columns is None or column in columns}
+    return pd.read_csv(path, usecols=columns, dtype=dtype)
+
@@ -0,0 +1,46 @@
+import logging
+import pandas as pd
+from src.schemas import read_source, source_encoding
+
+# Incluir estas líneas en cada script para registrar los logs
+logger = logging.getLogger("Fertilizantes")
+
+# Número de filas de los listados que se procesan a la vez en modo streaming. La memoria que usa el pipeline
+# depende de este valor y no del tamaño del listado.
+CHUNK_ROWS = 200_000
+
+
+def iter_source_chunks(paths, schema, chunksize=CHUNK_ROWS, columns=None):
+    """
+    Recorre uno o varios ficheros de entrada de un esquema de src/schemas.py en bloques de chunksize filas,
+    en el orden de paths. Con columns solo se leen esas columnas.
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    for path in paths:
+        encoding = source_encoding(path, schema)
+        with read_source(path, schema, encoding=encoding, columns=columns, chunksize=chunksize) as reader:
+            for chunk in reader:
+                yield chunk
+
+
+def unique_rows(paths, schema, columns, chunksize=CHUNK_ROWS):
+    """
+    Combinaciones distintas de columns en los ficheros, en el orden en que aparecen por primera vez. Es lo
+    único que necesita el motor de coincidencia (los pares estado-municipio) y ocupa mucho menos que el listado.
+    """
+    uniques = None
+    for chunk in iter_source_chunks(paths, schema, chunksize=chunksize, columns=columns):
+        chunk = chunk[columns].drop_duplicates()
+        uniques = chunk if uniques is None else pd.concat([uniques, chunk], ignore_index=True).drop_duplicates()
+    if uniques is None:
+        return pd.DataFrame(columns=columns)
+    return uniques.reset_index(drop=True)
+
+
+def write_chunk(df, path, first):
+    """
+    Escribe un bloque en el CSV de salida: el primero crea el fichero con la cabecera y el resto se añaden al
+    final.
+    """
+    df.to_csv(path, mode='w' if first else 'a', header=first, index=False)
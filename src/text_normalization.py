@@ -0,0 +1,102 @@
+import logging
+import re
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import unidecode
+
+# Tabla para str.translate que quita acentos y demás signos, carácter a carácter, con las mismas sustituciones que
+# unidecode. Se precalcula para el rango latino, que cubre los nombres de INEGI y de los listados; cualquier otro
+# carácter se añade la primera vez que aparece.
+TABLA_ACENTOS = {code: unidecode.unidecode(chr(code)) for code in range(0x80, 0x250)}
+
+# Memoria LRU valor original -> valor limpio compartida entre columnas y años: ENTIDAD y MUNICIPIO se limpian
+# varias veces en data_cleaning3 (ENTIDAD_c_benef, ESTADO_Clean...) y se repiten en los listados de cada año
+_MEMO = OrderedDict()
+MAX_VALORES_MEMO = 1_000_000
+
+# Incluir estas líneas en cada script para registrar los logs
+logger = logging.getLogger("Fertilizantes")
+
+
+def clean_text(text):
+    """
+    De esta manera tenemos el texto sin espacios blancos extra y sobre todo con todas las palabras con capitalización correcta.
+    """
+    if pd.isna(text):
+        return text
+    text = text.strip()  # Eliminate white spaces
+    text = text.lower()  # Convert to lowercase
+    text = unidecode.unidecode(text)  # Remove accents
+    text = re.sub('-.*-', '', text)
+    text = re.sub(r'\s+', ' ', text)  # Eliminate extra white spaces
+    text = re.sub(r'^\s+|\s+?$', '', text)  # Eliminate spaces at the beginning and end
+    return text
+
+
+def _accent_table(values):
+    # Añade a la tabla los caracteres no latinos que aparezcan en values
+    characters = set(''.join(values))
+    for character in characters:
+        if ord(character) >= 0x80 and ord(character) not in TABLA_ACENTOS:
+            TABLA_ACENTOS[ord(character)] = unidecode.unidecode(character)
+    return TABLA_ACENTOS
+
+
+def clean_text_series(series):
+    """
+    Versión de clean_text para columnas completas, con el mismo resultado que series.apply(clean_text).
+
+    Los listados tienen millones de filas pero pocos nombres distintos, así que la columna se factoriza y solo
+    se limpian sus valores distintos, que después se reparten a las filas con los códigos enteros. Los valores
+    ya limpiados en columnas o años anteriores salen de una memoria LRU compartida; el resto se limpia con
+    operaciones vectorizadas de pandas (.str), usando TABLA_ACENTOS en lugar de llamar a unidecode en cada celda.
+    """
+    codes, uniques = pd.factorize(series)
+    uniques = np.asarray(uniques, dtype=object)
+
+    cleaned = np.empty(len(uniques), dtype=object)
+    missing = []
+    for i, value in enumerate(uniques):
+        if isinstance(value, str) and value in _MEMO:
+            _MEMO.move_to_end(value)
+            cleaned[i] = _MEMO[value]
+        else:
+            missing.append(i)
+
+    if missing:
+        missing = np.array(missing)
+        cleaned[missing] = _clean_unique_values(uniques[missing])
+        for i in missing:
+            if isinstance(uniques[i], str):
+                _MEMO[uniques[i]] = cleaned[i]
+        while len(_MEMO) > MAX_VALORES_MEMO:
+            _MEMO.popitem(last=False)
+
+    logger.debug("Limpieza de texto %s: %s filas, %s valores distintos, %s limpiados y %s desde la memoria",
+                 series.name, len(series), len(uniques), len(missing), len(uniques) - len(missing))
+
+    # Las celdas vacías (código -1) conservan su valor original, igual que en clean_text. El resto comparten el
+    # mismo objeto str por valor distinto en lugar de crear una cadena por fila.
+    result = cleaned[codes]
+    if (codes == -1).any():
+        result[codes == -1] = np.asarray(series, dtype=object)[codes == -1]
+    return pd.Series(result, index=series.index, name=series.name, dtype=object)
+
+
+def _clean_unique_values(values):
+    # Aplica clean_text a un array de valores distintos con operaciones vectorizadas
+    values = pd.Series(values, dtype=object)
+    is_text = values.map(lambda value: isinstance(value, str)).to_numpy(dtype=bool)
+    cleaned = values.copy()
+    if is_text.any():
+        text = values[is_text].str.strip().str.lower()
+        text = text.str.translate(_accent_table(text))
+        text = text.str.replace('-.*-', '', regex=True)
+        text = text.str.replace(r'\s+', ' ', regex=True)
+        text = text.str.replace(r'^\s+|\s+?$', '', regex=True)
+        cleaned[is_text] = text
+    if not is_text.all():
+        # Valores que no son texto: mismo comportamiento que clean_text
+        cleaned[~is_text] = values[~is_text].map(clean_text)
+    return cleaned.to_numpy(dtype=object)
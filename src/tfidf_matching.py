@@ -0,0 +1,104 @@
+import logging
+import numpy as np
+from rapidfuzz import fuzz
+from rapidfuzz import process
+from rapidfuzz import utils
+from sklearn.feature_extraction.text import TfidfVectorizer
+from src.match_cache import catalog_version
+from src.match_results import match_result, top_candidates
+
+# Incluir estas líneas en cada script para registrar los logs
+logger = logging.getLogger("Fertilizantes")
+
+# Número de candidatos por similitud coseno que se vuelven a puntuar con WRatio
+TOP_K = 10
+
+# Número máximo de celdas (consultas x candidatos) del producto de matrices que se calculan de una vez.
+# Con float32 son unos 64 MB por bloque.
+MAX_CELDAS_POR_BLOQUE = 2 ** 24
+
+# Índices TF-IDF ya construidos, por versión del catálogo
+_TFIDF_INDEX = {}
+MAX_TFIDF_INDEX = 8
+
+
+def get_tfidf_index(choices):
+    """
+    Devuelve el vectorizador y la matriz TF-IDF dispersa (normalizada L2) de n-gramas de caracteres de un
+    catálogo de candidatos. Se construye una sola vez por catálogo y se reutiliza en las siguientes llamadas.
+    """
+    version = catalog_version(choices, 'tfidf')
+    if version not in _TFIDF_INDEX:
+        processed = [utils.default_process(choice) if isinstance(choice, str) else '' for choice in choices]
+        vectorizer = TfidfVectorizer(analyzer='char_wb', ngram_range=(2, 3), lowercase=False, dtype=np.float32)
+        matrix = vectorizer.fit_transform(processed)
+        if len(_TFIDF_INDEX) >= MAX_TFIDF_INDEX:
+            _TFIDF_INDEX.pop(next(iter(_TFIDF_INDEX)))
+        _TFIDF_INDEX[version] = (vectorizer, matrix.T.tocsr())
+    return _TFIDF_INDEX[version]
+
+
+def extract_best_matches_tfidf(queries, choices, score_cutoff=0, top_k=TOP_K, workers=-1, stats=None, limit=1):
+    """
+    Motor de coincidencia para catálogos grandes (por ejemplo, todas las localidades de INEGI del país).
+    Las claves se vectorizan en n-gramas de caracteres con TF-IDF y, por bloques de consultas, un producto de
+    matrices dispersas da la similitud coseno con todo el catálogo. Solo los top_k candidatos más parecidos
+    de cada consulta se vuelven a puntuar con WRatio, de modo que score_cutoff tiene el mismo significado que
+    en extract_best_matches.
+
+    Es una aproximación: si la mejor coincidencia por WRatio no está entre los top_k por coseno, no se
+    encuentra.
+
+    Devuelve los mismos dos arrays que extract_best_matches, con una columna por candidata si limit > 1.
+    """
+    queries = list(queries)
+    choices = list(choices)
+
+    best_matches = np.full((len(queries), limit), None, dtype=object)
+    best_scores = np.full((len(queries), limit), np.nan)
+
+    if len(queries) == 0 or len(choices) == 0:
+        return match_result(best_matches, best_scores, limit)
+
+    vectorizer, choices_matrix_t = get_tfidf_index(choices)
+    choices_array = np.array(choices, dtype=object)
+    processed_choices = np.array([utils.default_process(choice) if isinstance(choice, str) else ''
+                                  for choice in choices], dtype=object)
+
+    valid_idx = np.flatnonzero([isinstance(query, str) for query in queries])
+    processed_queries = np.array([utils.default_process(queries[i]) for i in valid_idx], dtype=object)
+    top_k = min(max(top_k, limit), len(choices))
+    cutoff = max(score_cutoff - 0.5, 0)
+
+    block_size = max(1, MAX_CELDAS_POR_BLOQUE // len(choices))
+    for start in range(0, len(valid_idx), block_size):
+        block_queries = processed_queries[start:start + block_size]
+        similarity = (vectorizer.transform(block_queries) @ choices_matrix_t).toarray()
+
+        # Los top_k candidatos de cada consulta, ordenados por su posición en el catálogo para que en caso
+        # de empate gane el primero, igual que en process.extractOne
+        candidates = np.argpartition(-similarity, top_k - 1, axis=1)[:, :top_k]
+        candidates.sort(axis=1)
+
+        scores = process.cpdist(np.repeat(block_queries, top_k), processed_choices[candidates.ravel()],
+                                scorer=fuzz.WRatio, processor=None, score_cutoff=cutoff, workers=workers)
+        scores = np.rint(scores).reshape(len(block_queries), top_k)
+        best = top_candidates(scores, limit)
+        scores = np.take_along_axis(scores, best, axis=1)
+        best = np.take_along_axis(candidates, best, axis=1)
+
+        rows, ranks = np.nonzero(scores >= score_cutoff)
+        idx = valid_idx[start:start + block_size]
+        best_matches[idx[rows], ranks] = choices_array[best[rows, ranks]]
+        best_scores[idx[rows], ranks] = scores[rows, ranks]
+
+    if stats is not None:
+        total_pairs = len(valid_idx) * len(choices)
+        stats['pairs'] = stats.get('pairs', 0) + total_pairs
+        stats['pruned'] = stats.get('pruned', 0) + total_pairs - len(valid_idx) * top_k
+
+    logger.debug("TF-IDF: %s de %s claves con coincidencia (umbral %s, %s candidatos, top %s)",
+                 int(np.count_nonzero(~np.isnan(best_scores[:, 0]))), len(queries), score_cutoff, len(choices),
+                 top_k)
+
+    return match_result(best_matches, best_scores, limit)
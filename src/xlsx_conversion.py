@@ -0,0 +1,130 @@
+import csv
+import datetime
+import logging
+import os
+import queue
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Manager
+from types import SimpleNamespace
+import openpyxl
+
+# Incluir estas líneas en cada script para registrar los logs
+logger = logging.getLogger("Fertilizantes")
+
+# Cada cuántas filas escritas informa un proceso de su avance
+FILAS_POR_AVISO = 5_000
+
+
+def _cell_to_csv(value):
+    # Mismo texto que escribe pandas con to_csv para los tipos que devuelve openpyxl: las fechas sin hora se
+    # escriben solo con la fecha
+    if value is None:
+        return ''
+    if isinstance(value, datetime.datetime) and value.time() == datetime.time(0):
+        return value.date().isoformat()
+    return value
+
+
+def xlsx_to_csv(xlsx_path, csv_path=None, progress_queue=None, report_every=FILAS_POR_AVISO):
+    """
+    Convierte la primera hoja de un .xlsx a .csv (por defecto con el mismo nombre) fila a fila, con openpyxl en
+    modo de solo lectura, sin cargar el libro entero en memoria. Se escribe en un fichero temporal que solo
+    sustituye al .csv cuando la conversión termina, de modo que una conversión interrumpida no deja un .csv a
+    medias que luego lea load_datasets.
+
+    Si se pasa progress_queue se envían a ella (con put) tuplas (fichero, filas escritas, filas totales o None,
+    terminado).
+    Devuelve el número de filas de datos escritas.
+    """
+    csv_path = csv_path or os.path.splitext(xlsx_path)[0] + '.csv'
+    filename = os.path.basename(xlsx_path)
+    tmp_path = csv_path + '.tmp'
+
+    workbook = openpyxl.load_workbook(xlsx_path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        # Dimensión declarada en el fichero, puede no estar
+        total_rows = sheet.max_row - 1 if sheet.max_row else None
+        rows = sheet.iter_rows(values_only=True)
+        written = 0
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            header = list(next(rows, ()))
+            while header and header[-1] is None:
+                header.pop()
+            # Como pd.read_excel, las columnas sin nombre se llaman 'Unnamed: <posición>'
+            writer.writerow([f'Unnamed: {i}' if name is None else name for i, name in enumerate(header)])
+            for row in rows:
+                if all(value is None for value in row):
+                    continue
+                writer.writerow([_cell_to_csv(value) for value in row[:len(header)]])
+                written += 1
+                if progress_queue is not None and written % report_every == 0:
+                    progress_queue.put((filename, written, total_rows, False))
+        os.replace(tmp_path, csv_path)
+    finally:
+        workbook.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    if progress_queue is not None:
+        progress_queue.put((filename, written, total_rows, True))
+    logger.info("Convertido %s a %s: %s filas", filename, os.path.basename(csv_path), written)
+    return written
+
+
+def convert_xlsx_directory(directory_path, max_workers=None, progress_callback=None):
+    """
+    Convierte a .csv todos los .xlsx de directory_path, varios a la vez en un pool de procesos.
+
+    Parameters:
+    - directory_path: Carpeta con los .xlsx descargados.
+    - max_workers: Número de procesos. None usa todos los núcleos y 1 convierte los ficheros de forma secuencial.
+    - progress_callback: Función que recibe el avance total (de 0 a 1) y un texto con el fichero y las filas
+      convertidas. El avance se calcula por filas cuando los ficheros declaran su tamaño y, si no, por ficheros.
+
+    Returns:
+    - Diccionario con el número de filas convertidas de cada fichero.
+    """
+    xlsx_files = sorted(f for f in os.listdir(directory_path) if f.endswith('.xlsx'))
+    if not xlsx_files:
+        return {}
+
+    state = {filename: (0, None, False) for filename in xlsx_files}
+
+    def report(filename, written, total_rows, finished):
+        state[filename] = (written, total_rows, finished)
+        if progress_callback is None:
+            return
+        finished_files = sum(done for _, _, done in state.values())
+        if all(total is not None for _, total, _ in state.values()):
+            total = sum(max(total, 1) for _, total, _ in state.values())
+            done_rows = sum(total if done else min(rows, total) for rows, total, done in state.values())
+            progress = done_rows / total
+        else:
+            progress = finished_files / len(xlsx_files)
+        progress_callback(min(progress, 1.0), f"{filename}: {written} filas ({finished_files}/{len(xlsx_files)} "
+                                              f"ficheros)")
+
+    paths = [os.path.join(directory_path, filename) for filename in xlsx_files]
+
+    if max_workers == 1 or len(xlsx_files) == 1:
+        # En este proceso los avisos se atienden en cuanto se envían
+        progress_queue = SimpleNamespace(put=lambda message: report(*message))
+        return {filename: xlsx_to_csv(path, progress_queue=progress_queue)
+                for filename, path in zip(xlsx_files, paths)}
+
+    with Manager() as manager, ProcessPoolExecutor(max_workers=max_workers) as executor:
+        progress_queue = manager.Queue()
+        futures = {executor.submit(xlsx_to_csv, path, progress_queue=progress_queue): filename
+                   for filename, path in zip(xlsx_files, paths)}
+        # Los avisos de los procesos se atienden en este proceso, que es el que tiene la barra de progreso
+        while not all(future.done() for future in futures):
+            try:
+                report(*progress_queue.get(timeout=0.2))
+            except queue.Empty:
+                pass
+        result = {filename: future.result() for future, filename in futures.items()}
+        while not progress_queue.empty():
+            report(*progress_queue.get())
+    return result
@@ -0,0 +1,227 @@
+import os
+import logging
+import sys
+import threading
+import gzip
+import json
+from email.utils import formatdate
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+class DatosGobHandler(SimpleHTTPRequestHandler):
+    # HTTP/1.1 para que el servidor mantenga abiertas las conexiones, como datos.gob.mx
+    protocol_version = 'HTTP/1.1'
+    connections = set()
+    ranges = []
+    # Comprimir con gzip siempre, aunque el cliente pida 'Accept-Encoding: identity'
+    always_gzip = False
+
+    def do_GET(self):
+        self.connections.add(self.client_address)
+        range_header = self.headers.get('Range')
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            return super().do_GET()
+        with open(path, 'rb') as file:
+            content = file.read()
+        last_modified = self.date_time_string(int(os.path.getmtime(path)))
+
+        if self.always_gzip or 'gzip' in self.headers.get('Accept-Encoding', ''):
+            content = gzip.compress(content)
+            self.send_response(200)
+            self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(content)))
+            self.send_header('Last-Modified', last_modified)
+            self.end_headers()
+            self.wfile.write(content)
+            return
+
+        # Con If-Range, si el fichero ha cambiado se responde con el fichero completo
+        if range_header is None or self.headers.get('If-Range', last_modified) != last_modified:
+            return super().do_GET()
+
+        # Respuesta parcial a 'Range: bytes=<inicio>-'
+        self.ranges.append(range_header)
+        start = int(range_header[len('bytes='):-1])
+        self.send_response(206)
+        self.send_header('Content-Range', f'bytes {start}-{len(content) - 1}/{len(content)}')
+        self.send_header('Content-Length', str(len(content) - start))
+        self.send_header('Last-Modified', last_modified)
+        self.end_headers()
+        self.wfile.write(content[start:])
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def setup_logger():
+    import config
+    logger = logging.getLogger("Fertilizantes")
+    logger.setLevel(logging.INFO)
+    yield logger
+
+
+@pytest.fixture
+def datos_gob(tmp_path):
+    # Servidor HTTP local que hace de datos.gob.mx, con los recursos en tmp_path/recursos
+    resources = tmp_path / 'recursos'
+    resources.mkdir()
+    DatosGobHandler.connections = set()
+    DatosGobHandler.ranges = []
+    DatosGobHandler.always_gzip = False
+    server = ThreadingHTTPServer(('127.0.0.1', 0), partial(DatosGobHandler, directory=str(resources)))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield resources, f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+def test_download_datasets_en_paralelo(setup_logger, tmp_path, datos_gob):
+    from src.dataset_download import download_datasets
+    setup_logger.info("Ejecutando test de la descarga en paralelo de los recursos de datos.gob.mx.")
+    resources, base_url = datos_gob
+    for month in range(1, 13):
+        (resources / f'listado_{month:02d}.csv').write_text(f'ESTADO,MUNICIPIO\nGUERRERO,AZOYU{month}\n' * 1000)
+    destination = tmp_path / 'descargas'
+    destination.mkdir()
+
+    urls = [f'{base_url}/listado_{month:02d}.csv' for month in range(1, 13)]
+    urls.insert(3, f'{base_url}/no_existe.csv')
+    progress = []
+    result = download_datasets(urls, str(destination), progress.append, max_workers=4,
+                               manifest_path=str(tmp_path / 'download_manifest.json'))
+
+    assert result['good_count'] == 12
+    assert result['good_urls'] == [url for url in urls if 'no_existe' not in url]
+    assert result['failed_urls'] == [f'{base_url}/no_existe.csv']
+    assert progress == sorted(progress)
+    assert progress[-1] == 1.0
+    for month in range(1, 13):
+        filename = f'listado_{month:02d}.csv'
+        assert (destination / filename).read_bytes() == (resources / filename).read_bytes()
+    # Las conexiones se reutilizan: como mucho una por hilo y no una por fichero, más la que cierra el servidor
+    # de prueba tras el 404
+    assert len(DatosGobHandler.connections) <= 4 + 1
+
+
+def test_download_datasets_continua_las_descargas_interrumpidas(setup_logger, tmp_path, datos_gob):
+    from src.dataset_download import CHUNK_BYTES, download_datasets
+    setup_logger.info("Ejecutando test de la reanudación de descargas interrumpidas con Range.")
+    resources, base_url = datos_gob
+    content = os.urandom(3 * CHUNK_BYTES + 123)
+    (resources / 'fertilizantes_2022.xlsx').write_bytes(content)
+    destination = tmp_path / 'descargas'
+    destination.mkdir()
+    # Descarga anterior interrumpida a mitad del fichero, con el Last-Modified de la respuesta
+    (destination / 'fertilizantes_2022.xlsx.part').write_bytes(content[:CHUNK_BYTES + 7])
+    last_modified = formatdate(int(os.path.getmtime(resources / 'fertilizantes_2022.xlsx')), usegmt=True)
+    (destination / 'fertilizantes_2022.xlsx.part.json').write_text(json.dumps({'last_modified': last_modified}))
+
+    progress = []
+    result = download_datasets([f'{base_url}/fertilizantes_2022.xlsx'], str(destination), progress.append,
+                               manifest_path=None)
+
+    assert result['good_count'] == 1
+    assert DatosGobHandler.ranges == [f'bytes={CHUNK_BYTES + 7}-']
+    assert (destination / 'fertilizantes_2022.xlsx').read_bytes() == content
+    assert os.listdir(destination) == ['fertilizantes_2022.xlsx']
+    assert progress[-1] == 1.0
+
+
+def test_download_datasets_no_descarga_los_ficheros_sin_cambios(setup_logger, tmp_path, datos_gob):
+    from src.dataset_download import download_datasets, read_download_manifest
+    setup_logger.info("Ejecutando test de las descargas condicionales con el manifiesto de descargas.")
+    resources, base_url = datos_gob
+    for year in ['2019', '2020']:
+        (resources / f'fertilizantes_{year}.xlsx').write_bytes(year.encode() * 1000)
+    destination = tmp_path / 'descargas'
+    destination.mkdir()
+    urls = [f'{base_url}/fertilizantes_2019.xlsx', f'{base_url}/fertilizantes_2020.xlsx']
+    manifest_path = str(tmp_path / 'download_manifest.json')
+
+    first = download_datasets(urls, str(destination), lambda progress: None, manifest_path=manifest_path)
+    assert first['updated_urls'] == urls
+    manifest = read_download_manifest(manifest_path)
+    assert manifest[urls[0]]['size'] == 4000
+    assert manifest[urls[0]]['last_modified'] is not None
+
+    # Se publica una nueva versión del listado de 2020
+    (resources / 'fertilizantes_2020.xlsx').write_bytes(b'2020 corregido')
+    mtime = os.path.getmtime(resources / 'fertilizantes_2019.xlsx') + 10
+    os.utime(resources / 'fertilizantes_2020.xlsx', (mtime, mtime))
+
+    second = download_datasets(urls, str(destination), lambda progress: None, manifest_path=manifest_path)
+    assert second['good_urls'] == urls
+    assert second['unchanged_urls'] == [urls[0]]
+    assert second['updated_urls'] == [urls[1]]
+    assert (destination / 'fertilizantes_2020.xlsx').read_bytes() == b'2020 corregido'
+    assert read_download_manifest(manifest_path)[urls[1]]['size'] == len(b'2020 corregido')
+
+
+def test_download_datasets_no_mezcla_un_part_de_otra_version(setup_logger, tmp_path, datos_gob):
+    from src.dataset_download import download_datasets
+    setup_logger.info("Ejecutando test de la reanudación con If-Range de un fichero que ha cambiado.")
+    resources, base_url = datos_gob
+    content = b'ESTADO,MUNICIPIO\nPUEBLA,ATLIXCO\n' * 1000
+    (resources / 'listado.csv').write_bytes(content)
+    destination = tmp_path / 'descargas'
+    destination.mkdir()
+    # .part de la versión anterior del fichero
+    (destination / 'listado.csv.part').write_bytes(b'ESTADO,MUNICIPIO\nGUERRERO,AZOYU\n')
+    (destination / 'listado.csv.part.json').write_text(json.dumps({'last_modified': formatdate(0, usegmt=True)}))
+
+    result = download_datasets([f'{base_url}/listado.csv'], str(destination), lambda progress: None,
+                               manifest_path=None)
+
+    assert result['good_count'] == 1
+    assert DatosGobHandler.ranges == []
+    assert (destination / 'listado.csv').read_bytes() == content
+    assert os.listdir(destination) == ['listado.csv']
+
+
+def test_download_datasets_urls_con_el_mismo_fichero(setup_logger, tmp_path, datos_gob):
+    from src.dataset_download import download_datasets, read_download_manifest
+    setup_logger.info("Ejecutando test de las urls repetidas o con el mismo nombre de fichero.")
+    resources, base_url = datos_gob
+    (resources / 'otro').mkdir()
+    (resources / 'listado.csv').write_bytes(b'ESTADO,MUNICIPIO\nGUERRERO,AZOYU\n' * 1000)
+    (resources / 'otro' / 'listado.csv').write_bytes(b'ESTADO,MUNICIPIO\nPUEBLA,ATLIXCO\n' * 1000)
+    (resources / 'productores.csv').write_bytes(b'ESTADO,MUNICIPIO\nMORELOS,CUAUTLA\n' * 1000)
+    destination = tmp_path / 'descargas'
+    destination.mkdir()
+    urls = [f'{base_url}/listado.csv', f'{base_url}/productores.csv', f'{base_url}/listado.csv',
+            f'{base_url}/otro/listado.csv']
+    manifest_path = str(tmp_path / 'download_manifest.json')
+
+    result = download_datasets(urls, str(destination), lambda progress: None, manifest_path=manifest_path)
+
+    assert result['good_urls'] == urls[:2]
+    assert result['failed_urls'] == [urls[3]]
+    assert (destination / 'listado.csv').read_bytes() == (resources / 'listado.csv').read_bytes()
+    assert sorted(os.listdir(destination)) == ['listado.csv', 'productores.csv']
+    assert sorted(read_download_manifest(manifest_path)) == sorted(urls[:2])
+
+
+@pytest.mark.parametrize('always_gzip', [False, True])
+def test_download_datasets_con_gzip(setup_logger, tmp_path, datos_gob, always_gzip):
+    from src.dataset_download import download_datasets
+    setup_logger.info("Ejecutando test de la descarga desde un servidor que comprime con gzip.")
+    resources, base_url = datos_gob
+    DatosGobHandler.always_gzip = always_gzip
+    content = b'ESTADO,MUNICIPIO\nGUERRERO,AZOYU\n' * 5000
+    (resources / 'listado.csv').write_bytes(content)
+    destination = tmp_path / 'descargas'
+    destination.mkdir()
+
+    result = download_datasets([f'{base_url}/listado.csv'], str(destination), lambda progress: None,
+                               manifest_path=None)
+
+    assert result['good_count'] == 1
+    assert (destination / 'listado.csv').read_bytes() == content
+    assert os.listdir(destination) == ['listado.csv']
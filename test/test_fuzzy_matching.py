@@ -0,0 +1,265 @@
+import os
+import logging
+import sys
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+CLAVES_INEGI = ['guerrero-azoyu', 'guerrero-tecoanapa', 'guerrero-coyuca de benitez', 'guerrero-coyuca de catalan',
+                'puebla-atlixco', 'puebla-tehuacan', 'oaxaca-santa maria huatulco', 'chiapas-tuxtla gutierrez']
+CLAVES_LISTADO = ['guerrero-azoyu', 'guerrero-tecoanapan', 'guerero-coyuca de benites', 'puebla-atlixco.',
+                  'oaxaca-sta maria huatulco', 'chiapas-tuxtla gtz', 'sonora-hermosillo']
+
+
+@pytest.fixture(autouse=True)
+def setup_logger():
+    import config
+    logger = logging.getLogger("Fertilizantes")
+    logger.setLevel(logging.INFO)
+    yield logger
+
+
+@pytest.mark.parametrize('threshold', [85, 90, 96])
+def test_extract_best_matches_igual_que_extract_one(setup_logger, threshold):
+    from thefuzz import process
+    from src.fuzzy_matching import extract_best_matches
+    setup_logger.info("Ejecutando test del motor de coincidencia difusa con umbral %s.", threshold)
+
+    best_matches, scores = extract_best_matches(CLAVES_LISTADO, CLAVES_INEGI, score_cutoff=threshold)
+
+    for query, best_match, score in zip(CLAVES_LISTADO, best_matches, scores):
+        expected = process.extractOne(query, CLAVES_INEGI, score_cutoff=threshold)
+        if expected is None:
+            assert best_match is None
+        else:
+            assert (best_match, score) == expected
+
+
+def test_extract_best_matches_sin_candidatos(setup_logger):
+    from src.fuzzy_matching import extract_best_matches
+    setup_logger.info("Ejecutando test del motor de coincidencia difusa sin candidatos.")
+
+    best_matches, scores = extract_best_matches(CLAVES_LISTADO, [], score_cutoff=90)
+
+    assert all(best_match is None for best_match in best_matches)
+    assert len(scores) == len(CLAVES_LISTADO)
+
+
+def test_match_keys_bloqueo_por_estado(setup_logger):
+    from src.fuzzy_matching import match_keys
+    setup_logger.info("Ejecutando test del bloqueo por estado.")
+    claves_inegi = CLAVES_INEGI + ['veracruz de ignacio de la llave-xalapa', 'mexico-atlixco']
+
+    best_matches, _ = match_keys(['veracruz-xalapa', 'mexico-atlixc', 'sonora-atlixco'], claves_inegi,
+                                 score_cutoff=85, block_by_state=True)
+
+    assert list(best_matches) == ['veracruz de ignacio de la llave-xalapa', 'mexico-atlixco', None]
+
+
+def test_match_keys_coincidencia_exacta(setup_logger):
+    from src.fuzzy_matching import match_keys
+    setup_logger.info("Ejecutando test de la coincidencia exacta previa a la difusa.")
+
+    best_matches, scores = match_keys(CLAVES_LISTADO, CLAVES_INEGI, score_cutoff=85)
+
+    assert best_matches[0] == 'guerrero-azoyu'
+    assert scores[0] == 100
+    assert best_matches[-1] is None
+
+
+def test_match_keys_cache_en_disco(setup_logger, tmp_path):
+    from src.fuzzy_matching import match_keys
+    from src.match_cache import catalog_version, load_cached_matches
+    setup_logger.info("Ejecutando test de la caché de coincidencias en disco.")
+    cache_path = str(tmp_path / 'match_cache.sqlite')
+
+    first = match_keys(CLAVES_LISTADO, CLAVES_INEGI, score_cutoff=85, cache_path=cache_path)
+    second = match_keys(CLAVES_LISTADO, CLAVES_INEGI, score_cutoff=85, cache_path=cache_path)
+
+    assert list(first[0]) == list(second[0])
+    version = catalog_version(CLAVES_INEGI, 'cdist', False, False, 1)
+    assert 'sonora-hermosillo' in load_cached_matches(cache_path, version, CLAVES_LISTADO, 85)
+    assert load_cached_matches(cache_path, catalog_version(CLAVES_INEGI[:-1], 'cdist', False, False, 1),
+                               CLAVES_LISTADO, 85) == {}
+
+
+def test_match_keys_cache_tfidf_depende_de_top_k(setup_logger, tmp_path, monkeypatch):
+    from src.fuzzy_matching import match_keys
+    from src.match_cache import catalog_version, load_cached_matches
+    setup_logger.info("Ejecutando test de la versión de la caché de coincidencias con TF-IDF.")
+    cache_path = str(tmp_path / 'match_cache.sqlite')
+
+    monkeypatch.setattr('src.fuzzy_matching.TOP_K', 1)
+    match_keys(CLAVES_LISTADO, CLAVES_INEGI, score_cutoff=85, method='tfidf', cache_path=cache_path)
+
+    # Las coincidencias calculadas con otro top_k no se reutilizan
+    version = catalog_version(CLAVES_INEGI, 'tfidf', False, False, 1, 1)
+    assert 'sonora-hermosillo' in load_cached_matches(cache_path, version, CLAVES_LISTADO, 85)
+    assert load_cached_matches(cache_path, catalog_version(CLAVES_INEGI, 'tfidf', False, False, 1, 10),
+                               CLAVES_LISTADO, 85) == {}
+
+
+@pytest.mark.parametrize('threshold', [60, 85, 96])
+def test_extract_best_matches_bktree_igual_que_ratio(setup_logger, threshold):
+    from rapidfuzz import fuzz
+    from src.fuzzy_matching import extract_best_matches, extract_best_matches_bktree
+    setup_logger.info("Ejecutando test del índice BK-tree con umbral %s.", threshold)
+
+    expected = extract_best_matches(CLAVES_LISTADO, CLAVES_INEGI, score_cutoff=threshold, scorer=fuzz.ratio)
+    best_matches, scores = extract_best_matches_bktree(CLAVES_LISTADO, CLAVES_INEGI, score_cutoff=threshold)
+
+    assert list(best_matches) == list(expected[0])
+    assert list(scores[~np.isnan(scores)]) == list(expected[1][~np.isnan(expected[1])])
+
+
+@pytest.mark.parametrize('threshold', [60, 85, 91, 96, 100])
+def test_poda_de_candidatos_no_cambia_el_resultado(setup_logger, threshold):
+    from src.fuzzy_matching import extract_best_matches
+    setup_logger.info("Ejecutando test de la poda por longitud e histograma con umbral %s.", threshold)
+    claves_inegi = CLAVES_INEGI + ['guerrero-azoyu de la montaña de guerrero', 'g-a', 'guerrero-ayozu']
+
+    stats = {}
+    pruned = extract_best_matches(CLAVES_LISTADO, claves_inegi, score_cutoff=threshold, stats=stats)
+    full = extract_best_matches(CLAVES_LISTADO, claves_inegi, score_cutoff=threshold, prune=False)
+
+    assert list(pruned[0]) == list(full[0])
+    assert np.array_equal(pruned[1], full[1], equal_nan=True)
+    assert stats['pairs'] == len(CLAVES_LISTADO) * len(claves_inegi)
+    if threshold > 95:
+        assert stats['pruned'] > 0
+
+
+def test_extract_best_matches_tfidf(setup_logger):
+    from src.fuzzy_matching import extract_best_matches, match_keys
+    from src.tfidf_matching import extract_best_matches_tfidf
+    setup_logger.info("Ejecutando test del motor TF-IDF de n-gramas de caracteres.")
+
+    # Con top_k igual al tamaño del catálogo se puntúan todos los candidatos y el resultado es el de cdist
+    expected = extract_best_matches(CLAVES_LISTADO, CLAVES_INEGI, score_cutoff=85)
+    best_matches, scores = extract_best_matches_tfidf(CLAVES_LISTADO, CLAVES_INEGI, score_cutoff=85,
+                                                      top_k=len(CLAVES_INEGI))
+    assert list(best_matches) == list(expected[0])
+    assert np.array_equal(scores, expected[1], equal_nan=True)
+
+    best_matches, _ = match_keys(CLAVES_LISTADO, CLAVES_INEGI, score_cutoff=85, method='tfidf')
+    assert list(best_matches) == list(expected[0])
+
+
+def test_match_keys_top_k(setup_logger, tmp_path):
+    from rapidfuzz import fuzz, utils
+    from src.fuzzy_matching import match_keys
+    setup_logger.info("Ejecutando test de las candidatas alternativas para la validación manual.")
+    cache_path = str(tmp_path / 'match_cache.sqlite')
+    queries = CLAVES_LISTADO[1:]
+
+    for _ in range(2):
+        # La segunda vuelta sale de la caché en disco y debe devolver las mismas candidatas
+        best_matches, scores = match_keys(queries, CLAVES_INEGI, score_cutoff=60, limit=3, cache_path=cache_path)
+        assert best_matches.shape == (len(queries), 3)
+        for query, matches, values in zip(queries, best_matches, scores):
+            expected = [(choice, round(fuzz.WRatio(utils.default_process(query), utils.default_process(choice))))
+                        for choice in CLAVES_INEGI]
+            expected = [(match, score) for match, score in sorted(expected, key=lambda item: -item[1])[:3]
+                        if score >= 60]
+            assert [(match, value) for match, value in zip(matches, values) if match is not None] == expected
+
+
+def test_assign_match_columns(setup_logger):
+    import pandas as pd
+    from src.fuzzy_matching import assign_match_columns, candidate_columns, match_keys
+    setup_logger.info("Ejecutando test de las columnas de candidatas del diccionario.")
+    df = pd.DataFrame({'KEY_benef_mun': CLAVES_LISTADO})
+
+    assign_match_columns(df, *match_keys(df['KEY_benef_mun'], CLAVES_INEGI, score_cutoff=85, limit=3))
+
+    assert list(df.columns) == ['KEY_benef_mun', 'best_match', 'match_score'] + candidate_columns(3)
+    assert candidate_columns(3) == ['match_2', 'match_score_2', 'match_3', 'match_score_3']
+    assert df.loc[0, 'match_score'] == 100
+    assert df['match_2'].isna().all() or df.loc[df['match_2'].notna(), 'match_score_2'].le(100).all()
+
+
+@pytest.mark.parametrize('nombre_listado, nombre_inegi', [
+    ('veracruz-jalapa', 'veracruz-xalapa'),
+    ('guerero-coyuca de benites', 'guerrero-coyuca de benitez'),
+    ('hidalgo-biya de tezontepec', 'hidalgo-villa de tezontepec'),
+    ('oaxaca-santa maria watulco', 'oaxaca-santa maria huatulco'),
+])
+def test_phonetic_key_variantes_ortograficas(setup_logger, nombre_listado, nombre_inegi):
+    from src.phonetic import phonetic_key
+    setup_logger.info("Ejecutando test de la clave fonética: %s", nombre_listado)
+
+    assert phonetic_key(nombre_listado) == phonetic_key(nombre_inegi)
+
+
+def test_match_keys_clave_fonetica(setup_logger):
+    from src.fuzzy_matching import match_keys
+    from src.phonetic import build_phonetic_index, phonetic_key
+    setup_logger.info("Ejecutando test del nivel de coincidencia por clave fonética.")
+    claves_inegi = CLAVES_INEGI + ['veracruz-xalapa', 'jalisco-sayula', 'jalisco-zayula']
+
+    # 'jalapa' no llega al umbral por puntuación, pero suena igual que 'xalapa'
+    best_matches, scores = match_keys(['veracruz-jalapa', 'jalisco-sayulla'], claves_inegi, score_cutoff=96,
+                                      phonetic=True, phonetic_cutoff=90)
+    assert best_matches[0] == 'veracruz-xalapa'
+    assert 90 <= scores[0] < 96
+    # Sin un umbral fonético propio, la coincidencia fonética también tiene que llegar a score_cutoff
+    assert match_keys(['veracruz-jalapa'], claves_inegi, score_cutoff=96, phonetic=True)[0][0] is None
+    assert match_keys(['veracruz-jalapa'], claves_inegi, score_cutoff=90, phonetic=True)[0][0] == 'veracruz-xalapa'
+    # Las claves fonéticas compartidas por varios candidatos son ambiguas y se dejan al motor difuso
+    assert phonetic_key('jalisco-sayula') not in build_phonetic_index(claves_inegi)
+    assert match_keys(['veracruz-jalapa'], claves_inegi, score_cutoff=96)[0][0] is None
+
+
+def test_match_keys_clave_fonetica_no_sustituye_a_la_difusa(setup_logger):
+    from src.fuzzy_matching import match_keys
+    setup_logger.info("Ejecutando test del orden de los niveles de coincidencia fonética y difusa.")
+
+    # 'jalapan' puntúa más que 'xalapa', que es la única con la misma clave fonética
+    best_matches, scores = match_keys(['veracruz-jalapa'], CLAVES_INEGI + ['veracruz-xalapa', 'veracruz-jalapan'],
+                                      score_cutoff=90, phonetic=True)
+    assert best_matches[0] == 'veracruz-jalapan'
+    assert scores[0] == 97
+
+    # Las coincidencias fonéticas también tienen candidatas alternativas
+    best_matches, scores = match_keys(['veracruz-jalapa'],
+                                      CLAVES_INEGI + ['veracruz-xalapa', 'veracruz-jalapa de diaz'],
+                                      score_cutoff=96, phonetic=True, phonetic_cutoff=90, limit=3)
+    assert list(best_matches[0]) == ['veracruz-xalapa', 'veracruz-jalapa de diaz', None]
+    assert list(scores[0, :2]) == [93, 90]
+
+
+def test_fuzzy_merge_localidades_por_entidad_en_paralelo(setup_logger, tmp_path, monkeypatch):
+    import pandas as pd
+    from src.data_cleaning_and_merge_e3 import fuzzy_merge_localidades_por_entidad
+    setup_logger.info("Ejecutando test del cruce de localidades por entidad en un pool de procesos.")
+    # La caché de coincidencias se crea en tmp_path
+    monkeypatch.chdir(tmp_path)
+    listados = {
+        'Localidades_21_GUERRERO': pd.DataFrame({
+            'ENTIDAD': ['GUERRERO'] * 3,
+            'KEY_benef_loc': ['azoyu-azoyu', 'azoyu-amatiyo', 'tecoanapa-xalpatlahuac']}),
+        'Localidades_21_PUEBLA': pd.DataFrame({
+            'ENTIDAD': ['PUEBLA'] * 2,
+            'KEY_benef_loc': ['atlixco-atlixco', 'tehuacan-sn pablo tepetzingo']}),
+    }
+    uniquelocs = {
+        'INEGI_UNIQUELOC_2021_guerrero': pd.DataFrame({
+            'KEY_inegi_localidad': ['azoyu-azoyu', 'azoyu-amatillo', 'tecoanapa-tecoanapa'],
+            'CVE_LOC': ['0001', '0005', '0001']}),
+        'INEGI_UNIQUELOC_2021_puebla': pd.DataFrame({
+            'KEY_inegi_localidad': ['atlixco-atlixco', 'tehuacan-san pablo tepetzingo'],
+            'CVE_LOC': ['0001', '0025']}),
+    }
+    jobs = [('Localidades_21_PUEBLA', 'INEGI_UNIQUELOC_2021_puebla'),
+            ('Localidades_21_GUERRERO', 'INEGI_UNIQUELOC_2021_guerrero')]
+
+    # Cada ejecución con sus propias copias: fuzzy_merge_benef2019_2022 añade columnas al listado
+    sequential = fuzzy_merge_localidades_por_entidad(jobs, {name: df.copy() for name, df in listados.items()},
+                                                     uniquelocs, max_workers=1)
+    parallel = fuzzy_merge_localidades_por_entidad(jobs, {name: df.copy() for name, df in listados.items()},
+                                                   uniquelocs, max_workers=2)
+
+    pd.testing.assert_frame_equal(pd.concat(parallel), pd.concat(sequential))
+    assert list(pd.concat(parallel)['ENTIDAD']) == ['PUEBLA'] * 2 + ['GUERRERO'] * 3
+    assert list(pd.concat(parallel)['CVE_LOC'].iloc[:3]) == ['0001', '0025', '0001']
@@ -0,0 +1,91 @@
+import os
+import logging
+import sys
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+# Extracto con las columnas del fichero de localidades de INEGI
+DATASET_INEGI = pd.DataFrame({
+    'MAPA': [1, 2, 3, 4],
+    'Estatus': ['Activa'] * 4,
+    'CVE_ENT': ['12', '12', '12', '30'],
+    'NOM_ENT': ['Guerrero', 'Guerrero', 'Guerrero', 'Veracruz de Ignacio de la Llave'],
+    'NOM_ABR': ['Gro.', 'Gro.', 'Gro.', 'Ver.'],
+    'CVE_MUN': ['1', '1', '13', '87'],
+    'NOM_MUN': ['Acapulco de Juárez', 'Acapulco de Juárez', 'Azoyú', 'Xalapa'],
+    'CVE_LOC': ['1', '5', '1', '1'],
+    'NOM_LOC': ['Acapulco de Juárez', 'Amatillo', 'Azoyú', 'Xalapa-Enríquez'],
+    'POB_TOTAL': [779566, 722, 4710, 443063],
+})
+
+
+@pytest.fixture(autouse=True)
+def setup_logger():
+    import config
+    logger = logging.getLogger("Fertilizantes")
+    logger.setLevel(logging.INFO)
+    yield logger
+
+
+def test_catalogos_inegi(setup_logger, tmp_path):
+    from src.inegi_catalog import load_inegi_catalog
+    setup_logger.info("Ejecutando test de los catálogos de INEGI por entidad, municipio y localidad.")
+    source_path = str(tmp_path / 'dataset_inegi.csv')
+    DATASET_INEGI.to_csv(source_path, index=False, encoding='cp1252')
+
+    kwargs = {'source_path': source_path, 'encoding': 'cp1252', 'catalog_dir': str(tmp_path / 'catalogos')}
+    entidades = load_inegi_catalog('2024', 'entidades', **kwargs)
+    municipios = load_inegi_catalog('2024', 'municipios', **kwargs)
+    localidades = load_inegi_catalog('2024', 'localidades', **kwargs)
+
+    assert list(entidades['CVE_ENT']) == ['12', '30']
+    assert list(municipios['KEY_inegi']) == ['guerrero-acapulco de juarez', 'guerrero-azoyu',
+                                             'veracruz de ignacio de la llave-xalapa']
+    assert list(municipios['CVE_MUN_Unique']) == ['12-001', '12-013', '30-087']
+    assert list(localidades['CVE_LOC']) == ['0001', '0005', '0001', '0001']
+    assert localidades.loc[1, 'KEY_inegi_localidad'] == 'acapulco de juarez-amatillo'
+
+
+def test_catalogos_inegi_solo_se_regeneran_si_cambia_el_fichero(setup_logger, tmp_path):
+    from src.inegi_catalog import update_inegi_catalog
+    setup_logger.info("Ejecutando test de la regeneración de los catálogos de INEGI por hash del fichero.")
+    source_path = str(tmp_path / 'dataset_inegi_2019.csv')
+    DATASET_INEGI.to_csv(source_path, index=False)
+    kwargs = {'source_path': source_path, 'catalog_dir': str(tmp_path / 'catalogos')}
+
+    first = update_inegi_catalog('2019', **kwargs)
+    assert first['rebuilt']
+    assert not update_inegi_catalog('2019', **kwargs)['rebuilt']
+
+    # Se vuelve a descargar el mismo contenido: cambia la fecha de modificación pero no el hash
+    os.utime(source_path, (0, 0))
+    assert not update_inegi_catalog('2019', **kwargs)['rebuilt']
+
+    DATASET_INEGI.iloc[:3].to_csv(source_path, index=False)
+    second = update_inegi_catalog('2019', **kwargs)
+    assert second['rebuilt']
+    assert second['sha256'] != first['sha256']
+    assert second['rows']['municipios'] == 2
+
+
+def test_clean_inegi_se_regenera_si_cambia_el_hash_del_fichero(setup_logger, tmp_path, monkeypatch):
+    from src.data_cleaning_inegi import clean_inegi
+    from src.inegi_catalog import update_inegi_catalog
+    from src.storage import read_table
+    setup_logger.info("Ejecutando test de la regeneración del dataset_inegi_clean por hash del fichero.")
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('data/inegi')
+    DATASET_INEGI.to_csv('data/inegi/dataset_inegi_2019.csv', index=False)
+
+    clean_inegi(cuts=('2019',))
+    assert len(read_table('data/inegi/dataset_inegi_clean_2019.csv')) == 4
+
+    # Los catálogos se regeneran fuera de clean_inegi, que ya no ve manifest['rebuilt']
+    DATASET_INEGI.iloc[:3].to_csv('data/inegi/dataset_inegi_2019.csv', index=False)
+    assert update_inegi_catalog('2019')['rebuilt']
+    assert not update_inegi_catalog('2019')['rebuilt']
+
+    clean_inegi(cuts=('2019',))
+    assert len(read_table('data/inegi/dataset_inegi_clean_2019.csv')) == 3
@@ -0,0 +1,66 @@
+import os
+import logging
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+# Extracto con las columnas del fichero de localidades de INEGI
+DATASET_INEGI = pd.DataFrame({
+    'CVE_ENT': ['12', '12', '12', '30'],
+    'NOM_ENT': ['Guerrero', 'Guerrero', 'Guerrero', 'Veracruz de Ignacio de la Llave'],
+    'CVE_MUN': ['1', '1', '13', '87'],
+    'NOM_MUN': ['Acapulco de Juárez', 'Acapulco de Juárez', 'Azoyú', 'Xalapa'],
+    'CVE_LOC': ['1', '5', '1', '1'],
+    'NOM_LOC': ['Acapulco de Juárez', 'Amatillo', 'Azoyú', 'Xalapa-Enríquez'],
+    'POB_TOTAL': [779566, 722, 4710, 443063],
+})
+
+
+@pytest.fixture(autouse=True)
+def setup_logger():
+    import config
+    logger = logging.getLogger("Fertilizantes")
+    logger.setLevel(logging.INFO)
+    yield logger
+
+
+def test_indice_de_claves_inegi(setup_logger, tmp_path):
+    from src.inegi_catalog import load_inegi_index
+    from src.inegi_index import lookup_index
+    setup_logger.info("Ejecutando test de la búsqueda vectorizada en el índice de claves de INEGI.")
+    source_path = str(tmp_path / 'dataset_inegi_2019.csv')
+    DATASET_INEGI.to_csv(source_path, index=False)
+
+    index = load_inegi_index('2019', 'localidades', source_path=source_path, catalog_dir=str(tmp_path / 'catalogos'))
+    assert isinstance(index, np.memmap)
+
+    result = lookup_index(index, ['azoyu-azoyu', 'acapulco de juarez-amatillo', 'azoyu-inexistente', np.nan])
+    assert list(result['row']) == [2, 1, -1, -1]
+    assert list(result['CVE_MUN'].iloc[:2]) == ['013', '001']
+    assert list(result['CVE_LOC'].iloc[:2]) == ['0001', '0005']
+    assert result['CVE_ENT'].iloc[2:].isna().all()
+
+
+def test_merge_inegi_equivale_al_merge(setup_logger, tmp_path):
+    from src.inegi_catalog import load_inegi_catalog, load_inegi_index
+    from src.inegi_index import merge_inegi
+    setup_logger.info("Ejecutando test del cruce con dataset_inegi_clean a través del índice de claves.")
+    source_path = str(tmp_path / 'dataset_inegi_2019.csv')
+    DATASET_INEGI.to_csv(source_path, index=False)
+    kwargs = {'source_path': source_path, 'catalog_dir': str(tmp_path / 'catalogos')}
+
+    inegi = load_inegi_catalog('2019', 'localidades', **kwargs)
+    INEGI_UNIQUEMUN = inegi.drop(columns=['CVE_LOC', 'NOM_LOC', 'KEY_inegi_localidad', 'POB_TOTAL'])
+    INEGI_UNIQUEMUN = INEGI_UNIQUEMUN.drop_duplicates(subset='KEY_inegi', keep='first')
+    listado = pd.DataFrame({
+        'BENEFICIARIO': ['A', 'B', 'C', 'D'],
+        'KEY_inegi': ['guerrero-azoyu', None, 'guerrero-acapulco de juarez', 'guerrero-chilpancingo'],
+        'CVE_ENT': ['12', None, '12', '12'],
+    })
+
+    expected = pd.merge(listado, INEGI_UNIQUEMUN, on='KEY_inegi', how='left', suffixes=('_benef', '_inegi'))
+    result = merge_inegi(listado, 'KEY_inegi', INEGI_UNIQUEMUN, load_inegi_index('2019', 'municipios', **kwargs))
+    pd.testing.assert_frame_equal(result, expected)
@@ -0,0 +1,65 @@
+import os
+import logging
+import sys
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+# Extracto de un dataset_inegi_clean con localidades repetidas dentro de un municipio y filas duplicadas
+DATASET_INEGI_CLEAN = pd.DataFrame({
+    'CVE_ENT': ['12', '12', '12', '12', '12', '21', '21', '21', '17'],
+    'Entidad_inegi': ['Guerrero'] * 5 + ['Puebla'] * 3 + ['Morelos'],
+    'CVE_MUN': ['013', '013', '013', '001', '001', '019', '019', '019', '007'],
+    'Municipio_inegi': ['Azoyú', 'Azoyú', 'Azoyú', 'Acapulco de Juárez', 'Acapulco de Juárez', 'Atlixco', 'Atlixco',
+                        'Atlixco', 'Cuernavaca'],
+    'CVE_LOC': ['0001', '0020', '0001', '0005', '0001', '0001', '0031', '0032', '0001'],
+    'Localidad_inegi': ['Azoyú', 'El Carrizo', 'Azoyú', 'Amatillo', 'Acapulco de Juárez', 'Atlixco', 'La Soledad',
+                        'La Soledad', 'Cuernavaca'],
+    'Entidad_c_inegi': ['guerrero'] * 5 + ['puebla'] * 3 + ['morelos'],
+    'Municipio_c_inegi': ['azoyu', 'azoyu', 'azoyu', 'acapulco de juarez', 'acapulco de juarez', 'atlixco',
+                          'atlixco', 'atlixco', 'cuernavaca'],
+    'Localidad_c_inegi': ['azoyu', 'el carrizo', 'azoyu', 'amatillo', 'acapulco de juarez', 'atlixco', 'la soledad',
+                          'la soledad', 'cuernavaca'],
+    'POB_TOTAL': [4710, 320, 4710, 722, 779566, 86690, 150, 1020, 378476],
+})
+
+
+@pytest.fixture(autouse=True)
+def setup_logger():
+    import config
+    logger = logging.getLogger("Fertilizantes")
+    logger.setLevel(logging.INFO)
+    yield logger
+
+
+def uniqueloc_por_estado(dataset_inegi, estado):
+    # Procesado original de un estado, leyendo el dataset completo para cada uno
+    dataset_inegi = dataset_inegi.copy()
+    dataset_inegi['KEY_inegi_municipio'] = dataset_inegi['Entidad_c_inegi'] + '-' + dataset_inegi['Municipio_c_inegi']
+    dataset_inegi['KEY_inegi_localidad'] = dataset_inegi['Municipio_c_inegi'] + '-' + dataset_inegi['Localidad_c_inegi']
+    datos_estado = dataset_inegi[dataset_inegi['Entidad_inegi'] == estado].drop_duplicates()
+    datos_estado = datos_estado.loc[datos_estado.groupby(['Municipio_inegi', 'Localidad_inegi'])['POB_TOTAL'].idxmax()]
+    datos_estado = datos_estado.drop(columns=['KEY_inegi_municipio'])
+    return datos_estado.drop_duplicates(subset=['Municipio_inegi', 'Localidad_inegi']).reset_index(drop=True)
+
+
+def test_uniqueloc_una_lectura_por_año(setup_logger, tmp_path):
+    from src.inegi_uniqueloc import procesar_datos_inegi
+    from src.storage import read_table, write_table
+    setup_logger.info("Ejecutando test de la generación de los INEGI_UNIQUELOC de varios estados a la vez.")
+    path_dataset_inegi = write_table(DATASET_INEGI_CLEAN, str(tmp_path / 'dataset_inegi_clean_2020.csv'),
+                                     fmt='parquet')
+    estados = ['Guerrero', 'Tlaxcala', 'Puebla']
+    output_paths = {estado: str(tmp_path / f'INEGI_UNIQUELOC_2020_{estado.lower()}.csv') for estado in estados}
+
+    procesar_datos_inegi(path_dataset_inegi, output_paths)
+
+    assert sorted(os.listdir(tmp_path)) == ['INEGI_UNIQUELOC_2020_guerrero.parquet',
+                                            'INEGI_UNIQUELOC_2020_puebla.parquet',
+                                            'INEGI_UNIQUELOC_2020_tlaxcala.parquet',
+                                            'dataset_inegi_clean_2020.parquet']
+    for estado, output_path in output_paths.items():
+        pd.testing.assert_frame_equal(read_table(output_path), uniqueloc_por_estado(DATASET_INEGI_CLEAN, estado))
+    assert list(read_table(output_paths['Puebla'])['POB_TOTAL']) == [86690, 1020]
+    assert read_table(output_paths['Tlaxcala']).empty
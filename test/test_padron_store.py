@@ -0,0 +1,73 @@
+import os
+import logging
+import sys
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+# Extractos de los listados finales de 2023 (data_cleaning2) y de 2019-2022 (data_cleaning3)
+LISTADO_2023 = pd.DataFrame({
+    'id': [0, 1],
+    'cve_ent': ['12', '21'],
+    'entidad': ['Guerrero', 'Puebla'],
+    'cve_mun': ['013', '019'],
+    'municipio': ['Azoyú', 'Atlixco'],
+    'acuse': ['00123', '04567'],
+    'apellido_paterno': ['PÉREZ', None],
+    'apellido_materno': ['LÓPEZ', 'SÁNCHEZ'],
+    'nombre_propio': ['JUAN', 'MARÍA'],
+    'paquete': [1, 2],
+    'key_benef_verificado': ['guerrero-azoyu', 'puebla-atlixco'],
+})
+
+LISTADO_2019 = pd.DataFrame({
+    'Nombre del beneficiario': ['PEDRO SANCHEZ DIAZ', 'ANA TORRES GIL'],
+    'Zona del país': ['SUR', 'SUR'],
+    'Clave de entidad': [12, 12],
+    'Entidad federativa': ['Guerrero', 'Guerrero'],
+    'Clave de municipio': [13, 1],
+    'Municipio': ['Azoyú', 'Acapulco de Juárez'],
+    'Clave de localidad': [1, 5],
+    'Localidad': ['Azoyú', 'Amatillo'],
+    'Producto cultivado': ['MAIZ', 'FRIJOL'],
+    'Fecha de entrega del beneficio': ['2019-05-01', '2019-06-15'],
+    'Monto entregado': [4500.5, 3000.0],
+    'Ciclo agrícola': ['PV 2019', 'PV 2019'],
+})
+
+
+@pytest.fixture(autouse=True)
+def setup_logger():
+    import config
+    logger = logging.getLogger("Fertilizantes")
+    logger.setLevel(logging.INFO)
+    yield logger
+
+
+def test_padron_consulta_por_municipio_y_acuse(setup_logger, tmp_path):
+    from src.padron_store import load_padron, query_padron, summary_padron
+    setup_logger.info("Ejecutando test de la base de datos del padrón.")
+    path = str(tmp_path / 'padron.sqlite')
+
+    load_padron(LISTADO_2019, 'beneficiarios', 2019, path=path)
+    load_padron(LISTADO_2023, 'beneficiarios', 2023, path=path)
+    # Volver a cargar un listado sustituye sus filas
+    load_padron(LISTADO_2023, 'beneficiarios', 2023, path=path)
+
+    azoyu = query_padron(path=path, cve_ent=12, cve_mun=13, years=range(2019, 2024))
+    assert list(azoyu['year']) == [2019, 2023]
+    assert list(azoyu['beneficiario']) == ['PEDRO SANCHEZ DIAZ', 'JUAN PÉREZ LÓPEZ']
+    assert azoyu.loc[0, 'cve_loc'] == '0001'
+    assert azoyu.loc[1, 'acuse'] == '00123'
+
+    maria = query_padron(path=path, acuse='04567', columns=['beneficiario', 'cve_mun'])
+    assert maria.to_dict('records') == [{'beneficiario': 'MARÍA SÁNCHEZ', 'cve_mun': '019'}]
+
+    summary = summary_padron(path=path, cve_ent='12')
+    assert list(summary['year']) == [2019, 2023]
+    assert list(summary['registros']) == [2, 1]
+    assert summary.loc[0, 'monto'] == 7500.5
+
+    with pytest.raises(ValueError):
+        query_padron(path=path, columns=['curp'])
@@ -0,0 +1,84 @@
+import os
+import logging
+import sys
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+# Listado con el formato de los publicados: una fila de título, una columna de índice y columnas vacías al final
+LISTADO_PRODUCTORES = ('Listado de productores autorizados\n'
+                       ',ESTADO,MUNICIPIO,ACUSE,APELLIDO PATERNO,APELLIDO MATERNO,NOMBRE (S),PAQUETE,Unnamed: 8\n'
+                       '0,GUERRERO,ÁLVARO OBREGÓN,00123,PÉREZ,LÓPEZ,JUAN,1,\n'
+                       '1,PUEBLA,ATLIXCO,04567,,SÁNCHEZ,MARÍA,2,\n')
+
+
+@pytest.fixture(autouse=True)
+def setup_logger():
+    import config
+    logger = logging.getLogger("Fertilizantes")
+    logger.setLevel(logging.INFO)
+    yield logger
+
+
+@pytest.mark.parametrize('encoding', ['cp1252', 'utf-8'])
+def test_read_source_listado_productores(setup_logger, tmp_path, encoding):
+    from src.schemas import ESQUEMAS, read_source
+    setup_logger.info("Ejecutando test de la lectura tipada del listado de productores en %s.", encoding)
+    path = tmp_path / 'listado_productores.csv'
+    path.write_text(LISTADO_PRODUCTORES, encoding=encoding)
+
+    listado = read_source(str(path), 'productores_autorizados')
+
+    assert list(listado.columns) == list(ESQUEMAS['productores_autorizados']['columns'])
+    assert list(listado['ACUSE']) == ['00123', '04567']
+    assert listado.loc[0, 'MUNICIPIO'] == 'ÁLVARO OBREGÓN'
+    assert pd.isna(listado.loc[1, 'APELLIDO PATERNO'])
+
+
+def test_read_source_inegi(setup_logger, tmp_path):
+    from src.schemas import COLUMNAS_INEGI, read_source
+    setup_logger.info("Ejecutando test de la lectura tipada de un corte de INEGI.")
+    path = tmp_path / 'dataset_inegi.csv'
+    pd.DataFrame({
+        'MAPA': [1201001], 'Estatus': ['Activa'], 'CVE_ENT': ['12'], 'NOM_ENT': ['Guerrero'], 'NOM_ABR': ['Gro.'],
+        'CVE_MUN': ['013'], 'NOM_MUN': ['Azoyú'], 'CVE_LOC': ['0001'], 'NOM_LOC': ['Azoyú'], 'ALTITUD': [60],
+        'POB_TOTAL': [4710],
+    }).to_csv(path, index=False, encoding='cp1252')
+
+    dataset_inegi = read_source(str(path), 'inegi_2024')
+
+    assert list(dataset_inegi.columns) == list(COLUMNAS_INEGI)
+    assert dataset_inegi.loc[0, ['CVE_ENT', 'CVE_MUN', 'CVE_LOC']].tolist() == ['12', '013', '0001']
+    assert dataset_inegi.loc[0, 'NOM_MUN'] == 'Azoyú'
+
+
+@pytest.mark.parametrize('schema', [None, 'productores_autorizados'])
+def test_load_datasets_en_paralelo(setup_logger, tmp_path, schema):
+    from src.data_cleaning_and_merge import load_datasets
+    setup_logger.info("Ejecutando test de la lectura en paralelo de los listados mensuales.")
+    # En utf-8 'Á' es C3 81 y 0x81 no existe en cp1252: el fichero de febrero solo se puede leer en utf-8, pero
+    # el byte inválido está al final, después de varias filas que sí se leerían en cp1252
+    feb = LISTADO_PRODUCTORES + ''.join(f'{i},PUEBLA,ATLIXCO,0{i},,SÁNCHEZ,MARÍA,2,\n' for i in range(2, 500))
+    feb += '500,GUERRERO,ÁLVARO OBREGÓN,00500,PÉREZ,LÓPEZ,ÁNGEL,1,\n'
+    (tmp_path / 'productores_2024_02.csv').write_text(feb, encoding='utf-8')
+    (tmp_path / 'productores_2024_01.csv').write_text(LISTADO_PRODUCTORES, encoding='cp1252')
+
+    listado = load_datasets(str(tmp_path), schema=schema)
+
+    pd.testing.assert_frame_equal(listado, load_datasets(str(tmp_path), schema=schema, max_workers=1))
+    assert len(listado) == 2 + 501
+    assert list(listado['ACUSE'].iloc[:3].astype(str).str.zfill(5)) == ['00123', '04567', '00123']
+    assert listado['NOMBRE (S)'].iloc[-1] == 'ÁNGEL'
+    assert listado['MUNICIPIO'].iloc[2] == 'ÁLVARO OBREGÓN'
+
+
+def test_count_source_columns_sin_proyectar(setup_logger, tmp_path):
+    from src.data_cleaning_and_merge import count_source_columns, load_datasets
+    setup_logger.info("Ejecutando test del número de columnas de los listados publicados.")
+    (tmp_path / 'productores_2024_01.csv').write_text(LISTADO_PRODUCTORES, encoding='cp1252')
+    (tmp_path / 'productores_2024_02.csv').write_text(LISTADO_PRODUCTORES, encoding='utf-8')
+
+    # Mismo número que con la lectura sin esquema, aunque el esquema solo lea 7 columnas
+    assert count_source_columns(str(tmp_path)) == load_datasets(str(tmp_path)).shape[1] == 8
+    assert load_datasets(str(tmp_path), schema='productores_autorizados').shape[1] == 7
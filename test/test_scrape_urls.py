@@ -0,0 +1,99 @@
+import os
+import logging
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+# Página de un dataset de datos.gob.mx con sus recursos
+PAGINA_DATASET = '''<html><body>
+<a href="/busca/organization/agricultura">Agricultura</a>
+<a href="https://repodatos.atdt.gob.mx/fertilizantes/{year}/guerrero_{year}.xlsx" title="Guerrero {year}">XLSX</a>
+<a href="https://repodatos.atdt.gob.mx/fertilizantes/{year}/puebla_{year}.csv">CSV</a>
+<a href="https://repodatos.atdt.gob.mx/fertilizantes/{year}/puebla_{year}.xlsx">XLSX</a>
+<a href="https://repodatos.atdt.gob.mx/fertilizantes/{year}/guerrero_{year}.xlsx">XLSX</a>
+<a href="https://repodatos.atdt.gob.mx/fertilizantes/{year}/diccionario.zip">ZIP</a>
+</body></html>'''
+
+
+class DatosGobHandler(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_GET(self):
+        self.requests.append(self.path)
+        year = self.path.rsplit('-', 1)[-1]
+        content = PAGINA_DATASET.format(year=year).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def setup_logger():
+    import config
+    logger = logging.getLogger("Fertilizantes")
+    logger.setLevel(logging.INFO)
+    yield logger
+
+
+@pytest.fixture
+def datos_gob():
+    # Servidor HTTP local que hace de datos.gob.mx
+    from src.scrape_urls import clear_resource_cache
+    clear_resource_cache()
+    DatosGobHandler.requests = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), DatosGobHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}/busca/dataset/programa-fertilizantes'
+    server.shutdown()
+    server.server_close()
+    clear_resource_cache()
+
+
+def test_discover_resources_una_peticion_por_pagina(setup_logger, datos_gob):
+    from src.scrape_urls import discover_resources, resource_urls, scrape_urls, scrape_xlsx
+    setup_logger.info("Ejecutando test del descubrimiento de recursos de las páginas de datos.gob.mx.")
+    pages = [f'{datos_gob}-{year}' for year in ['2019', '2020', '2021', '2022']]
+
+    resources = discover_resources(pages)
+    assert [resource['format'] for resource in resources[pages[0]]] == ['xlsx', 'csv', 'xlsx', 'zip']
+    assert resources[pages[0]][0]['title'] == 'Guerrero 2019'
+    assert resources[pages[0]][0]['filename'] == 'guerrero_2019.xlsx'
+
+    xlsx = resource_urls(pages, 'xlsx')
+    assert len(xlsx) == 8
+    assert xlsx[:2] == ['https://repodatos.atdt.gob.mx/fertilizantes/2019/guerrero_2019.xlsx',
+                        'https://repodatos.atdt.gob.mx/fertilizantes/2019/puebla_2019.xlsx']
+    assert scrape_urls(pages[1]) == ['https://repodatos.atdt.gob.mx/fertilizantes/2020/puebla_2020.csv']
+    assert len(scrape_xlsx(pages[2])) == 2
+
+    # Cada página se ha pedido una sola vez; el resto ha salido de la caché
+    assert sorted(DatosGobHandler.requests) == sorted(urlparse(page).path for page in pages)
+
+    discover_resources(pages[:1], ttl=0)
+    assert len(DatosGobHandler.requests) == 5
+
+
+def test_discover_resources_con_una_pagina_que_falla(setup_logger, datos_gob):
+    from src import scrape_urls
+    setup_logger.info("Ejecutando test del descubrimiento de recursos con una página que no responde.")
+    # Nadie escucha en el puerto 1: la petición falla con un error de conexión
+    pages = [f'{datos_gob}-2019', 'http://127.0.0.1:1/busca/dataset/programa-fertilizantes-2020',
+             f'{datos_gob}-2021']
+
+    resources = scrape_urls.discover_resources(pages)
+
+    assert resources[pages[1]] == []
+    assert len(resources[pages[0]]) == len(resources[pages[2]]) == 4
+    # La página que ha fallado no se guarda en la caché y se vuelve a pedir la próxima vez
+    assert pages[1] not in scrape_urls._cache
+    assert pages[0] in scrape_urls._cache
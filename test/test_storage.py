@@ -0,0 +1,49 @@
+import os
+import logging
+import sys
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+INEGI_UNIQUELOC = pd.DataFrame({
+    'CVE_ENT': ['12', '12', '30'],
+    'Entidad_inegi': ['Guerrero', 'Guerrero', 'Veracruz de Ignacio de la Llave'],
+    'CVE_MUN': ['001', '013', '087'],
+    'CVE_LOC': ['0001', '0001', '0001'],
+    'Localidad_c_inegi': ['acapulco de juarez', 'azoyu', 'xalapa-enriquez'],
+    'POB_TOTAL': [779566, 4710, 443063],
+})
+
+
+@pytest.fixture(autouse=True)
+def setup_logger():
+    import config
+    logger = logging.getLogger("Fertilizantes")
+    logger.setLevel(logging.INFO)
+    yield logger
+
+
+@pytest.mark.parametrize('fmt', ['parquet', 'arrow', 'csv'])
+def test_write_read_table_conserva_los_tipos(setup_logger, tmp_path, fmt):
+    from src.storage import read_table, write_table
+    setup_logger.info("Ejecutando test del almacenamiento de tablas en formato %s.", fmt)
+
+    path = write_table(INEGI_UNIQUELOC, str(tmp_path / 'INEGI_UNIQUELOC_2019_guerrero.csv'), fmt=fmt)
+
+    assert path.endswith({'parquet': '.parquet', 'arrow': '.arrow', 'csv': '.csv'}[fmt])
+    pd.testing.assert_frame_equal(read_table(path), INEGI_UNIQUELOC)
+    assert list(read_table(path, columns=['CVE_LOC', 'POB_TOTAL']).columns) == ['CVE_LOC', 'POB_TOTAL']
+
+
+def test_read_table_usa_la_version_en_parquet(setup_logger, tmp_path):
+    from src.storage import read_table, resolve_table, write_table
+    setup_logger.info("Ejecutando test de la lectura de tablas con la ruta .csv original.")
+    csv_path = str(tmp_path / 'dataset_inegi_clean_2019.csv')
+
+    INEGI_UNIQUELOC.iloc[:1].to_csv(csv_path, index=False)
+    assert resolve_table(csv_path) == csv_path
+
+    write_table(INEGI_UNIQUELOC, csv_path, fmt='parquet')
+    assert resolve_table(csv_path) == str(tmp_path / 'dataset_inegi_clean_2019.parquet')
+    assert len(read_table(csv_path)) == len(INEGI_UNIQUELOC)
@@ -0,0 +1,140 @@
+import os
+import logging
+import sys
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+CABECERA = ',ESTADO,MUNICIPIO,ACUSE ESTATAL,APELLIDO PATERNO,APELLIDO MATERNO,NOMBRE (S),PAQUETE\n'
+LISTADOS = {
+    'listado_1_beneficiarios_2023.csv': ['0,GUERRERO,AZOYÚ,00101,PÉREZ,LÓPEZ,JUAN,1',
+                                         '1,GUERRERO,TECOANAPA,00102,RUIZ,,ANA,2',
+                                         '2,PUEBLA,ATLIXCO,00103,SÁNCHEZ,DÍAZ,MARÍA,1'],
+    'listado_2_beneficiarios_2023.csv': ['0,GUERRERO,AZOYÚ,00101,PÉREZ,LÓPEZ,JUAN,1',
+                                         '1,SONORA,HERMOSILLO,00201,GÓMEZ,GIL,LUIS,2',
+                                         '2,GUERRERO,TECOANAPA,00202,MORA,SOTO,EVA,1'],
+}
+
+
+@pytest.fixture(autouse=True)
+def setup_logger():
+    import config
+    logger = logging.getLogger("Fertilizantes")
+    logger.setLevel(logging.INFO)
+    yield logger
+
+
+@pytest.fixture
+def listados(tmp_path):
+    for name, rows in LISTADOS.items():
+        (tmp_path / name).write_text('Listado de beneficiarios\n' + CABECERA + '\n'.join(rows) + '\n',
+                                     encoding='cp1252')
+    return tmp_path
+
+
+def test_streaming_igual_que_en_memoria(setup_logger, listados):
+    from src.data_cleaning_and_merge import load_datasets, map_beneficiarios_2023
+    from src.inegi_catalog import build_catalogs
+    from src.streaming import iter_source_chunks, unique_rows
+    setup_logger.info("Ejecutando test del modo streaming del listado de beneficiarios 2023.")
+    dataset_inegi_clean = build_catalogs(pd.DataFrame({
+        'CVE_ENT': ['12', '12', '21'], 'NOM_ENT': ['Guerrero', 'Guerrero', 'Puebla'],
+        'CVE_MUN': ['13', '66', '19'], 'NOM_MUN': ['Azoyú', 'Tecoanapa', 'Atlixco'],
+    }))['municipios']
+    diccionario = pd.DataFrame({
+        'KEY_benef': ['guerrero-azoyu', 'guerrero-tecoanapa', 'puebla-atlixco'],
+        'KEY_benef_Verificado': ['guerrero-azoyu', 'guerrero-tecoanapa', 'puebla-atlixco'],
+    })
+    paths = sorted(str(path) for path in listados.glob('*.csv'))
+
+    expected, _ = map_beneficiarios_2023(load_datasets(str(listados), schema='beneficiarios_2023'), diccionario,
+                                         dataset_inegi_clean)
+
+    start = 0
+    seen_acuses = set()
+    chunks = []
+    for chunk in iter_source_chunks(paths, 'beneficiarios_2023', chunksize=2):
+        result, merged_rows = map_beneficiarios_2023(chunk.reset_index(drop=True), diccionario, dataset_inegi_clean,
+                                                     start=start, seen_acuses=seen_acuses)
+        chunks.append(result)
+        start += merged_rows
+
+    pd.testing.assert_frame_equal(pd.concat(chunks), expected)
+    assert list(expected['acuse']) == ['00101', '00102', '00103', '00201', '00202']
+    assert list(expected['cve_mun'].iloc[:3]) == ['013', '066', '019']
+
+    pairs = unique_rows(paths, 'beneficiarios_2023', ['ESTADO', 'MUNICIPIO'], chunksize=2)
+    assert len(pairs) == 4
+
+
+# Listado de beneficiarios de 2021 con las columnas de los publicados, con una fila repetida
+COLUMNAS_2019_2022 = ['BENEFICIARIO', 'ZONA', 'ENTIDAD', 'MUNICIPIO', 'LOCALIDAD', 'ESTRATIFICACIÓN', 'PROGRAMA',
+                      'COMPONENTE', 'SUBCOMPONENTE', 'PRODUCTO', 'FECHA', 'MONTO FEDERAL', 'APOYO', 'ACTIVIDAD',
+                      'ESLABÓN', 'CICLO AGRÍCOLA']
+FILAS_2021 = [('JUAN PEREZ LOPEZ', 'GUERRERO', 'AZOYÚ', 'AZOYÚ'),
+              ('ANA RUIZ SOTO', 'GUERRERO', 'AZOYÚ', 'AMATILLO'),
+              ('MARIA SANCHEZ DIAZ', 'PUEBLA', 'ATLIXCO', 'ATLIXCO'),
+              ('LUIS GOMEZ GIL', 'MORELOS', 'CUAUTLA', 'CUAUTLA'),
+              ('JUAN PEREZ LOPEZ', 'GUERRERO', 'AZOYÚ', 'AZOYÚ'),
+              ('EVA MORA SOTO', 'TLAXCALA', 'TLAXCALA', 'TLAXCALA DE XICOHTÉNCATL')]
+
+
+@pytest.fixture
+def beneficiarios_2021(tmp_path, monkeypatch):
+    from src.data_cleaning_inegi import clean_inegi
+    from src.inegi_uniqueloc import procesar_año
+    monkeypatch.chdir(tmp_path)
+    diccionarios = 'data/productores_beneficiarios 2019-2022/diccionarios_E3'
+    for folder in ['data/inegi', diccionarios, 'data/listados_completos']:
+        os.makedirs(folder)
+    pd.DataFrame({
+        'CVE_ENT': ['12', '12', '21', '17', '29'],
+        'NOM_ENT': ['Guerrero', 'Guerrero', 'Puebla', 'Morelos', 'Tlaxcala'],
+        'CVE_MUN': ['013', '013', '019', '006', '033'],
+        'NOM_MUN': ['Azoyú', 'Azoyú', 'Atlixco', 'Cuautla', 'Tlaxcala'],
+        'CVE_LOC': ['0001', '0005', '0001', '0001', '0001'],
+        'NOM_LOC': ['Azoyú', 'Amatillo', 'Atlixco', 'Cuautla', 'Tlaxcala de Xicohténcatl'],
+        'POB_TOTAL': [4710, 722, 90000, 150000, 16000],
+    }).to_csv('data/inegi/dataset_inegi_2021.csv', index=False)
+    clean_inegi(cuts=('2021',))
+    procesar_año('2021')
+
+    pd.DataFrame([(nombre, 'CENTRO', entidad, municipio, localidad, 'BAJO', 'FERTILIZANTES', 'C1', 'S1', 'MAÍZ',
+                   '2021-05-01', 4500, 'A1', 'SIEMBRA', 'PRIMARIO', 'PV')
+                  for nombre, entidad, municipio, localidad in FILAS_2021],
+                 columns=COLUMNAS_2019_2022).to_csv('data/listado_beneficiarios_2021.csv', index=False)
+    pd.DataFrame({
+        'KEY_benef_mun': ['guerrero-azoyu', 'puebla-atlixco', 'morelos-cuautla', 'tlaxcala-tlaxcala'],
+        'KEY_inegi_municipio': ['guerrero-azoyu', 'puebla-atlixco', 'morelos-cuautla', 'tlaxcala-tlaxcala'],
+        'CVE_ENT': [12, 21, 17, 29],
+        'Entidad_inegi': ['Guerrero', 'Puebla', 'Morelos', 'Tlaxcala'],
+        'CVE_MUN': [13, 19, 6, 33],
+        'Municipio_inegi': ['Azoyú', 'Atlixco', 'Cuautla', 'Tlaxcala'],
+    }).to_csv(f'{diccionarios}/diccionario_MUN_21_simple.csv', index=False)
+    pd.DataFrame({
+        'KEY_benef_loc': ['azoyu-azoyu', 'azoyu-amatillo', 'atlixco-atlixco', 'cuautla-cuautla',
+                          'tlaxcala-tlaxcala de xicohtencatl'],
+        'KEY_inegi_localidad': ['azoyu-azoyu', 'azoyu-amatillo', 'atlixco-atlixco', 'cuautla-cuautla',
+                                'tlaxcala-tlaxcala de xicohtencatl'],
+        'match_score': [100, 100, 100, 100, 100],
+    }).to_csv(f'{diccionarios}/diccionario_LOC_21_simple.csv', index=False, sep=';')
+    monkeypatch.setattr('src.data_cleaning_and_merge_e3.cleaning_inegi', lambda: None)
+    return tmp_path
+
+
+def test_data_cleaning3_streaming_igual_que_en_memoria(setup_logger, beneficiarios_2021):
+    from src.data_cleaning_and_merge_e3 import data_cleaning3
+    from src.storage import read_table
+    setup_logger.info("Ejecutando test del modo streaming del listado de beneficiarios 2021.")
+    output_path = 'data/listados_completos/listado_beneficiarios_2021_localidades.csv'
+
+    data_cleaning3('data/inegi/dataset_inegi_clean_2021.csv', 'data/listado_beneficiarios_2021.csv', 21,
+                   max_workers=1)
+    expected = read_table(output_path)
+    data_cleaning3('data/inegi/dataset_inegi_clean_2021.csv', 'data/listado_beneficiarios_2021.csv', 21,
+                   max_workers=1, streaming=True, chunksize=2)
+
+    pd.testing.assert_frame_equal(read_table(output_path), expected)
+    assert list(expected['Clave de entidad']) == ['12', '12', '21', '17', '29']
+    assert list(expected['Clave de municipio']) == ['013', '013', '019', '006', '033']
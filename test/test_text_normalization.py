@@ -0,0 +1,63 @@
+import os
+import logging
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+DICCIONARIOS_E3 = os.path.join(os.path.dirname(__file__), '..', 'data', 'productores_beneficiarios 2019-2022',
+                               'diccionarios_E3')
+
+
+@pytest.fixture(autouse=True)
+def setup_logger():
+    import config
+    logger = logging.getLogger("Fertilizantes")
+    logger.setLevel(logging.INFO)
+    yield logger
+
+
+def test_clean_text_series_nombres_inegi(setup_logger):
+    from src.text_normalization import clean_text, clean_text_series
+    setup_logger.info("Ejecutando test de la limpieza vectorizada con nombres reales de INEGI.")
+
+    nombres = []
+    for prefix in (19, 20, 21, 22):
+        diccionario = pd.read_csv(os.path.join(DICCIONARIOS_E3, f'diccionario_MUN_{prefix}.csv'), dtype=str)
+        nombres += diccionario['Entidad_inegi'].tolist() + diccionario['Municipio_inegi'].tolist()
+    nombres = pd.Series(nombres, dtype=object)
+
+    assert nombres.str.contains('[áéíóúñü]').any()
+    assert clean_text_series(nombres).equals(nombres.apply(clean_text))
+
+
+def test_clean_text_series_casos_limite(setup_logger):
+    from src.text_normalization import clean_text, clean_text_series
+    setup_logger.info("Ejecutando test de la limpieza vectorizada con casos límite.")
+    valores = pd.Series(['  San  José-del-Monte ', 'Ñuu\tSavi', None, np.nan, 'ZONA-1-B', '\xa0Mérida  ',
+                         'Straße', '東京', 'Azoyú', 'Azoyú'], index=range(10, 20), dtype=object)
+
+    resultado = clean_text_series(valores)
+
+    assert resultado.equals(valores.apply(clean_text))
+    assert resultado[10] == 'san josemonte'
+    assert resultado[12] is None and np.isnan(resultado[13])
+
+
+def test_clean_text_series_memoria_compartida(setup_logger):
+    from src import text_normalization
+    from src.text_normalization import clean_text, clean_text_series
+    setup_logger.info("Ejecutando test de la memoria de valores limpios entre columnas.")
+    text_normalization._MEMO.clear()
+    entidades = pd.Series(['Guerrero', 'GUERRERO ', 'Oaxaca', 'Guerrero', None] * 3, name='ENTIDAD')
+
+    primera = clean_text_series(entidades)
+    assert len(text_normalization._MEMO) == 3
+    # Otra columna con los mismos valores (por ejemplo ESTADO_Clean) reutiliza los ya limpiados
+    segunda = clean_text_series(entidades.rename('ESTADO'))
+
+    assert primera.equals(segunda)
+    assert primera.equals(entidades.apply(clean_text))
+    assert primera[0] is primera[3]
@@ -0,0 +1,47 @@
+import os
+import logging
+import sys
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+# Extracto con las columnas de los listados de beneficiarios de 2019-2022
+LISTADO = pd.DataFrame({
+    'BENEFICIARIO': ['JUAN PEREZ LOPEZ', 'MARIA GARCIA RUIZ', 'PEDRO SANCHEZ DIAZ'],
+    'ENTIDAD': ['GUERRERO', 'PUEBLA', 'MÉXICO'],
+    'MUNICIPIO': ['AZOYÚ', 'TEHUACÁN', 'TOLUCA'],
+    'LOCALIDAD': ['AZOYÚ', 'SAN PABLO TEPETZINGO', None],
+    'MONTO FEDERAL': [4500.5, 3000, 1200],
+    'FECHA': pd.to_datetime(['2019-05-01', '2019-06-15', '2019-07-30']),
+})
+
+
+@pytest.fixture(autouse=True)
+def setup_logger():
+    import config
+    logger = logging.getLogger("Fertilizantes")
+    logger.setLevel(logging.INFO)
+    yield logger
+
+
+@pytest.mark.parametrize('max_workers', [1, 2])
+def test_convert_xlsx_directory_equivale_a_read_excel(setup_logger, tmp_path, max_workers):
+    from src.xlsx_conversion import convert_xlsx_directory
+    setup_logger.info("Ejecutando test de la conversión de .xlsx a .csv con %s procesos.", max_workers)
+    for year in ['2019', '2020']:
+        LISTADO.to_excel(tmp_path / f'listado_beneficiarios_{year}.xlsx', index=False)
+
+    progress = []
+    converted = convert_xlsx_directory(str(tmp_path), max_workers=max_workers,
+                                       progress_callback=lambda value, text: progress.append(value))
+
+    assert converted == {'listado_beneficiarios_2019.xlsx': 3, 'listado_beneficiarios_2020.xlsx': 3}
+    assert progress[-1] == 1.0
+    assert sorted(os.listdir(tmp_path)) == ['listado_beneficiarios_2019.csv', 'listado_beneficiarios_2019.xlsx',
+                                           'listado_beneficiarios_2020.csv', 'listado_beneficiarios_2020.xlsx']
+    for year in ['2019', '2020']:
+        # Mismo resultado que el pd.read_excel + to_csv de antes
+        expected = pd.read_csv(pd.io.common.StringIO(
+            pd.read_excel(tmp_path / f'listado_beneficiarios_{year}.xlsx').to_csv(index=False)))
+        pd.testing.assert_frame_equal(pd.read_csv(tmp_path / f'listado_beneficiarios_{year}.csv'), expected)